@@ -0,0 +1,205 @@
+"""Benchmarks for building, writing, reading and querying ICEphysUnits tables.
+
+Runs offline on synthetic tables and writes machine-readable JSON results that can be compared between commits.
+
+usage:
+    python benchmarks/bench_icephys_units.py --sizes 10 1000 100000 --output before.json
+    python benchmarks/bench_icephys_units.py --sizes 10 1000 100000 --output after.json
+    python benchmarks/bench_icephys_units.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+import hdmf
+import pynwb
+from pynwb import NWBFile, NWBHDF5IO
+
+from ndx_icephys_units import ICEphysUnits
+
+
+def make_data(num_units, spikes_per_unit, duration, seed=0):
+    """Make synthetic spike times with a Poisson number of spikes per unit and one observation interval per unit."""
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(spikes_per_unit, num_units)
+    spike_times = np.concatenate([np.sort(rng.uniform(0, duration, c)) for c in counts])
+    obs_intervals = np.tile([[0., duration]], (num_units, 1))
+    return spike_times, counts, obs_intervals
+
+
+def build_add_unit(spike_times, counts, obs_intervals):
+    units = ICEphysUnits()
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    for i in range(len(counts)):
+        units.add_unit(spike_times=spike_times[offsets[i]:offsets[i + 1]], obs_intervals=obs_intervals[i:i + 1])
+    return units
+
+
+def build_add_units(spike_times, counts, obs_intervals):
+    units = ICEphysUnits()
+    units.add_units(spike_times=spike_times, spike_times_counts=counts, obs_intervals=obs_intervals,
+                    obs_intervals_counts=np.ones(len(counts), dtype=int))
+    return units
+
+
+def write(units, path):
+    nwbfile = NWBFile(session_description='benchmark', identifier='benchmark',
+                      session_start_time=datetime.now().astimezone())
+    nwbfile.add_acquisition(units)
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def measure(func, repeat):
+    """Call func repeat times and return the best wall time, the peak traced memory and the last result.
+
+    Wall times are measured without tracing memory, which slows down Python code a lot, and the peak memory is
+    measured in one more, traced, call.
+    """
+    best = np.inf
+    result = None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    result = None
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+IMPORT_CODE = ("import time; import pynwb; start = time.perf_counter(); import ndx_icephys_units; "
+               "print(time.perf_counter() - start)")
+
+
+def import_time(repeat):
+    """Get the best time of importing ndx_icephys_units in a fresh interpreter, not counting importing pynwb."""
+    return min(float(subprocess.check_output([sys.executable, '-c', IMPORT_CODE])) for _ in range(repeat))
+
+
+def run(sizes, spikes_per_unit, duration, num_queries, max_loop_units, repeat, workdir):
+    results = list()
+    wall_time = import_time(repeat)
+    results.append({'benchmark': 'import', 'num_units': 0, 'spikes_per_unit': spikes_per_unit,
+                    'wall_time': wall_time, 'peak_memory': 0})
+    print("%-28s %9d units  %10.4f s" % ('import', 0, wall_time))
+
+    def record(name, num_units, func, rep=repeat):
+        wall_time, peak_memory, result = measure(func, rep)
+        results.append({'benchmark': name, 'num_units': num_units, 'spikes_per_unit': spikes_per_unit,
+                        'wall_time': wall_time, 'peak_memory': peak_memory})
+        print("%-28s %9d units  %10.4f s  %12d bytes" % (name, num_units, wall_time, peak_memory))
+        return result
+
+    # skip the benchmarks of APIs missing from older versions, so that the results of commits can be compared
+    has_add_units = hasattr(ICEphysUnits, 'add_units')
+    has_query = hasattr(ICEphysUnits, 'query_spike_times')
+    build = build_add_units if has_add_units else build_add_unit
+    rng = np.random.default_rng(1)
+    for num_units in sizes:
+        spike_times, counts, obs_intervals = make_data(num_units, spikes_per_unit, duration)
+        if num_units <= max_loop_units or not has_add_units:
+            units = record('build_add_unit', num_units, lambda: build_add_unit(spike_times, counts, obs_intervals))
+        if has_add_units:
+            units = record('build_add_units', num_units, lambda: build_add_units(spike_times, counts,
+                                                                                 obs_intervals))
+
+        path = os.path.join(workdir, 'bench_%d.nwb' % num_units)
+        record('write', num_units, lambda: write(build(spike_times, counts, obs_intervals), path), rep=1)
+
+        ios = list()
+
+        def read():
+            # each call reads the file anew, since a reader returns the same table on later reads
+            ios.append(NWBHDF5IO(path, 'r'))
+            return ios[-1].read().acquisition['ICEphysUnits']
+
+        try:
+            read_units = record('read', num_units, read, rep=1)
+            index = rng.integers(0, num_units, num_queries)
+            starts = rng.uniform(0, duration, num_queries)
+            intervals = np.stack([starts, starts + duration / 100], axis=1)
+            for label, table in (('memory', units), ('file', read_units)):
+                record('single_query_%s' % label, num_units,
+                       lambda: [table.get_unit_spike_times(int(i), tuple(iv)) for i, iv in zip(index, intervals)])
+                if has_query:
+                    record('batched_query_%s' % label, num_units,
+                           lambda: table.query_spike_times(index, intervals))
+            if num_units <= max_loop_units:
+                record('to_dataframe', num_units, lambda: read_units.to_dataframe())
+        finally:
+            for io in ios:
+                io.close()
+            os.remove(path)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'timestamp': datetime.now().isoformat(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'numpy': np.__version__, 'hdmf': hdmf.__version__,
+            'pynwb': pynwb.__version__}
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {(r['benchmark'], r['num_units']): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {(r['benchmark'], r['num_units']): r for r in json.load(f)['results']}
+    print("%-28s %9s  %10s  %10s  %8s  %8s" % ('benchmark', 'units', 'before (s)', 'after (s)', 'time', 'memory'))
+    for key in sorted(before.keys() & after.keys(), key=lambda k: (k[1], k[0])):
+        b, a = before[key], after[key]
+        print("%-28s %9d  %10.4f  %10.4f  %7.2fx  %7.2fx"
+              % (key[0], key[1], b['wall_time'], a['wall_time'], a['wall_time'] / max(b['wall_time'], 1e-12),
+                 a['peak_memory'] / max(b['peak_memory'], 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='numbers of units of the synthetic tables (up to 1000000)')
+    parser.add_argument('--spikes-per-unit', type=float, default=100., help='mean number of spikes per unit')
+    parser.add_argument('--duration', type=float, default=3600., help='duration of the recording, in seconds')
+    parser.add_argument('--num-queries', type=int, default=1000, help='number of interval queries per benchmark')
+    parser.add_argument('--max-loop-units', type=int, default=10000,
+                        help='largest table to build with add_unit in a loop and to convert to a dataframe')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repeats, of which the best time is kept')
+    parser.add_argument('--output', help='path of the JSON file to write results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two JSON result files instead of running benchmarks')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.sizes, args.spikes_per_unit, args.duration, args.num_queries, args.max_loop_units,
+                      args.repeat, workdir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
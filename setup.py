@@ -31,8 +31,15 @@ setup_args = {
     'url': '',
     'license': 'BSD 3-Clause',
     'install_requires': [
-        'pynwb>=1.1.2'
+        'pynwb>=2.0.0',
+        'hdmf>=3.12.0',
+        'numpy>=1.20',
     ],
+    'extras_require': {
+        'parquet': ['pyarrow'],
+        'sparse': ['scipy'],
+        'zarr': ['hdmf-zarr'],
+    },
     'packages': find_packages('src/pynwb'),
     'package_dir': {'': 'src/pynwb'},
     'package_data': {'ndx_icephys_units': [
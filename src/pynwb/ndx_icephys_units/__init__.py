@@ -1,5 +1,5 @@
 import os
-from pynwb import load_namespaces
+from pynwb import load_namespaces, available_namespaces
 
 # Set path of the namespace.yaml file to the expected install location
 ndx_icephys_units_specpath = os.path.join(
@@ -18,7 +18,9 @@ if not os.path.exists(ndx_icephys_units_specpath):
         'ndx-icephys-units.namespace.yaml'
     ))
 
-# Load the namespace
-load_namespaces(ndx_icephys_units_specpath)
+# Load the namespace unless it is already loaded, e.g. from the specification cached in an NWB file
+if 'ndx-icephys-units' not in available_namespaces():
+    load_namespaces(ndx_icephys_units_specpath)
 
 from .icephys_units import ICEphysUnits  # noqa: E402, F401
+from . import io  # noqa: E402, F401
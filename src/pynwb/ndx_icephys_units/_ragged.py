@@ -0,0 +1,105 @@
+"""Vectorized helpers for working with ragged (VectorData + VectorIndex) columns as flat NumPy arrays."""
+import numpy as np
+
+
+def segment_searchsorted(values, lo, hi, keys, side='left'):
+    """Find insertion points of keys within sorted segments of a flat array.
+
+    Performs one vectorized binary search for all keys at once: each key ``keys[k]`` is searched for only within
+    ``values[lo[k]:hi[k]]``, which must be sorted. This is the segmented equivalent of ``np.searchsorted`` and needs
+    about log2(longest segment) passes over the keys, with no per-segment Python loop.
+
+    :param values: the flat array holding all segments
+    :param lo: start position of the segment to search for each key
+    :param hi: stop position (exclusive) of the segment to search for each key
+    :param keys: the values to search for
+    :param side: 'left' or 'right', with the same meaning as in ``np.searchsorted``
+    :returns: absolute positions into ``values``, one per key
+    """
+    if side not in ('left', 'right'):
+        raise ValueError("side must be 'left' or 'right', got %r" % side)
+    keys = np.asarray(keys)
+    lo, hi, keys = np.broadcast_arrays(np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64), keys)
+    shape = lo.shape
+    lo = lo.ravel().copy()
+    hi = hi.ravel().copy()
+    keys = keys.ravel()
+    active = np.flatnonzero(lo < hi)
+    while active.size:
+        mid = (lo[active] + hi[active]) // 2
+        if side == 'left':
+            go_right = values[mid] < keys[active]
+        else:
+            go_right = values[mid] <= keys[active]
+        lo[active[go_right]] = mid[go_right] + 1
+        hi[active[~go_right]] = mid[~go_right]
+        active = active[lo[active] < hi[active]]
+    return lo.reshape(shape)
+
+
+def gather_segments(values, starts, stops):
+    """Concatenate the segments ``values[starts[k]:stops[k]]`` into one flat array.
+
+    :returns: a tuple ``(flat, offsets)`` where segment k is ``flat[offsets[k]:offsets[k + 1]]``
+    """
+    starts = np.asarray(starts, dtype=np.int64).ravel()
+    counts = np.asarray(stops, dtype=np.int64).ravel() - starts
+    offsets = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    positions = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1], dtype=np.int64)
+    return np.asarray(values)[positions], offsets
+
+
+def merge_ranges(starts, stops):
+    """Merge the ranges ``[starts[k], stops[k])`` into runs of overlapping or adjacent ranges.
+
+    Empty ranges are left out of the runs. Reading the runs one after another into a flat array, range k is found at
+    ``flat[new_starts[k]:new_stops[k]]``, and empty ranges are at 0.
+
+    :returns: a tuple ``(run_starts, run_stops, new_starts, new_stops)``
+    """
+    starts = np.asarray(starts, dtype=np.int64).ravel()
+    stops = np.asarray(stops, dtype=np.int64).ravel()
+    new_starts = np.zeros(starts.size, dtype=np.int64)
+    new_stops = np.zeros(starts.size, dtype=np.int64)
+    ranges = np.flatnonzero(stops > starts)
+    ranges = ranges[np.argsort(starts[ranges], kind='stable')]
+    lo, hi = starts[ranges], stops[ranges]
+    first = np.ones(ranges.size, dtype=bool)
+    first[1:] = lo[1:] > np.maximum.accumulate(hi)[:-1]
+    runs = np.cumsum(first) - 1
+    run_starts = lo[first]
+    run_stops = np.maximum.reduceat(hi, np.flatnonzero(first)) if ranges.size else hi
+    run_offsets = np.zeros(run_starts.size + 1, dtype=np.int64)
+    np.cumsum(run_stops - run_starts, out=run_offsets[1:])
+    shift = run_offsets[runs] - run_starts[runs]
+    new_starts[ranges] = lo + shift
+    new_stops[ranges] = hi + shift
+    return run_starts, run_stops, new_starts, new_stops
+
+
+def bin_count(window, bin_width):
+    """Get the number of bins of width bin_width covering the (start, stop) window.
+
+    The last bin is shortened if the window is not a multiple of bin_width, within a tolerance for rounding errors.
+    """
+    start, stop = window
+    if not stop > start:
+        raise ValueError("window must have stop > start, got %s" % str(tuple(window)))
+    if not bin_width > 0:
+        raise ValueError("bin_width must be positive, got %s" % bin_width)
+    return int(np.ceil((stop - start) / bin_width - 1e-9))
+
+
+def bin_edges(window, bin_width, first=0, last=None):
+    """Get the edges of bins of width bin_width covering the (start, stop) window, or of the bins first to last.
+
+    The last bin is shortened so that the last edge is stop if the window is not a multiple of bin_width.
+    """
+    start, stop = window
+    num_bins = bin_count(window, bin_width)
+    last = num_bins if last is None else min(last, num_bins)
+    edges = start + bin_width * np.arange(first, last + 1)
+    if last == num_bins:
+        edges[-1] = stop
+    return edges
@@ -0,0 +1,105 @@
+"""Aggregation of the ICEphysUnits tables of many NWB files into one table."""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hdmf.common import VectorIndex
+from hdmf.utils import docval, getargs
+
+from pynwb import NWBHDF5IO
+
+from .icephys_units import ICEphysUnits
+
+_RAGGED = ('spike_times', 'obs_intervals')
+_SHAPES = {'spike_times': (-1,), 'obs_intervals': (-1, 2)}
+
+
+def _find_units(nwbfile, name):
+    tables = [obj for obj in nwbfile.objects.values()
+              if isinstance(obj, ICEphysUnits) and (name is None or obj.name == name)]
+    if len(tables) != 1:
+        raise ValueError("expected one ICEphysUnits table%s in NWB file '%s', found %d"
+                         % ('' if name is None else " named '%s'" % name, nwbfile.identifier, len(tables)))
+    return tables[0]
+
+
+def _read_file(path, name):
+    """Read the ICEphysUnits table of an NWB file as a dict of NumPy arrays, with the values and the counts per unit
+    of ragged columns."""
+    with NWBHDF5IO(path, 'r') as io:
+        nwbfile = io.read()
+        units = _find_units(nwbfile, name)
+        columns = {'id': np.asarray(units.id.data[:], dtype=np.int64)}
+        for colname in units.colnames:
+            if colname in _RAGGED:
+                values, offsets = units._read_ragged(colname)
+                columns[colname] = np.asarray(values, dtype=np.float64).reshape(_SHAPES[colname])
+                columns[colname + '_counts'] = np.diff(offsets)
+            elif colname == 'electrode':
+                columns['electrode_name'] = np.array([e.name for e in units.get_unit_electrodes()], dtype=object)
+            elif not isinstance(units[colname], VectorIndex):
+                columns[colname] = np.asarray(units[colname].data[:])
+        return {'identifier': nwbfile.identifier, 'description': units.description, 'resolution': units.resolution,
+                'waveform_rate': units.waveform_rate, 'columns': columns}
+
+
+@docval({'name': 'paths', 'type': (list, tuple), 'doc': 'the paths of the NWB files to read'},
+        {'name': 'name', 'type': str, 'default': None,
+         'doc': 'the name of the ICEphysUnits table to read from each file. By default, the only one is read'},
+        {'name': 'n_jobs', 'type': int, 'default': 1, 'doc': 'the number of worker processes to read files with'},
+        {'name': 'as_table', 'type': bool, 'default': True,
+         'doc': 'return an ICEphysUnits table instead of a dict of flat arrays'},
+        is_method=False)
+def aggregate_units(**kwargs):
+    """Merge the ICEphysUnits tables of many NWB files into one table.
+
+    With n_jobs > 1, files are opened and read in a process pool. Each table is read with one read per column and
+    the merged ragged columns are built from the concatenated values and counts of all tables, without adding units
+    one by one. Columns missing from some tables are left out, except spike_times and obs_intervals, which are
+    empty for the units of those tables. The electrode column cannot refer to electrodes in other files, so it is
+    replaced with the electrode_name column. The resolution and waveform rate are kept if all tables have the same.
+
+    Units are in the order of paths and keep their ids as the source_id column. The provenance columns file and
+    session_id hold the path and the identifier of the NWB file of each unit.
+
+    Returns the merged ICEphysUnits table or, if as_table is False, a dict of flat arrays per column, in which the
+    values of ragged columns come with their number of values per unit as '<column>_counts'.
+    """
+    paths, name, n_jobs, as_table = getargs('paths', 'name', 'n_jobs', 'as_table', kwargs)
+    if n_jobs <= 1 or len(paths) < 2:
+        results = [_read_file(path, name) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_read_file, paths, [name] * len(paths)))
+
+    tables = [r['columns'] for r in results]
+    num_units = np.array([len(t['id']) for t in tables], dtype=np.int64)
+    merged = {'source_id': np.concatenate([t['id'] for t in tables]) if tables else np.zeros(0, dtype=np.int64),
+              'file': np.repeat(np.array(paths, dtype=object), num_units),
+              'session_id': np.repeat(np.array([r['identifier'] for r in results], dtype=object), num_units)}
+    for colname in _RAGGED:
+        if any(colname in t for t in tables):
+            empty = np.zeros((0,) + _SHAPES[colname][1:])
+            merged[colname] = np.concatenate([t.get(colname, empty) for t in tables])
+            merged[colname + '_counts'] = np.concatenate([t.get(colname + '_counts', np.zeros(n, dtype=np.int64))
+                                                          for t, n in zip(tables, num_units)])
+    common = set.intersection(*(set(t) for t in tables)) if tables else set()
+    for colname in sorted(common - {'id'} - set(merged)):
+        merged[colname] = np.concatenate([t[colname] for t in tables])
+    if not as_table:
+        return merged
+
+    rates = {key: {r[key] for r in results} for key in ('resolution', 'waveform_rate')}
+    units = ICEphysUnits(name=name or 'ICEphysUnits',
+                         description='; '.join(sorted({r['description'] for r in results})) or None,
+                         **{key: val.pop() for key, val in rates.items() if len(val) == 1})
+    descriptions = {'source_id': 'ID of each unit in its NWB file',
+                    'file': 'Path of the NWB file of each unit',
+                    'session_id': 'Identifier of the NWB file of each unit',
+                    'electrode_name': 'Name of the electrode that each unit came from'}
+    predefined = {col['name'] for col in ICEphysUnits.__columns__}
+    for colname in merged:
+        if colname not in predefined and not colname.endswith('_counts'):
+            units.add_column(name=colname, description=descriptions.get(colname, colname))
+    units.add_units(**merged)
+    return units
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ColumnBlockCache:
+    """An in-memory LRU cache of column data, held as contiguous NumPy blocks along the first axis.
+
+    Each column is split into blocks of block_size rows that are loaded on first access. When max_bytes is set,
+    the least recently used blocks are evicted once the cached blocks exceed it.
+    """
+
+    def __init__(self, max_bytes=None, block_size=2 ** 20):
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must be non-negative, got %d" % max_bytes)
+        if block_size < 1:
+            raise ValueError("block_size must be positive, got %d" % block_size)
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.__blocks = OrderedDict()
+        self.__nbytes = 0
+
+    @property
+    def nbytes(self):
+        """The number of bytes currently held by the cache."""
+        return self.__nbytes
+
+    def __len__(self):
+        return len(self.__blocks)
+
+    def read(self, key, data, start, stop):
+        """Read rows [start, stop) of the column data cached under key, loading missing blocks from data."""
+        start = max(int(start), 0)
+        stop = min(int(stop), len(data))
+        if stop <= start:
+            return np.asarray(data[0:0])
+        first = start // self.block_size
+        last = (stop - 1) // self.block_size
+        blocks = [self.__get_block(key, data, b) for b in range(first, last + 1)]
+        block = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        offset = first * self.block_size
+        self.__evict()
+        return block[start - offset:stop - offset]
+
+    def invalidate(self, key=None, partial_only=False):
+        """Drop cached blocks.
+
+        :param key: only drop blocks of this column. By default, blocks of all columns are dropped.
+        :param partial_only: only drop blocks that are shorter than block_size, i.e., the last block of a column,
+                             which is stale after rows are appended
+        """
+        for k in list(self.__blocks):
+            if key is not None and k[0] != key:
+                continue
+            if partial_only and len(self.__blocks[k]) == self.block_size:
+                continue
+            self.__nbytes -= self.__blocks.pop(k).nbytes
+
+    def __get_block(self, key, data, block_no):
+        k = (key, block_no)
+        block = self.__blocks.get(k)
+        if block is None:
+            start = block_no * self.block_size
+            block = np.array(data[start:min(start + self.block_size, len(data))])
+            self.__blocks[k] = block
+            self.__nbytes += block.nbytes
+        else:
+            self.__blocks.move_to_end(k)
+        return block
+
+    def __evict(self):
+        if self.max_bytes is None:
+            return
+        while self.__blocks and self.__nbytes > self.max_bytes:
+            _, block = self.__blocks.popitem(last=False)
+            self.__nbytes -= block.nbytes
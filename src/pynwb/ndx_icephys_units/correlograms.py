@@ -0,0 +1,151 @@
+"""Auto- and cross-correlograms of the spike times in an ICEphysUnits table."""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from hdmf.utils import docval, getargs
+
+from ._ragged import bin_edges
+from .icephys_units import ICEphysUnits
+
+
+def _lags(spike_times_a, spike_times_b, window, same=False):
+    """Get all differences b - a with -window <= b - a < window between two sorted arrays of spike times.
+
+    For each spike in a, the range of spikes in b within the window is found with one vectorized binary search of
+    the keys a - window and a + window in b, so the cost is O(len(a) log len(b)) plus the number of lags.
+    """
+    lo = np.searchsorted(spike_times_b, spike_times_a - window, side='left')
+    hi = np.searchsorted(spike_times_b, spike_times_a + window, side='left')
+    counts = hi - lo
+    offsets = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    positions = np.repeat(lo - offsets[:-1], counts) + np.arange(offsets[-1], dtype=np.int64)
+    reference = np.repeat(np.arange(spike_times_a.size), counts)
+    if same:
+        # a spike is not paired with itself in an autocorrelogram
+        keep = positions != reference
+        positions = positions[keep]
+        reference = reference[keep]
+    return spike_times_b[positions] - spike_times_a[reference]
+
+
+def _bin_lags(lags, edges):
+    bins = np.searchsorted(edges, lags, side='right') - 1
+    bins = bins[(bins >= 0) & (bins < edges.size - 1)]
+    return np.bincount(bins, minlength=edges.size - 1)
+
+
+def _counts(spike_times_a, spike_times_b, edges, same=False):
+    window = max(-edges[0], edges[-1])
+    return _bin_lags(_lags(spike_times_a, spike_times_b, window, same=same), edges)
+
+
+def _pair_counts(values, offsets, pairs, edges, mirror=False):
+    """Get the counts of each (i, j) pair, and with mirror, also the counts of each (j, i) pair as a second array,
+    binning the negated lags of (i, j) instead of computing the lags of (j, i)."""
+    counts = np.zeros((2 if mirror else 1, len(pairs), edges.size - 1), dtype=np.int64)
+    window = max(-edges[0], edges[-1])
+    for k, (i, j) in enumerate(pairs):
+        lags = _lags(values[offsets[i]:offsets[i + 1]], values[offsets[j]:offsets[j + 1]], window, same=(i == j))
+        counts[0, k] = _bin_lags(lags, edges)
+        if mirror:
+            counts[1, k] = _bin_lags(-lags, edges)
+    return counts if mirror else counts[0]
+
+
+# per-process state of pool workers, which read spike times from shared memory instead of receiving copies
+_worker_state = dict()
+
+
+def _init_worker(shm_name, size, offsets):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state['shm'] = shm
+    _worker_state['values'] = np.ndarray((size,), dtype=np.float64, buffer=shm.buf)
+    _worker_state['offsets'] = offsets
+
+
+def _worker_pair_counts(pairs, edges, mirror):
+    return _pair_counts(_worker_state['values'], _worker_state['offsets'], pairs, edges, mirror)
+
+
+@docval({'name': 'spike_times_a', 'type': 'array_data', 'doc': 'the sorted reference spike times'},
+        {'name': 'spike_times_b', 'type': 'array_data',
+         'doc': 'the sorted target spike times. By default, the autocorrelogram of spike_times_a is computed',
+         'default': None},
+        {'name': 'bin_width', 'type': (int, float), 'doc': 'the width of each bin', 'default': 1e-3},
+        {'name': 'window', 'type': (int, float), 'doc': 'the maximum absolute lag', 'default': 5e-2},
+        is_method=False)
+def compute_correlogram(**kwargs):
+    """Compute the correlogram of two sorted arrays of spike times.
+
+    Counts the lags spike_times_b - spike_times_a in half-open bins from -window to window. Spikes are not paired
+    with themselves when computing an autocorrelogram.
+
+    Returns a tuple (counts, bin_edges).
+    """
+    spike_times_a, spike_times_b, bin_width, window = getargs('spike_times_a', 'spike_times_b', 'bin_width',
+                                                              'window', kwargs)
+    edges = bin_edges((-window, window), bin_width)
+    spike_times_a = np.asarray(spike_times_a, dtype=np.float64)
+    if spike_times_b is None:
+        return _counts(spike_times_a, spike_times_a, edges, same=True), edges
+    return _counts(spike_times_a, np.asarray(spike_times_b, dtype=np.float64), edges), edges
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table holding the spike times'},
+        {'name': 'bin_width', 'type': (int, float), 'doc': 'the width of each bin', 'default': 1e-3},
+        {'name': 'window', 'type': (int, float), 'doc': 'the maximum absolute lag', 'default': 5e-2},
+        {'name': 'index', 'type': 'array_data', 'default': None,
+         'doc': 'the indices of the units to correlate. By default, all units are used'},
+        {'name': 'pairs', 'type': 'array_data', 'default': None,
+         'doc': ('the (reference, target) pairs of unit indices to correlate. By default, all ordered pairs of '
+                 'the units in index are correlated')},
+        {'name': 'n_jobs', 'type': int, 'default': 1,
+         'doc': 'the number of worker processes to compute correlograms with'},
+        is_method=False)
+def compute_correlograms(**kwargs):
+    """Compute the auto- and cross-correlograms of many pairs of units.
+
+    The spike times of the units are read with one read of spike_times. If pairs is not given, the lags of each
+    pair of units are computed once, and the correlogram of the transposed pair is binned from the negated lags.
+    With n_jobs > 1, pairs are split across a process pool whose workers all read the spike times from one shared
+    memory block.
+
+    Returns a tuple (counts, bin_edges), where counts has shape (len(pairs), bins), or (units, units, bins) if pairs
+    is not given, with counts[i, j] holding the lags of the spike times of unit j relative to unit i.
+    """
+    units, bin_width, window, index, pairs, n_jobs = getargs('units', 'bin_width', 'window', 'index', 'pairs',
+                                                             'n_jobs', kwargs)
+    edges = bin_edges((-window, window), bin_width)
+    if pairs is None:
+        index = np.arange(len(units)) if index is None else units._normalize_unit_index(index)
+        rows, cols = np.triu_indices(index.size)
+        counts, mirrored = _compute_pairs(units, np.stack([index[rows], index[cols]], axis=1), edges, n_jobs,
+                                          mirror=True)
+        grid = np.zeros((index.size, index.size, edges.size - 1), dtype=np.int64)
+        grid[cols, rows] = mirrored
+        grid[rows, cols] = counts
+        return grid, edges
+    pairs = units._normalize_unit_index(pairs).reshape(-1, 2)
+    return _compute_pairs(units, pairs, edges, n_jobs), edges
+
+
+def _compute_pairs(units, pairs, edges, n_jobs, mirror=False):
+    offsets = units._read_ragged_offsets('spike_times')
+    values = np.ascontiguousarray(units._read_ragged_target('spike_times', 0, offsets[-1]), dtype=np.float64)
+    if n_jobs <= 1 or len(pairs) < 2:
+        return _pair_counts(values, offsets, pairs, edges, mirror)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(shm.name, values.size, offsets)) as pool:
+            futures = [pool.submit(_worker_pair_counts, chunk, edges, mirror)
+                       for chunk in np.array_split(pairs, min(len(pairs), n_jobs * 4))]
+            return np.concatenate([f.result() for f in futures], axis=1 if mirror else 0)
+    finally:
+        shm.close()
+        shm.unlink()
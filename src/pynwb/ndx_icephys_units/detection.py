@@ -0,0 +1,157 @@
+"""Threshold detection of spikes in intracellular recordings, producing an ICEphysUnits table."""
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+
+from hdmf.utils import docval, getargs
+
+from pynwb.icephys import PatchClampSeries
+
+from .icephys_units import ICEphysUnits
+from .waveforms import _series_rate
+
+
+def _accept(times, last, refractory):
+    """Keep the times that are at least refractory after the last kept time, starting from last."""
+    keep = np.diff(np.concatenate([[last], times])) >= refractory
+    # a time at least refractory after the previous time is always kept, so only runs of closer times are walked
+    previous = np.maximum.accumulate(np.where(keep, np.arange(times.size), -1))
+    for i in np.flatnonzero(~keep):
+        if i > 0 and previous[i - 1] >= 0:
+            last = max(last, times[previous[i - 1]])
+        if times[i] - last >= refractory:
+            keep[i] = True
+            last = times[i]
+    return times[keep]
+
+
+def _detect(data, rate, start_time, conversion, offset, threshold, refractory, chunk_size):
+    """Find the times at which data crosses threshold upwards, reading chunk_size samples at a time."""
+    spike_times = list()
+    previous = None
+    last = -np.inf
+    for start in range(0, data.shape[0], chunk_size):
+        block = np.asarray(data[start:start + chunk_size], dtype=np.float64) * conversion + offset
+        if previous is not None:
+            # the last sample of the previous chunk finds crossings at the first sample of this chunk
+            block = np.concatenate([[previous], block])
+            first = start - 1
+        else:
+            first = start
+        previous = block[-1]
+        below = block[:-1] < threshold
+        crossings = np.flatnonzero(below & (block[1:] >= threshold))
+        if not crossings.size:
+            continue
+        # linear interpolation between the samples before and at the crossing
+        lo, hi = block[crossings], block[crossings + 1]
+        fraction = (threshold - lo) / (hi - lo)
+        times = start_time + (first + crossings + fraction) / rate
+        times = _accept(times, last, refractory)
+        if times.size:
+            last = times[-1]
+            spike_times.append(times)
+    return np.concatenate(spike_times) if spike_times else np.zeros(0)
+
+
+def _detect_source(source, rate, start_time, conversion, offset, threshold, refractory, chunk_size):
+    """Detect spikes in data given as an array or as the (file name, dataset path) of an HDF5 dataset."""
+    if isinstance(source, tuple):
+        with h5py.File(source[0], 'r') as f:
+            return _detect(f[source[1]], rate, start_time, conversion, offset, threshold, refractory, chunk_size)
+    return _detect(source, rate, start_time, conversion, offset, threshold, refractory, chunk_size)
+
+
+def _detect_args(series):
+    """Get the arguments of _detect_source for series, which can be sent to another process."""
+    data = series.data
+    if isinstance(data, h5py.Dataset):
+        source = (data.file.filename, data.name)
+    else:
+        source = np.asarray(data)
+    conversion = series.conversion if series.conversion is not None else 1.
+    offset = getattr(series, 'offset', None) or 0.
+    return source, _series_rate(series), series.starting_time or 0., conversion, offset
+
+
+@docval({'name': 'series', 'type': PatchClampSeries, 'doc': 'the recording to detect spikes in'},
+        {'name': 'threshold', 'type': (int, float), 'default': 0.,
+         'doc': 'the threshold, in volts, that the data must cross upwards for a spike to be detected'},
+        {'name': 'refractory', 'type': (int, float), 'default': 2e-3,
+         'doc': 'the minimum time between two spikes, in seconds'},
+        {'name': 'chunk_size', 'type': int, 'default': 2 ** 20,
+         'doc': 'the number of samples to read at once'},
+        is_method=False)
+def detect_spikes(**kwargs):
+    """Detect spikes as upward crossings of a threshold in a recording.
+
+    The data is converted to volts with the conversion and offset of the series and read in chunks of chunk_size
+    samples, carrying the last sample and the last spike time of each chunk over to the next one, so crossings on
+    chunk boundaries are found once. The spike time is interpolated linearly between the samples before and after
+    the crossing. Crossings less than refractory after the last detected spike are dropped.
+
+    Returns the spike times, in seconds.
+    """
+    series, threshold, refractory, chunk_size = getargs('series', 'threshold', 'refractory', 'chunk_size', kwargs)
+    if not chunk_size > 0:
+        raise ValueError("chunk_size must be positive, got %d" % chunk_size)
+    return _detect_source(*_detect_args(series), threshold, refractory, chunk_size)
+
+
+@docval({'name': 'series', 'type': (list, tuple), 'doc': 'the PatchClampSeries to detect spikes in'},
+        {'name': 'threshold', 'type': (int, float), 'default': 0.,
+         'doc': 'the threshold, in volts, that the data must cross upwards for a spike to be detected'},
+        {'name': 'refractory', 'type': (int, float), 'default': 2e-3,
+         'doc': 'the minimum time between two spikes, in seconds'},
+        {'name': 'chunk_size', 'type': int, 'default': 2 ** 20,
+         'doc': 'the number of samples to read at once'},
+        {'name': 'n_jobs', 'type': int, 'default': 1,
+         'doc': 'the number of worker processes to detect spikes with'},
+        {'name': 'name', 'type': str, 'default': 'ICEphysUnits', 'doc': 'the name of the ICEphysUnits table'},
+        {'name': 'description', 'type': str, 'default': None, 'doc': 'the description of the ICEphysUnits table'},
+        is_method=False)
+def detect_units(**kwargs):
+    """Detect spikes in many recordings and collect them in an ICEphysUnits table with one unit per electrode.
+
+    Spikes are detected in each series as in detect_spikes. With n_jobs > 1, series are split across a process
+    pool. Series read from an HDF5 file are read by the workers from the file instead of being sent to them. The
+    spike times of all series recorded with the same electrode make up one unit, whose observation intervals are the
+    spans of these series.
+
+    Returns the ICEphysUnits table, with units in the order in which their electrodes first appear in series.
+    """
+    series, threshold, refractory, chunk_size, n_jobs, name, description = getargs(
+        'series', 'threshold', 'refractory', 'chunk_size', 'n_jobs', 'name', 'description', kwargs)
+    if not chunk_size > 0:
+        raise ValueError("chunk_size must be positive, got %d" % chunk_size)
+    for s in series:
+        if not isinstance(s, PatchClampSeries):
+            raise ValueError("series must be PatchClampSeries, got %s" % type(s).__name__)
+    args = [_detect_args(s) + (threshold, refractory, chunk_size) for s in series]
+    if n_jobs <= 1 or len(series) < 2:
+        results = [_detect_source(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_detect_source, *zip(*args)))
+
+    electrodes = list()
+    for s in series:
+        if not any(s.electrode is e for e in electrodes):
+            electrodes.append(s.electrode)
+    unit_of_series = np.array([next(k for k, e in enumerate(electrodes) if s.electrode is e) for s in series],
+                              dtype=np.int64)
+    spans = np.array([[a[2], a[2] + len(s.data) / a[1]] for s, a in zip(series, args)]).reshape(-1, 2)
+    spike_counts = np.array([r.size for r in results], dtype=np.int64)
+    spike_times = np.concatenate(results) if results else np.zeros(0)
+    spike_units = np.repeat(unit_of_series, spike_counts)
+    order = np.lexsort((spike_times, spike_units))
+    interval_order = np.lexsort((spans[:, 0], unit_of_series))
+
+    units = ICEphysUnits(name=name, description=description)
+    units.add_units(spike_times=spike_times[order],
+                    spike_times_counts=np.bincount(spike_units, minlength=len(electrodes)),
+                    obs_intervals=spans[interval_order],
+                    obs_intervals_counts=np.bincount(unit_of_series, minlength=len(electrodes)),
+                    electrode=electrodes)
+    return units
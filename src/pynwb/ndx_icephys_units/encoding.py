@@ -0,0 +1,37 @@
+import numpy as np
+
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.utils import docval, get_docval, popargs
+
+
+class ScaleOffsetDataIO(H5DataIO):
+    """H5DataIO that also applies the HDF5 scale-offset filter when writing the data.
+
+    For floating point data, the filter rounds values to the given number of decimal digits and stores them as
+    integers offset by the minimum of each chunk, packed into as few bits as the range of the chunk needs. The data
+    is decoded back to floating point transparently on read.
+    """
+
+    @docval(*get_docval(H5DataIO.__init__),
+            {'name': 'scaleoffset', 'type': int, 'default': None,
+             'doc': 'the number of decimal digits to keep in floating point data'})
+    def __init__(self, **kwargs):
+        scaleoffset = popargs('scaleoffset', kwargs)
+        super().__init__(**kwargs)
+        if scaleoffset is not None:
+            self.io_settings['scaleoffset'] = scaleoffset
+
+
+def resolution_digits(resolution):
+    """Get the number of decimal digits needed to store times at the given resolution.
+
+    Times rounded to this many digits are off by at most half the resolution.
+    """
+    if not resolution > 0:
+        raise ValueError("resolution must be positive, got %s" % resolution)
+    return max(int(np.ceil(-np.log10(resolution) - 1e-9)), 0)
+
+
+def quantize(values, resolution):
+    """Round values to the nearest multiple of resolution."""
+    return np.rint(np.asarray(values, dtype=np.float64) / resolution) * resolution
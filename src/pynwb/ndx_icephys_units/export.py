@@ -0,0 +1,92 @@
+"""Export of the ragged columns of an ICEphysUnits table in long format, with one row per value."""
+import numpy as np
+import pandas as pd
+
+from hdmf.utils import docval, getargs
+
+from .icephys_units import ICEphysUnits
+
+# the names of the value columns of the long format of each ragged column
+_LONG_COLUMNS = {'spike_times': ('spike_time',), 'obs_intervals': ('start', 'stop')}
+
+
+def _check_column(units, column):
+    if column not in _LONG_COLUMNS:
+        raise ValueError("column must be one of %s, got '%s'" % (", ".join(sorted(_LONG_COLUMNS)), column))
+    if column not in units.colnames:
+        raise ValueError("%s '%s' has no %s column" % (units.__class__.__name__, units.name, column))
+
+
+def _iter_long(units, column, chunk_size):
+    """Yield dicts of flat arrays holding the rows of the long format of column, about chunk_size rows at a time.
+
+    Each block is read with one read of the column, and the unit ID of each value is repeated from the index.
+    """
+    offsets = units._read_ragged_offsets(column)
+    ids = np.asarray(units.id.data[:], dtype=np.int64)
+    # split the units into blocks of about chunk_size values, with at least one unit per block
+    bounds = np.unique(np.searchsorted(offsets, np.arange(0, offsets[-1], max(chunk_size, 1)), side='right') - 1)
+    bounds = np.append(bounds[bounds < len(ids)], len(ids))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        lo, hi = offsets[first], offsets[last]
+        values = np.asarray(units._read_ragged_target(column, lo, hi), dtype=np.float64)
+        values = values.reshape(hi - lo, -1)
+        rows = {'unit_id': np.repeat(ids[first:last], np.diff(offsets[first:last + 1]))}
+        for k, name in enumerate(_LONG_COLUMNS[column]):
+            rows[name] = values[:, k]
+        yield rows
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table to export'},
+        {'name': 'column', 'type': str, 'default': 'spike_times',
+         'doc': "the ragged column to export, 'spike_times' or 'obs_intervals'"},
+        is_method=False)
+def to_long_dataframe(**kwargs):
+    """Get a ragged column of an ICEphysUnits table as a pandas DataFrame with one row per value.
+
+    The spike_times column gives the columns unit_id and spike_time and the obs_intervals column gives the columns
+    unit_id, start and stop. Unlike DynamicTable.to_dataframe, which holds an array per unit, all columns are flat
+    NumPy arrays built from the values and the index of the column.
+    """
+    units, column = getargs('units', 'column', kwargs)
+    _check_column(units, column)
+    blocks = list(_iter_long(units, column, max(len(units[column].target), 1)))
+    if not blocks:
+        return pd.DataFrame({name: np.zeros(0, dtype=np.int64 if name == 'unit_id' else np.float64)
+                             for name in ('unit_id',) + _LONG_COLUMNS[column]})
+    return pd.DataFrame(blocks[0])
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table to export'},
+        {'name': 'path', 'type': str, 'doc': 'the path of the Parquet file to write'},
+        {'name': 'column', 'type': str, 'default': 'spike_times',
+         'doc': "the ragged column to export, 'spike_times' or 'obs_intervals'"},
+        {'name': 'row_group_size', 'type': int, 'default': 2 ** 20,
+         'doc': 'the approximate number of rows to read and write at once, as one row group'},
+        {'name': 'compression', 'type': str, 'default': 'snappy', 'doc': 'the compression codec of the file'},
+        is_method=False)
+def write_parquet(**kwargs):
+    """Write a ragged column of an ICEphysUnits table to a Parquet file with one row per value.
+
+    The file has the columns of to_long_dataframe. The column is read and written in row groups of about
+    row_group_size rows, so the table is never loaded whole. Requires pyarrow.
+
+    Returns the number of rows written.
+    """
+    units, path, column, row_group_size, compression = getargs('units', 'path', 'column', 'row_group_size',
+                                                               'compression', kwargs)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("write_parquet requires pyarrow, which can be installed with 'pip install pyarrow'") from e
+    _check_column(units, column)
+    if not row_group_size > 0:
+        raise ValueError("row_group_size must be positive, got %d" % row_group_size)
+    schema = pa.schema([('unit_id', pa.int64())] + [(name, pa.float64()) for name in _LONG_COLUMNS[column]])
+    num_rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for rows in _iter_long(units, column, row_group_size):
+            writer.write_table(pa.Table.from_pydict(rows, schema=schema))
+            num_rows += len(rows['unit_id'])
+    return num_rows
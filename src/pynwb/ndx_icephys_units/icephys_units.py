@@ -1,11 +1,28 @@
 import numpy as np
 from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 
-from hdmf.common import DynamicTable
-from hdmf.utils import docval, getargs, call_docval_func, get_docval
+from hdmf.common import DynamicTable, VectorIndex
+from hdmf.container import Data
+from hdmf.data_utils import DataIO
+from hdmf.utils import docval, getargs, popargs, call_docval_func, get_docval, get_data_shape
 
 from pynwb import register_class
-from pynwb.icephys import IntracellularElectrode
+from pynwb.icephys import IntracellularElectrode, IntracellularRecordingsTable
+
+from ._ragged import segment_searchsorted, gather_segments, merge_ranges, bin_count, bin_edges
+from .cache import ColumnBlockCache
+from .encoding import ScaleOffsetDataIO, resolution_digits, quantize
+from .instrumentation import instrumented, counted, record_read
+from .interval_index import IntervalIndex
+from .memmap import memmap_dataset
+from .parallel import read_chunked
+from .sweeps import recording_spans
+
+
+# the number of elements whose read costs about as much as one more read call, used to choose between reading the
+# span covering many ranges of a column at once and reading each run of ranges on its own
+_READ_CALL_ELEMENTS = 4096
 
 
 # adapted from pynwb.misc.Units but to store intracellular units
@@ -13,6 +30,8 @@ from pynwb.icephys import IntracellularElectrode
 class ICEphysUnits(DynamicTable):
     """A DynamicTable to hold detected spike times from intracellular ephys recordings."""
 
+    __fields__ = ('resolution', 'waveform_rate')
+
     __columns__ = (
         {'name': 'spike_times', 'description': 'Spike times for each unit', 'index': True},
         {'name': 'obs_intervals', 'description': 'Observation intervals for each unit', 'index': True},
@@ -23,14 +42,31 @@ class ICEphysUnits(DynamicTable):
 
     @docval({'name': 'name', 'type': str, 'doc': 'Name of this ICEphysUnits table', 'default': 'ICEphysUnits'},
             *get_docval(DynamicTable.__init__, 'id', 'columns', 'colnames'),
-            {'name': 'description', 'type': str, 'doc': 'Description of what is in this table', 'default': None})
+            {'name': 'description', 'type': str, 'doc': 'Description of what is in this table', 'default': None},
+            {'name': 'resolution', 'type': float, 'default': None,
+             'doc': 'The smallest possible difference between two spike times'},
+            {'name': 'waveform_rate', 'type': float, 'default': None,
+             'doc': 'Sampling rate of the waveform means and standard deviations, in hertz'})
     def __init__(self, **kwargs):
+        resolution, waveform_rate = popargs('resolution', 'waveform_rate', kwargs)
         if kwargs.get('description', None) is None:
             kwargs['description'] = "Data on spiking units"
         call_docval_func(super().__init__, kwargs)
+        self.resolution = resolution
+        self.waveform_rate = waveform_rate
         if 'spike_times' not in self.colnames:
             self.__has_spike_times = False
+        self._cache = None
+        self._memmaps = dict()
+        self._obs_interval_index = None
+        self._obs_interval_index_units = 0
+        self._spike_times_sorted = None
+        self._electrodes = None
+        self._electrode_rows = None
+        self._executor = None
+        self._read_workers = 1
 
+    @instrumented
     @docval({'name': 'spike_times', 'type': 'array_data', 'doc': 'Spike times for each unit',
              'default': None, 'shape': (None,)},
             {'name': 'obs_intervals', 'type': 'array_data',
@@ -49,7 +85,305 @@ class ICEphysUnits(DynamicTable):
     def add_unit(self, **kwargs):
         """Add a unit to this table."""
         super().add_row(**kwargs)
+        self._rows_added()
+
+    @instrumented
+    @docval({'name': 'spike_times', 'type': 'array_data', 'default': None, 'shape': (None,),
+             'doc': 'Spike times of all units, concatenated in unit order'},
+            {'name': 'spike_times_counts', 'type': 'array_data', 'default': None, 'shape': (None,),
+             'doc': 'Number of spike times of each unit'},
+            {'name': 'obs_intervals', 'type': 'array_data', 'default': None, 'shape': (None, 2),
+             'doc': 'Observation intervals of all units, concatenated in unit order'},
+            {'name': 'obs_intervals_counts', 'type': 'array_data', 'default': None, 'shape': (None,),
+             'doc': 'Number of observation intervals of each unit'},
+            {'name': 'electrode', 'type': 'array_data', 'default': None,
+             'doc': 'Electrode that each unit came from'},
+            {'name': 'waveform_mean', 'type': 'array_data', 'default': None, 'shape': (None, None),
+             'doc': 'Spike waveform mean for each unit. Shape is (num_units, time)'},
+            {'name': 'waveform_sd', 'type': 'array_data', 'default': None, 'shape': (None, None),
+             'doc': 'Spike waveform standard deviation for each unit. Shape is (num_units, time)'},
+            {'name': 'id', 'type': 'array_data', 'default': None, 'doc': 'ID for each unit'},
+            allow_extra=True)
+    def add_units(self, **kwargs):
+        """Add many units to this table at once.
+
+        Ragged columns are given as the values of all units concatenated together plus the number of values of
+        each unit. Extra keyword arguments give the values of custom columns already in the table, one per unit.
+        All arguments are validated once and each column is extended with a whole array instead of row by row.
+        """
+        ids = popargs('id', kwargs)
+        values = dict()
+        counts = dict()
+        for name in ('spike_times', 'obs_intervals'):
+            col_values, col_counts = popargs(name, name + '_counts', kwargs)
+            if (col_values is None) != (col_counts is None):
+                raise ValueError("'%s' and '%s_counts' must be given together" % (name, name))
+            if col_values is None:
+                continue
+            col_values = np.asarray(col_values, dtype=np.float64)
+            col_counts = np.asarray(col_counts, dtype=np.int64)
+            if np.any(col_counts < 0) or col_counts.sum() != len(col_values):
+                raise ValueError("'%s_counts' must be non-negative and sum to the length of '%s' (%d)"
+                                 % (name, name, len(col_values)))
+            values[name] = col_values
+            counts[name] = col_counts
+        values.update((name, val) for name, val in kwargs.items() if val is not None)
+
+        num_units = {len(counts[name]) if name in counts else len(val) for name, val in values.items()}
+        if ids is not None:
+            num_units.add(len(ids))
+        if len(num_units) > 1:
+            raise ValueError("all arguments of add_units must describe the same number of units")
+        num_units = num_units.pop() if num_units else 0
+        ids = np.arange(len(self), len(self) + num_units) if ids is None else np.asarray(ids, dtype=np.int64)
+
+        self.__check_bulk_columns(values, counts)
+        for name in values:
+            if name not in self.colnames:
+                spec = next(col for col in self.__columns__ if col['name'] == name)
+                self.add_column(name=name, description=spec['description'], index=spec.get('index', False))
+
+        # VectorData.extend adds values one row at a time, so extend the underlying data in one step instead
+        Data.extend(self.id, ids.tolist())
+        for name, val in values.items():
+            val = val.tolist() if isinstance(val, np.ndarray) else list(val)
+            if name in counts:
+                index = self[name]
+                offsets = np.cumsum(counts[name]) + len(index.target)
+                Data.extend(index.target, val)
+                Data.extend(index, offsets.tolist())
+            else:
+                Data.extend(self[name], val)
+        self._rows_added()
+
+    def __check_bulk_columns(self, values, counts):
+        """Check that the columns given to add_units match the columns of this table, that electrodes are
+        IntracellularElectrodes and that waveforms all have the same number of samples as the waveforms in the
+        table."""
+        predefined = {col['name'] for col in self.__columns__}
+        for electrode in values.get('electrode', ()):
+            if not isinstance(electrode, IntracellularElectrode):
+                raise TypeError("electrode must be IntracellularElectrode, got %s" % type(electrode).__name__)
+        for name in ('waveform_mean', 'waveform_sd'):
+            if name not in values:
+                continue
+            widths = {len(row) for row in values[name]}
+            if name in self.colnames and len(self[name].data):
+                widths.add(get_data_shape(self[name].data)[1])
+            if len(widths) > 1:
+                raise ValueError("all rows of '%s' must have the same number of samples, got %s"
+                                 % (name, sorted(widths)))
+        for name in values:
+            if name in self.colnames:
+                is_ragged = isinstance(self[name], VectorIndex)
+                if is_ragged and name not in counts:
+                    raise ValueError("column '%s' is ragged and cannot be added with add_units" % name)
+            elif len(self) > 0 or name not in predefined:
+                raise ValueError("column '%s' is not in %s '%s'. Add it with add_column before adding units."
+                                 % (name, self.__class__.__name__, self.name))
+        missing = [name for name in self.colnames if name not in values]
+        if missing:
+            raise ValueError("missing columns for add_units: %s" % ", ".join(missing))
+
+    @docval(*get_docval(DynamicTable.add_row), allow_extra=True)
+    def add_row(self, **kwargs):
+        """Add a row to this table. Prefer add_unit for adding units."""
+        call_docval_func(super().add_row, kwargs)
+        self._rows_added()
+
+    @docval(*get_docval(DynamicTable.add_column), allow_extra=True)
+    def add_column(self, **kwargs):
+        """Add a column to this table."""
+        call_docval_func(super().add_column, kwargs)
+        if self._cache is not None:
+            self._cache.invalidate(kwargs['name'])
+            self._cache.invalidate(kwargs['name'] + '_index')
+        self._memmaps.pop(kwargs['name'], None)
+        self._memmaps.pop(kwargs['name'] + '_index', None)
+        if kwargs['name'] == 'obs_intervals':
+            self._obs_interval_index = None
+        if kwargs['name'] == 'spike_times':
+            self._spike_times_sorted = None
+        if kwargs['name'] == 'electrode':
+            self._electrodes = None
+            self._electrode_rows = None
+
+    def _rows_added(self):
+        """Update derived state after rows were appended to the table."""
+        if self._cache is not None:
+            self._cache.invalidate(partial_only=True)
+        self._memmaps.clear()
+        if self._spike_times_sorted:
+            self._spike_times_sorted = None
+
+    @docval({'name': 'max_bytes', 'type': int, 'default': None,
+             'doc': 'the memory budget of the cache, in bytes. By default, the cache is unbounded'},
+            {'name': 'block_size', 'type': int, 'default': 2 ** 20,
+             'doc': 'the number of elements of a column loaded and evicted together'})
+    def enable_cache(self, **kwargs):
+        """Cache the spike_times and obs_intervals columns and their indices in memory as NumPy arrays.
+
+        Columns are loaded on first access in blocks of block_size elements. When max_bytes is set, the least
+        recently used blocks are evicted to stay within the budget. Adding units or columns keeps the cache
+        consistent with the table.
+        """
+        max_bytes, block_size = getargs('max_bytes', 'block_size', kwargs)
+        self._cache = ColumnBlockCache(max_bytes=max_bytes, block_size=block_size)
+
+    def disable_cache(self):
+        """Stop caching column data and release the cached arrays."""
+        self._cache = None
+
+    def enable_memmap(self):
+        """Read the spike_times and obs_intervals columns and their indices through memory maps of the file.
+
+        Only columns stored contiguously and uncompressed in an HDF5 file opened read-only are mapped. Queries on
+        mapped columns slice the mapped arrays without copying, and processes reading the same file share the OS
+        page cache. Memory maps take precedence over the cache.
+
+        Returns the names of the datasets that were mapped.
+        """
+        for name in ('spike_times', 'obs_intervals'):
+            if name not in self.colnames:
+                continue
+            for col in (self[name], self[name].target):
+                mapped = memmap_dataset(col.data)
+                if mapped is not None:
+                    self._memmaps[col.name] = mapped
+        return sorted(self._memmaps)
+
+    def disable_memmap(self):
+        """Stop reading columns through memory maps."""
+        self._memmaps.clear()
+
+    @docval({'name': 'max_workers', 'type': int, 'default': 8,
+             'doc': 'the number of threads to read with'})
+    def enable_parallel_reads(self, **kwargs):
+        """Read chunked columns, such as columns of a Zarr store, with a pool of threads.
+
+        Reads of a range of rows spanning several chunks, such as the reads of batched queries, are split into runs
+        of whole chunks that are read concurrently. This pays off for stores that can serve concurrent reads, like
+        Zarr directory stores, whereas reads of HDF5 files are serialized by the HDF5 library. Memory maps and the
+        cache take precedence over parallel reads.
+        """
+        max_workers = getargs('max_workers', kwargs)
+        if not max_workers > 0:
+            raise ValueError("max_workers must be positive, got %d" % max_workers)
+        self.disable_parallel_reads()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._read_workers = max_workers
+
+    def disable_parallel_reads(self):
+        """Stop reading columns with a pool of threads and shut the pool down."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._executor = None
+        self._read_workers = 1
+
+    @docval({'name': 'units_per_chunk', 'type': int, 'default': 16,
+             'doc': 'the average number of units whose values are stored in one chunk'},
+            {'name': 'compressor', 'type': None, 'default': None,
+             'doc': 'the numcodecs compressor of the columns. By default, the default compressor of Zarr is used'})
+    def set_zarr_io(self, **kwargs):
+        """Set the chunking of the columns of this table for writing with NWBZarrIO of hdmf-zarr.
+
+        The values of the ragged columns, the waveform columns and the indices are chunked along units so that one
+        chunk holds the values of about units_per_chunk units, rounded to a power of two and kept between 2**10 and
+        2**20 values, which suits reading one unit or a few neighbouring units at a time. The electrode column is
+        left as it is. Call this after adding all units and before writing. Requires hdmf-zarr.
+
+        Raises a ValueError if a column is already wrapped in a DataIO other than ZarrDataIO, such as the HDF5
+        scale-offset encoding set by encode_spike_times, which Zarr cannot write.
+        """
+        units_per_chunk, compressor = getargs('units_per_chunk', 'compressor', kwargs)
+        try:
+            from hdmf_zarr import ZarrDataIO
+        except ImportError as e:
+            raise ImportError("set_zarr_io requires hdmf-zarr, which can be installed with "
+                              "'pip install hdmf-zarr'") from e
+        if not units_per_chunk > 0:
+            raise ValueError("units_per_chunk must be positive, got %d" % units_per_chunk)
+        for colname in self.colnames:
+            columns = [self[colname]] + ([self[colname].target] if isinstance(self[colname], VectorIndex) else [])
+            for column in columns:
+                if isinstance(column.data, DataIO) and not isinstance(column.data, ZarrDataIO):
+                    raise ValueError("column '%s' of %s '%s' is wrapped in %s, which set_zarr_io cannot replace"
+                                     % (column.name, self.__class__.__name__, self.name,
+                                        type(column.data).__name__))
+        num_units = max(len(self), 1)
 
+        def chunk_rows(num_rows, row_size=1):
+            rows = max(num_rows * units_per_chunk // num_units, 1)
+            rows = 2 ** int(np.ceil(np.log2(rows)))
+            return int(np.clip(rows, max(2 ** 10 // row_size, 1), max(2 ** 20 // row_size, 1)))
+
+        for colname in self.colnames:
+            if colname == 'electrode':
+                continue
+            columns = [self[colname]]
+            if isinstance(self[colname], VectorIndex):
+                columns.append(self[colname].target)
+            for column in columns:
+                data = column.data.data if isinstance(column.data, DataIO) else column.data
+                if not len(data):
+                    continue
+                shape = np.shape(data)
+                row_size = int(np.prod(shape[1:], dtype=np.int64))
+                chunks = (min(chunk_rows(shape[0], row_size), shape[0]),) + tuple(shape[1:])
+                io_kwargs = dict(chunks=chunks) if compressor is None else dict(chunks=chunks, compressor=compressor)
+                column.transform(lambda _, data=data: data)
+                column.set_data_io(ZarrDataIO, io_kwargs)
+
+    @docval({'name': 'resolution', 'type': float, 'default': None,
+             'doc': 'the resolution to store spike times at. By default, the resolution of this table is used'},
+            {'name': 'compression', 'type': (str, bool, int), 'default': 'gzip',
+             'doc': 'the compression filter to apply after packing the spike times, or False for none'},
+            {'name': 'compression_opts', 'type': (int, tuple), 'default': None,
+             'doc': 'the parameters of the compression filter'})
+    def encode_spike_times(self, **kwargs):
+        """Store the spike times as integer multiples of the resolution when this table is written to HDF5.
+
+        Spike times are rounded to the nearest multiple of the resolution and written with the HDF5 scale-offset
+        filter, which stores each chunk as integers relative to its minimum, packed into as few bits as the
+        chunk needs, followed by the shuffle and compression filters. The resolution is written as the resolution
+        attribute of spike_times. Reading the file decodes the spike times back to float64 seconds transparently.
+
+        Call this after adding all units and before writing. Spike times added afterwards are packed too, but not
+        rounded.
+        """
+        resolution, compression, compression_opts = getargs('resolution', 'compression', 'compression_opts', kwargs)
+        if resolution is None:
+            resolution = self.resolution
+        if resolution is None:
+            raise ValueError("%s '%s' has no resolution. Set the resolution to encode spike times at."
+                             % (self.__class__.__name__, self.name))
+        if self.resolution is None:
+            self.resolution = resolution
+        elif resolution != self.resolution:
+            raise ValueError("%s '%s' already has resolution %s"
+                             % (self.__class__.__name__, self.name, self.resolution))
+        digits = resolution_digits(resolution)
+        if 'spike_times' not in self.colnames:
+            return
+        target = self['spike_times'].target
+        data = target.data
+        if isinstance(data, DataIO):
+            data = data.data
+        if isinstance(data, list):
+            data[:] = quantize(data, resolution).tolist()
+        elif isinstance(data, np.ndarray):
+            data[:] = quantize(data, resolution)
+        else:
+            raise ValueError("cannot encode spike times that are already stored in a file")
+        if self._cache is not None:
+            self._cache.invalidate('spike_times')
+        if not len(data):
+            return
+        target.transform(lambda _: data)
+        target.set_data_io(ScaleOffsetDataIO, dict(scaleoffset=digits, shuffle=True, chunks=True,
+                                                   compression=compression, compression_opts=compression_opts))
+
+    @instrumented
     @docval({'name': 'index', 'type': (int, list, tuple, np.ndarray),
              'doc': 'the index of the unit in unit_ids to retrieve spike times for'},
             {'name': 'in_interval', 'type': (tuple, list), 'doc': 'only return values within this interval',
@@ -57,24 +391,760 @@ class ICEphysUnits(DynamicTable):
     def get_unit_spike_times(self, **kwargs):
         """Get spike times for a unit within the given time interval."""
         index, in_interval = getargs('index', 'in_interval', kwargs)
-        if type(index) in (list, tuple):
-            return [self.get_unit_spike_times(i, in_interval=in_interval) for i in index]
+        if np.ndim(index) > 0:
+            if len(index) == 0:
+                return []
+            values, offsets = self.query_spike_times(index, in_interval)
+            return np.split(values, offsets[1:-1])
+        if in_interval is not None and self._spike_times_sorted is False:
+            return self.query_spike_times([index], in_interval)[0]
         if in_interval is None:
-            return np.asarray(self['spike_times'][index])
+            return self._read_unit('spike_times', index)
+        if self._cache is not None or self._memmaps:
+            values = self._read_unit('spike_times', index)
+            return values[np.searchsorted(values, in_interval[0], side='left'):
+                          np.searchsorted(values, in_interval[1], side='right')]
         else:
             st = self['spike_times']
-            unit_start = 0 if index == 0 else st.data[index - 1]
-            unit_stop = st.data[index]
+            data, target = counted(st.data), counted(st.target)
+            unit_start = 0 if index == 0 else data[index - 1]
+            unit_stop = data[index]
             start_time, stop_time = in_interval
 
-            ind_start = bisect_left(st.target, start_time, unit_start, unit_stop)
-            ind_stop = bisect_right(st.target, stop_time, ind_start, unit_stop)
+            ind_start = bisect_left(target, start_time, unit_start, unit_stop)
+            ind_stop = bisect_right(target, stop_time, ind_start, unit_stop)
+
+            return np.asarray(target[ind_start:ind_stop])
+
+    @instrumented
+    @docval({'name': 'index', 'type': 'array_data', 'doc': 'the indices of the units to retrieve spike times for'},
+            {'name': 'intervals', 'type': 'array_data',
+             'doc': ('the (start, stop) interval for each entry of index, shape (len(index), 2), or a single '
+                     '(start, stop) interval applied to all units'),
+             'default': None})
+    def query_spike_times(self, **kwargs):
+        """Get spike times for many units, each within its own time interval, in one batched pass.
+
+        The unit boundaries are read with one read of spike_times_index and the spike times with one read of the
+        span of spike_times covering the requested units, or with one read per run of adjacent units if the units
+        are far apart. All interval boundaries are then resolved with a single vectorized search. A unit may be
+        listed several times to query it over several intervals.
+
+        Returns a tuple (values, offsets): the spike times for entry k are values[offsets[k]:offsets[k + 1]].
+        """
+        index, intervals = getargs('index', 'intervals', kwargs)
+        index = self._normalize_unit_index(index)
+        starts, stops = self._read_ragged_bounds('spike_times', index)
+        if intervals is not None:
+            intervals = np.asarray(intervals, dtype=np.float64)
+            if intervals.shape == (2,):
+                intervals = np.broadcast_to(intervals, (index.size, 2))
+            elif intervals.shape != (index.size, 2):
+                raise ValueError("intervals must have shape (2,) or (%d, 2), got %s"
+                                 % (index.size, str(intervals.shape)))
+        if index.size == 0:
+            return np.zeros(0, dtype=np.float64), np.zeros(1, dtype=np.int64)
+
+        target = self['spike_times'].target
+        values, starts, stops = self._read_column_ranges(target.name, target.data, starts, stops)
+        if intervals is not None and self._spike_times_sorted is False:
+            # searching needs sorted spike times, so filter all spike times of each unit instead
+            values, offsets = gather_segments(values, starts, stops)
+            entry = np.repeat(np.arange(index.size), np.diff(offsets))
+            keep = (values >= intervals[entry, 0]) & (values <= intervals[entry, 1])
+            offsets = np.zeros(index.size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(entry[keep], minlength=index.size), out=offsets[1:])
+            return values[keep], offsets
+        if intervals is not None:
+            starts = segment_searchsorted(values, starts, stops, intervals[:, 0], side='left')
+            stops = segment_searchsorted(values, starts, stops, intervals[:, 1], side='right')
+        return gather_segments(values, starts, stops)
+
+    @property
+    def spike_times_sorted(self):
+        """Whether the spike times of every unit are known to be sorted, as recorded by check_integrity.
+
+        None if the table was not checked since it was created or since units were added.
+        """
+        return self._spike_times_sorted
+
+    @instrumented
+    @docval({'name': 'chunk_size', 'type': int, 'default': None,
+             'doc': 'the number of units to check at once. By default, all units are checked at once'},
+            {'name': 'raise_error', 'type': bool, 'default': True,
+             'doc': 'raise a ValueError listing the problems found, if any'})
+    def check_integrity(self, **kwargs):
+        """Check that the data in this table is consistent.
+
+        Checks that the indices of ragged columns are monotonic and match the length of their target, that the
+        spike times of each unit are sorted, that each spike time falls within an observation interval of its unit,
+        and that the waveform columns have one row per unit, all of the same length. Spike times and observation
+        intervals are checked block by block with chunk_size units per block, so file-backed tables can be checked
+        without loading them whole. The observation intervals of a unit are assumed not to overlap.
+
+        Whether the spike times are sorted is recorded in spike_times_sorted. Batched queries fall back to filtering
+        instead of searching if the spike times are known not to be sorted.
+
+        Returns a list of the problems found, which is empty if the table is consistent.
+        """
+        chunk_size, raise_error = getargs('chunk_size', 'raise_error', kwargs)
+        if chunk_size is not None and not chunk_size > 0:
+            raise ValueError("chunk_size must be positive, got %d" % chunk_size)
+        problems = list()
+        offsets = dict()
+        for name in self.colnames:
+            if not isinstance(self[name], VectorIndex):
+                continue
+            col_offsets = self._read_ragged_offsets(name)
+            if np.any(np.diff(col_offsets) < 0):
+                problems.append("index of column '%s' is not monotonically increasing at units %s"
+                                % (name, self.__format_units(np.flatnonzero(np.diff(col_offsets) < 0))))
+            elif col_offsets[-1] != len(self[name].target):
+                problems.append("index of column '%s' ends at %d but the column has %d elements"
+                                % (name, col_offsets[-1], len(self[name].target)))
+            else:
+                offsets[name] = col_offsets
+
+        # the spike times are only known to be sorted if they were all checked
+        self._spike_times_sorted = None
+        if 'spike_times' in offsets:
+            unsorted, outside = self.__check_spike_times(offsets, chunk_size or max(len(self), 1))
+            if unsorted.size:
+                problems.append("spike times are not sorted for units %s" % self.__format_units(unsorted))
+            if outside.size:
+                problems.append("spike times fall outside of the observation intervals for units %s"
+                                % self.__format_units(outside))
+            self._spike_times_sorted = unsorted.size == 0
+
+        shapes = dict()
+        for name in ('waveform_mean', 'waveform_sd'):
+            if name not in self.colnames:
+                continue
+            data = self[name].data
+            if hasattr(data, 'shape'):
+                lengths = {data.shape[1]} if len(data.shape) == 2 else set()
+            else:
+                lengths = {len(row) for row in data}
+            if len(data) != len(self) or len(lengths) != 1:
+                problems.append("column '%s' does not have one row of the same length per unit" % name)
+            else:
+                shapes[name] = lengths.pop()
+        if len(shapes) == 2 and shapes['waveform_mean'] != shapes['waveform_sd']:
+            problems.append("waveform_mean has %d samples but waveform_sd has %d samples"
+                            % (shapes['waveform_mean'], shapes['waveform_sd']))
+
+        if problems and raise_error:
+            raise ValueError("%s '%s' is inconsistent: %s" % (self.__class__.__name__, self.name, "; ".join(problems)))
+        return problems
+
+    def __check_spike_times(self, offsets, chunk_size):
+        """Find the units with unsorted spike times and with spike times outside of their observation intervals."""
+        unsorted = list()
+        outside = list()
+        st_offsets = offsets['spike_times']
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            local = st_offsets[start:stop + 1] - st_offsets[start]
+            values = self._read_ragged_target('spike_times', st_offsets[start], st_offsets[stop])
+            # a decrease at the first spike of a unit is between units and does not count
+            decreasing = np.flatnonzero(np.diff(values) < 0) + 1
+            units = np.searchsorted(local, decreasing, side='right') - 1
+            unsorted.append(np.unique(units[local[units] != decreasing]) + start)
+            if 'obs_intervals' not in offsets:
+                continue
+            oi_offsets = offsets['obs_intervals']
+            oi_local = oi_offsets[start:stop + 1] - oi_offsets[start]
+            intervals = self._read_ragged_target('obs_intervals', oi_offsets[start], oi_offsets[stop])
+            intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+            interval_units = np.repeat(np.arange(stop - start), np.diff(oi_local))
+            intervals = intervals[np.lexsort((intervals[:, 0], interval_units))]
+            spike_units = np.repeat(np.arange(stop - start), np.diff(local))
+            inside = np.zeros(values.size, dtype=bool)
+            if intervals.size:
+                # the last interval of the unit starting at or before each spike must contain it
+                last = segment_searchsorted(intervals[:, 0], oi_local[spike_units], oi_local[spike_units + 1], values,
+                                            side='right') - 1
+                inside = (last >= oi_local[spike_units]) & (intervals[np.maximum(last, 0), 1] >= values)
+            outside.append(np.unique(spike_units[~inside]) + start)
+        return (np.concatenate(unsorted) if unsorted else np.zeros(0, dtype=np.int64),
+                np.concatenate(outside) if outside else np.zeros(0, dtype=np.int64))
+
+    @staticmethod
+    def __format_units(units, max_units=10):
+        units = [str(u) for u in units]
+        if len(units) > max_units:
+            units = units[:max_units] + ['... (%d units)' % len(units)]
+        return '[%s]' % ', '.join(units)
+
+    def _normalize_unit_index(self, index):
+        """Return the given unit indices as a flat int64 array of non-negative row indices."""
+        index = np.asarray(index, dtype=np.int64).ravel()
+        n = len(self)
+        if np.any((index < -n) | (index >= n)):
+            raise IndexError("unit index out of range for ICEphysUnits with %d units" % n)
+        return np.where(index < 0, index + n, index)
+
+    def _read_ragged_offsets(self, name):
+        """Read the index of a ragged column as an int64 array of len(self) + 1 boundaries starting at 0."""
+        index = self[name]
+        offsets = np.zeros(len(index.data) + 1, dtype=np.int64)
+        if len(index.data):
+            offsets[1:] = self._read_column_data(index.name, index.data, 0, len(index.data))
+        return offsets
+
+    def _read_ragged_bounds(self, name, index):
+        """Read the (starts, stops) of the given units in the flat target of a ragged column, as int64 arrays, reading
+        only the entries of the index of the column around these units."""
+        vector_index = self[name]
+        values, lo, _ = self._read_column_ranges(vector_index.name, vector_index.data, np.maximum(index - 1, 0),
+                                                 index + 1)
+        values = np.asarray(values, dtype=np.int64)
+        starts = np.where(index > 0, values[lo], 0)
+        stops = values[lo + (index > 0)]
+        return starts, stops
 
-            return np.asarray(st.target[ind_start:ind_stop])
+    def _read_ragged_target(self, name, start, stop):
+        """Read the elements [start, stop) of the flat target of a ragged column as a NumPy array."""
+        target = self[name].target
+        return self._read_column_data(target.name, target.data, start, stop)
 
+    def _read_ragged(self, name, index=None):
+        """Read the values of a ragged column for the given units (by default, all units) as a tuple
+        (values, offsets), where the values of the k-th unit are values[offsets[k]:offsets[k + 1]]."""
+        if index is None:
+            offsets = self._read_ragged_offsets(name)
+            return self._read_ragged_target(name, 0, offsets[-1]), offsets
+        index = self._normalize_unit_index(index)
+        if index.size == 0:
+            return self._read_ragged_target(name, 0, 0), np.zeros(1, dtype=np.int64)
+        target = self[name].target
+        return gather_segments(*self._read_column_ranges(target.name, target.data,
+                                                         *self._read_ragged_bounds(name, index)))
+
+    def _read_column_ranges(self, key, data, starts, stops):
+        """Read the rows [starts[k], stops[k]) of the data of a column as a tuple (values, starts, stops), where the
+        rows of range k are values[starts[k]:stops[k]].
+
+        The span covering all ranges is read at once if it is not much longer than the ranges, and otherwise each
+        run of overlapping or adjacent ranges is read on its own, so that sparse selections read only what they
+        need.
+        """
+        run_starts, run_stops, new_starts, new_stops = merge_ranges(starts, stops)
+        if run_starts.size == 0:
+            return self._read_column_data(key, data, 0, 0), new_starts, new_stops
+        lo, hi = int(run_starts[0]), int(run_stops.max())
+        if hi - lo <= (run_stops - run_starts).sum() + _READ_CALL_ELEMENTS * (run_starts.size - 1):
+            starts = np.asarray(starts, dtype=np.int64).ravel()
+            stops = np.asarray(stops, dtype=np.int64).ravel()
+            empty = stops <= starts
+            return (self._read_column_data(key, data, lo, hi), np.where(empty, 0, starts - lo),
+                    np.where(empty, 0, stops - lo))
+        values = np.concatenate([self._read_column_data(key, data, int(start), int(stop))
+                                 for start, stop in zip(run_starts, run_stops)])
+        return values, new_starts, new_stops
+
+    def _read_unit(self, name, index):
+        """Read the values of a ragged column for a single unit."""
+        index = int(self._normalize_unit_index(index)[0])
+        vector_index = self[name]
+        if index == 0:
+            start, stop = 0, int(self._read_column_data(vector_index.name, vector_index.data, 0, 1)[0])
+        else:
+            start, stop = self._read_column_data(vector_index.name, vector_index.data, index - 1, index + 1)
+        return self._read_ragged_target(name, int(start), int(stop))
+
+    def _read_column_data(self, key, data, start, stop):
+        """Read the rows [start, stop) of the data of a column as a NumPy array, using a memory map or the cache if
+        enabled."""
+        if key in self._memmaps:
+            values = self._memmaps[key][start:stop]
+            # memory-mapped reads make no read calls
+            record_read(values.nbytes, calls=0)
+            return values
+        if self._cache is not None:
+            return self._cache.read(key, counted(data), start, stop)
+        if self._executor is not None:
+            values, calls = read_chunked(data, start, stop, self._executor, self._read_workers)
+            record_read(values.nbytes, calls=calls)
+            return values
+        return np.asarray(counted(data)[start:stop])
+
+    @docval({'name': 'columns', 'type': (str, list, tuple), 'default': 'spike_times',
+             'doc': "the ragged column, or list of ragged columns, to read, of 'spike_times' and 'obs_intervals'"},
+            {'name': 'max_bytes', 'type': int, 'default': 2 ** 26,
+             'doc': ('the budget of the values of a block, in bytes. The index is read ahead by up to as many bytes to '
+                     'find the units of a block')},
+            {'name': 'read_ahead', 'type': bool, 'default': False,
+             'doc': 'read the next block on a background thread while the current block is processed'})
+    def iter_unit_blocks(self, **kwargs):
+        """Iterate over the units of this table in blocks whose values fit within a budget of max_bytes bytes.
+
+        Each block is read with one contiguous read of the index and of the values of each column, and of the IDs.
+        A block holds as many consecutive units as fit within the budget, and at least one unit, so a unit with
+        more values than the budget makes up a block on its own. The entries of the index read past the end of a
+        block are carried over to the next block instead of being read again. With read_ahead, the next block is
+        read on a background thread while the current block is processed, so up to two blocks are held in memory.
+
+        Yields tuples (ids, values, offsets), where the values of the k-th unit of the block are
+        values[offsets[k]:offsets[k + 1]]. If columns is a list, values and offsets are dicts by column name.
+        """
+        columns, max_bytes, read_ahead = getargs('columns', 'max_bytes', 'read_ahead', kwargs)
+        names = [columns] if isinstance(columns, str) else list(columns)
+        for name in names:
+            if name not in ('spike_times', 'obs_intervals'):
+                raise ValueError("columns must be of 'spike_times' and 'obs_intervals', got '%s'" % name)
+            if name not in self.colnames:
+                raise ValueError("%s '%s' has no %s column" % (self.__class__.__name__, self.name, name))
+        if not max_bytes > 0:
+            raise ValueError("max_bytes must be positive, got %d" % max_bytes)
+        if not names:
+            raise ValueError("columns must not be empty")
+        num_units = len(self)
+        row_bytes = dict()
+        for name in names:
+            data = self[name].target.data
+            row_bytes[name] = (np.dtype(getattr(data, 'dtype', np.float64)).itemsize
+                               * int(np.prod(get_data_shape(data)[1:], dtype=np.int64)))
+        # the number of units whose index entries fit within the budget
+        max_units = max(max_bytes // (8 * len(names)), 1)
+
+        def read_block(first, tails):
+            # tails[name] holds the boundaries of the units from first on that were already read, starting with the
+            # start of unit first
+            last = min(first + max_units, num_units)
+            bounds = dict()
+            block_bytes = np.zeros(last - first, dtype=np.int64)
+            for name in names:
+                ends = tails[name]
+                read_to = first + ends.size - 1
+                if read_to < last:
+                    index = self[name]
+                    ends = np.concatenate([ends, np.asarray(self._read_column_data(index.name, index.data, read_to,
+                                                                                   last), dtype=np.int64)])
+                bounds[name] = ends
+                block_bytes += np.diff(ends[:last - first + 1]) * row_bytes[name]
+            # take as many units as fit within the budget, and at least one
+            last = first + max(int(np.searchsorted(np.cumsum(block_bytes), max_bytes, side='right')), 1)
+            values, offsets, tails = dict(), dict(), dict()
+            for name in names:
+                ends = bounds[name][:last - first + 1]
+                offsets[name] = ends - ends[0]
+                values[name] = self._read_ragged_target(name, int(ends[0]), int(ends[-1]))
+                tails[name] = bounds[name][last - first:]
+            ids = self._read_column_data(self.id.name, self.id.data, first, last)
+            if isinstance(columns, str):
+                return last, tails, (ids, values[columns], offsets[columns])
+            return last, tails, (ids, values, offsets)
+
+        tails = {name: np.zeros(1, dtype=np.int64) for name in names}
+        if not read_ahead:
+            first = 0
+            while first < num_units:
+                first, tails, block = read_block(first, tails)
+                yield block
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(read_block, 0, tails) if num_units else None
+            while future is not None:
+                last, tails, block = future.result()
+                future = executor.submit(read_block, last, tails) if last < num_units else None
+                yield block
+
+    @instrumented
+    @docval({'name': 'start', 'type': (int, float), 'doc': 'the start of the time window'},
+            {'name': 'stop', 'type': (int, float), 'doc': 'the stop of the time window'},
+            {'name': 'name', 'type': str, 'default': None,
+             'doc': 'the name of the new table. By default, the name of this table'},
+            {'name': 'lazy', 'type': bool, 'default': False,
+             'doc': 'return an ICEphysUnitsTimeSlice view that reads from this table on access instead of a copy'})
+    def time_slice(self, **kwargs):
+        """Get a new ICEphysUnits table with the same units restricted to the closed time window [start, stop].
+
+        Each unit keeps its spike times within the window, like get_unit_spike_times with in_interval, and its
+        observation intervals clipped to the window, dropping the ones that do not overlap it. Intervals that only
+        touch the window are kept with zero width, so that spikes on the edges of the window stay observed. The new
+        offsets of both ragged columns are computed from the flat columns with one vectorized search over all units.
+        All other columns, including electrode, the waveforms and custom columns, are carried over with one read per
+        column, along with the unit IDs, the resolution and the waveform rate. Custom ragged columns are not supported.
+        """
+        start, stop, name, lazy = getargs('start', 'stop', 'name', 'lazy', kwargs)
+        if not stop >= start:
+            raise ValueError("time_slice requires stop >= start, got %s" % str((start, stop)))
+        if lazy:
+            return ICEphysUnitsTimeSlice(self, start, stop)
+        columns = dict()
+        units = np.arange(len(self))
+        if 'spike_times' in self.colnames:
+            values, offsets = self.query_spike_times(units, [start, stop])
+            columns['spike_times'], columns['spike_times_counts'] = values, np.diff(offsets)
+        if 'obs_intervals' in self.colnames:
+            intervals, interval_units, _ = self.__read_obs_intervals(None)
+            # intervals touching the window are kept with zero width, since spikes on the window edges are kept
+            keep = (intervals[:, 1] >= start) & (intervals[:, 0] <= stop)
+            keep &= intervals[:, 1] >= intervals[:, 0]
+            intervals = np.clip(intervals, start, stop)
+            columns['obs_intervals'] = intervals[keep]
+            columns['obs_intervals_counts'] = np.bincount(interval_units[keep], minlength=len(self))
+        for colname in self.colnames:
+            if colname in columns:
+                continue
+            column = self[colname]
+            if isinstance(column, VectorIndex):
+                raise ValueError("time_slice does not support the ragged column '%s'" % colname)
+            if colname == 'electrode':
+                columns[colname] = list(self.get_unit_electrodes())
+            else:
+                columns[colname] = self._read_column_data(column.name, column.data, 0, len(self))
+
+        table = ICEphysUnits(name=name or self.name, description=self.description, resolution=self.resolution,
+                             waveform_rate=self.waveform_rate)
+        for colname in self.colnames:
+            column = self[colname]
+            is_ragged = isinstance(column, VectorIndex)
+            table.add_column(name=colname, description=(column.target if is_ragged else column).description,
+                             index=is_ragged, table=getattr(column, 'table', False))
+        table.add_units(id=self._read_column_data(self.id.name, self.id.data, 0, len(self)), **columns)
+        return table
+
+    @instrumented
     @docval({'name': 'index', 'type': int,
              'doc': 'the index of the unit in unit_ids to retrieve observation intervals for'})
     def get_unit_obs_intervals(self, **kwargs):
         """Get the observation intervals for a given unit"""
         index = getargs('index', kwargs)
-        return np.asarray(self['obs_intervals'][index])
+        return self._read_unit('obs_intervals', index)
+
+    @instrumented
+    @docval({'name': 'index', 'type': 'array_data', 'default': None,
+             'doc': 'the indices of the units to compute durations for. By default, all units are used'},
+            {'name': 'bin_edges', 'type': 'array_data', 'default': None,
+             'doc': 'the sorted edges of time bins to compute durations in. By default, durations are not binned'})
+    def get_obs_durations(self, **kwargs):
+        """Get the total duration of the observation intervals of each unit.
+
+        The observation intervals of a unit are assumed not to overlap. Returns an array of shape (units,), or
+        (units, bins) if bin_edges is given, holding the observed time of each unit within each bin.
+        """
+        index, bin_edges = getargs('index', 'bin_edges', kwargs)
+        intervals, interval_units, num_units = self.__read_obs_intervals(index)
+        if bin_edges is None:
+            return np.bincount(interval_units, weights=intervals[:, 1] - intervals[:, 0], minlength=num_units)
+        bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        interval_ids, bins, starts, stops = self.__split_intervals(intervals, bin_edges)
+        flat = interval_units[interval_ids] * (bin_edges.size - 1) + bins
+        durations = np.bincount(flat, weights=stops - starts, minlength=num_units * (bin_edges.size - 1))
+        return durations.reshape(num_units, bin_edges.size - 1)
+
+    @instrumented
+    @docval({'name': 'index', 'type': 'array_data', 'default': None,
+             'doc': 'the indices of the units to count spikes for. By default, all units are used'},
+            {'name': 'bin_edges', 'type': 'array_data', 'default': None,
+             'doc': 'the sorted edges of time bins to count spikes in. By default, spikes are not binned'},
+            {'name': 'in_obs_intervals', 'type': bool, 'default': True,
+             'doc': 'only count spikes within the observation intervals of each unit, if the table has them'})
+    def get_spike_counts(self, **kwargs):
+        """Get the number of spikes of each unit, restricted to its observation intervals.
+
+        Spikes on the boundary of an observation interval are counted, like in get_unit_spike_times. When binned,
+        bins are half-open, [edge, next edge), and so are the observation intervals. Returns an integer array of
+        shape (units,), or (units, bins) if bin_edges is given.
+        """
+        index, bin_edges, in_obs_intervals = getargs('index', 'bin_edges', 'in_obs_intervals', kwargs)
+        spike_times, spike_offsets = self._read_ragged('spike_times', index)
+        num_units = spike_offsets.size - 1
+        if not in_obs_intervals or 'obs_intervals' not in self.colnames:
+            if bin_edges is None:
+                return np.diff(spike_offsets)
+            intervals = np.array([[-np.inf, np.inf]] * num_units).reshape(-1, 2)
+            interval_units = np.arange(num_units)
+        else:
+            intervals, interval_units, _ = self.__read_obs_intervals(index)
+        unit_starts = spike_offsets[interval_units]
+        unit_stops = spike_offsets[interval_units + 1]
+        if bin_edges is None:
+            lo = segment_searchsorted(spike_times, unit_starts, unit_stops, intervals[:, 0], side='left')
+            hi = segment_searchsorted(spike_times, lo, unit_stops, intervals[:, 1], side='right')
+            return np.bincount(interval_units, weights=hi - lo, minlength=num_units).astype(np.int64)
+        bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        interval_ids, bins, starts, stops = self.__split_intervals(intervals, bin_edges)
+        lo = segment_searchsorted(spike_times, unit_starts[interval_ids], unit_stops[interval_ids], starts,
+                                  side='left')
+        hi = segment_searchsorted(spike_times, lo, unit_stops[interval_ids], stops, side='left')
+        flat = interval_units[interval_ids] * (bin_edges.size - 1) + bins
+        counts = np.bincount(flat, weights=hi - lo, minlength=num_units * (bin_edges.size - 1))
+        return counts.astype(np.int64).reshape(num_units, bin_edges.size - 1)
+
+    @instrumented
+    @docval({'name': 'window', 'type': 'array_data', 'shape': (2,), 'doc': 'the (start, stop) time window to bin'},
+            {'name': 'bin_width', 'type': float, 'doc': 'the width of the time bins, in seconds'},
+            {'name': 'index', 'type': 'array_data', 'default': None,
+             'doc': 'the indices of the units to count spikes for. By default, all units are used'},
+            {'name': 'in_obs_intervals', 'type': bool, 'default': True,
+             'doc': 'only count spikes within the observation intervals of each unit, if the table has them'},
+            {'name': 'block_size', 'type': int, 'default': 2 ** 20,
+             'doc': 'the number of bins to count spikes in at once'},
+            {'name': 'format', 'type': str, 'default': 'csr', 'doc': "the sparse matrix format, 'csr' or 'coo'"})
+    def get_sparse_spike_counts(self, **kwargs):
+        """Get the number of spikes of each unit in time bins as a SciPy sparse matrix of shape (units, bins).
+
+        Bins are as in bin_edges(window, bin_width) and are counted like get_spike_counts, with half-open bins and
+        observation intervals, but the bin edges and counts are never held densely. Bins are processed block_size
+        bins at a time from the flat spike times and index, so the memory used besides the spike times and the
+        result is bounded by the block size and the number of units. Bins outside the observation intervals of a
+        unit are left empty. Requires scipy.
+        """
+        window, bin_width, index, in_obs_intervals, block_size, fmt = getargs(
+            'window', 'bin_width', 'index', 'in_obs_intervals', 'block_size', 'format', kwargs)
+        try:
+            import scipy.sparse
+        except ImportError as e:
+            raise ImportError("get_sparse_spike_counts requires scipy, which can be installed with "
+                              "'pip install scipy'") from e
+        if fmt not in ('csr', 'coo'):
+            raise ValueError("format must be 'csr' or 'coo', got '%s'" % fmt)
+        if not block_size > 0:
+            raise ValueError("block_size must be positive, got %d" % block_size)
+        window = tuple(float(t) for t in window)
+        num_bins = bin_count(window, bin_width)
+
+        spike_times, spike_offsets = self._read_ragged('spike_times', index)
+        spike_times = np.asarray(spike_times, dtype=np.float64)
+        num_units = spike_offsets.size - 1
+        if in_obs_intervals and 'obs_intervals' in self.colnames:
+            intervals, interval_units, _ = self.__read_obs_intervals(index)
+        else:
+            intervals = np.array([[-np.inf, np.inf]] * num_units).reshape(-1, 2)
+            interval_units = np.arange(num_units)
+        rows, cols, counts = list(), list(), list()
+        for first in range(0, num_bins, block_size):
+            last = min(first + block_size, num_bins)
+            edges = bin_edges(window, bin_width, first, last)
+            # clip the intervals to the block and count the spikes in each bin of the clipped intervals
+            starts = np.maximum(intervals[:, 0], edges[0])
+            stops = np.minimum(intervals[:, 1], edges[-1])
+            keep = stops > starts
+            units = interval_units[keep]
+            lo = segment_searchsorted(spike_times, spike_offsets[units], spike_offsets[units + 1], starts[keep],
+                                      side='left')
+            hi = segment_searchsorted(spike_times, lo, spike_offsets[units + 1], stops[keep], side='left')
+            times, offsets = gather_segments(spike_times, lo, hi)
+            bins = np.searchsorted(edges, times, side='right') - 1
+            keys = np.repeat(units, np.diff(offsets)) * (last - first) + bins
+            keys, key_counts = np.unique(keys, return_counts=True)
+            rows.append(keys // (last - first))
+            cols.append(first + keys % (last - first))
+            counts.append(key_counts)
+        counts = np.concatenate(counts).astype(np.int64)
+        matrix = scipy.sparse.coo_matrix((counts, (np.concatenate(rows), np.concatenate(cols))),
+                                         shape=(num_units, num_bins))
+        return matrix.asformat(fmt)
+
+    @docval({'name': 'index', 'type': 'array_data', 'default': None,
+             'doc': 'the indices of the units to compute firing rates for. By default, all units are used'},
+            {'name': 'bin_edges', 'type': 'array_data', 'default': None,
+             'doc': 'the sorted edges of time bins to compute firing rates in. By default, rates are not binned'})
+    def get_firing_rates(self, **kwargs):
+        """Get the firing rate of each unit, normalized by the time it was observed.
+
+        This is get_spike_counts divided by get_obs_durations. The rate is NaN for units, or bins, with no observed
+        time. Returns an array of shape (units,), or (units, bins) if bin_edges is given.
+        """
+        index, bin_edges = getargs('index', 'bin_edges', kwargs)
+        counts = self.get_spike_counts(index=index, bin_edges=bin_edges)
+        durations = self.get_obs_durations(index=index, bin_edges=bin_edges)
+        rates = np.full(durations.shape, np.nan)
+        np.divide(counts, durations, out=rates, where=durations > 0)
+        return rates
+
+    def __read_obs_intervals(self, index):
+        """Read the observation intervals of the given units as flat (start, stop) rows plus the position of the
+        unit of each row in index."""
+        if 'obs_intervals' not in self.colnames:
+            raise ValueError("%s '%s' has no obs_intervals column" % (self.__class__.__name__, self.name))
+        intervals, offsets = self._read_ragged('obs_intervals', index)
+        intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+        num_units = offsets.size - 1
+        return intervals, np.repeat(np.arange(num_units), np.diff(offsets)), num_units
+
+    @staticmethod
+    def __split_intervals(intervals, bin_edges):
+        """Split intervals at the given bin edges, dropping the parts outside of the bins.
+
+        Returns the interval and the bin of each part plus its start and stop.
+        """
+        first = np.maximum(np.searchsorted(bin_edges, intervals[:, 0], side='right') - 1, 0)
+        last = np.minimum(np.searchsorted(bin_edges, intervals[:, 1], side='left'), bin_edges.size - 1)
+        counts = np.maximum(last - first, 0)
+        offsets = np.zeros(counts.size + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        interval_ids = np.repeat(np.arange(counts.size), counts)
+        bins = np.repeat(first - offsets[:-1], counts) + np.arange(offsets[-1])
+        starts = np.maximum(intervals[interval_ids, 0], bin_edges[bins])
+        stops = np.minimum(intervals[interval_ids, 1], bin_edges[bins + 1])
+        keep = stops > starts
+        return interval_ids[keep], bins[keep], starts[keep], stops[keep]
+
+    def get_obs_interval_index(self):
+        """Get an IntervalIndex over the observation intervals of all units, labeled by unit index.
+
+        The index is built on first use and kept for later calls. Units added since then are read and added to the
+        index incrementally.
+        """
+        if self._obs_interval_index is None:
+            self._obs_interval_index = IntervalIndex()
+            self._obs_interval_index_units = 0
+        num_units = len(self)
+        if self._obs_interval_index_units < num_units:
+            new_units = np.arange(self._obs_interval_index_units, num_units)
+            intervals, interval_units, _ = self.__read_obs_intervals(new_units)
+            self._obs_interval_index.extend(intervals, new_units[interval_units])
+            self._obs_interval_index_units = num_units
+        return self._obs_interval_index
+
+    @instrumented
+    @docval({'name': 'times', 'type': 'array_data', 'doc': 'the times to find observed units at'})
+    def get_units_observed_at(self, **kwargs):
+        """Get the units whose observation intervals contain each of the given times.
+
+        Returns a tuple (index, offsets), where the sorted indices of the units observed at times[k] are
+        index[offsets[k]:offsets[k + 1]].
+        """
+        times = getargs('times', kwargs)
+        return self.get_obs_interval_index().query_points(times)
+
+    @instrumented
+    @docval({'name': 'windows', 'type': 'array_data', 'shape': (None, 2),
+             'doc': 'the (start, stop) windows to find observed units in'})
+    def get_units_observed_during(self, **kwargs):
+        """Get the units whose observation intervals overlap each of the given windows.
+
+        Returns a tuple (index, offsets), where the sorted indices of the units observed during windows[k] are
+        index[offsets[k]:offsets[k + 1]].
+        """
+        windows = getargs('windows', kwargs)
+        return self.get_obs_interval_index().query_windows(windows)
+
+    @instrumented
+    def get_unit_electrodes(self):
+        """Get the electrode of each unit.
+
+        The references of the electrode column are resolved once, on first use, and kept for later calls. The
+        electrodes of units added since then are resolved incrementally.
+        """
+        if 'electrode' not in self.colnames:
+            raise ValueError("%s '%s' has no electrode column" % (self.__class__.__name__, self.name))
+        if self._electrodes is None:
+            self._electrodes = list()
+        num_units = len(self)
+        if len(self._electrodes) < num_units:
+            self._electrodes.extend(counted(self['electrode'].data)[len(self._electrodes):num_units])
+            self._electrode_rows = None
+        return self._electrodes
+
+    @instrumented
+    @docval({'name': 'electrode', 'type': (IntracellularElectrode, str),
+             'doc': 'the electrode, or the name of the electrode, to find units for'})
+    def get_units_by_electrode(self, **kwargs):
+        """Get the indices of the units recorded with the given electrode.
+
+        The units of all electrodes are grouped on first use, so later lookups do not scan the electrode column. The
+        indices can be passed to query_spike_times or used to index the waveform columns to query many units of an
+        electrode at once.
+
+        Returns a sorted array of unit indices.
+        """
+        electrode = getargs('electrode', kwargs)
+        electrodes = self.get_unit_electrodes()
+        if self._electrode_rows is None:
+            keys = dict()
+            labels = np.array([keys.setdefault(id(e), len(keys)) for e in electrodes], dtype=np.int64)
+            order = np.argsort(labels, kind='stable')
+            groups = np.split(order, np.cumsum(np.bincount(labels, minlength=len(keys)))[:-1])
+            unique = {id(e): e for e in electrodes}
+            self._electrode_rows = {key: (unique[key], groups[label]) for key, label in keys.items()}
+        if isinstance(electrode, str):
+            rows = [r for e, r in self._electrode_rows.values() if e is not None and e.name == electrode]
+            return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+        if id(electrode) in self._electrode_rows:
+            return self._electrode_rows[id(electrode)][1]
+        return np.zeros(0, dtype=np.int64)
+
+    @instrumented
+    @docval({'name': 'recordings', 'type': (IntracellularRecordingsTable, list, tuple),
+             'doc': ('the intracellular recordings table of the NWB file, or a list of PatchClampSeries, one per '
+                     'sweep')})
+    def get_spike_sweeps(self, **kwargs):
+        """Find the sweep that each spike was recorded in, among the recordings of the electrode of its unit.
+
+        A sweep is a row of the intracellular recordings table, spanning its response, or its stimulus if it has no
+        response, or one of the given PatchClampSeries. Sweeps span [start, stop) from their first sample to the
+        end of their last sample. Sweeps of the same electrode are assumed not to overlap: a spike is assigned to
+        the last sweep of its electrode starting at or before it, if the spike is before the stop of that sweep.
+        All spikes of an electrode are resolved with one vectorized search in the sorted starts of its sweeps.
+
+        Returns a tuple (sweeps, sweep_times) of flat arrays aligned with the spike_times column: the index of the
+        sweep of each spike, or -1 if it is in none, and the time of each spike since the start of its sweep, or
+        NaN if it is in none.
+        """
+        recordings = getargs('recordings', kwargs)
+        electrodes, starts, stops = recording_spans(recordings)
+        spike_times, offsets = self._read_ragged('spike_times')
+        spike_times = np.asarray(spike_times, dtype=np.float64)
+        keys = dict()
+        sweep_labels = np.array([keys.setdefault(id(e), len(keys)) for e in electrodes], dtype=np.int64)
+        unit_labels = np.array([keys.get(id(e), -1) for e in self.get_unit_electrodes()], dtype=np.int64)
+        spike_labels = np.repeat(unit_labels, np.diff(offsets))
+
+        sweeps = np.full(spike_times.size, -1, dtype=np.int64)
+        sweep_times = np.full(spike_times.size, np.nan)
+        # group the spikes and the sweeps by electrode, with the sweeps of each electrode sorted by start
+        spike_order = np.argsort(spike_labels, kind='stable')
+        spike_bounds = np.searchsorted(spike_labels[spike_order], np.arange(len(keys) + 1))
+        sweep_order = np.lexsort((starts, sweep_labels))
+        sweep_bounds = np.searchsorted(sweep_labels[sweep_order], np.arange(len(keys) + 1))
+        for label in range(len(keys)):
+            spikes = spike_order[spike_bounds[label]:spike_bounds[label + 1]]
+            candidates = sweep_order[sweep_bounds[label]:sweep_bounds[label + 1]]
+            times = spike_times[spikes]
+            pos = np.searchsorted(starts[candidates], times, side='right') - 1
+            sweep = candidates[np.maximum(pos, 0)]
+            found = (pos >= 0) & (times < stops[sweep])
+            sweeps[spikes[found]] = sweep[found]
+            sweep_times[spikes[found]] = times[found] - starts[sweep[found]]
+        return sweeps, sweep_times
+
+
+class ICEphysUnitsTimeSlice:
+    """A lazy view of the units of an ICEphysUnits table restricted to the closed time window [start, stop].
+
+    Nothing is read when the view is created. Spike times and observation intervals are read from the table on
+    access, for the requested units only, and restricted to the window as in ICEphysUnits.time_slice.
+    """
+
+    def __init__(self, table, start, stop):
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return len(self.table)
+
+    def get_unit_spike_times(self, index):
+        """Get the spike times of a unit, or a list of spike times for a list of units, within the window."""
+        return self.table.get_unit_spike_times(index, in_interval=(self.start, self.stop))
+
+    def query_spike_times(self, index):
+        """Get the spike times of many units within the window as a tuple (values, offsets), like
+        ICEphysUnits.query_spike_times."""
+        return self.table.query_spike_times(index, [self.start, self.stop])
+
+    def get_unit_obs_intervals(self, index):
+        """Get the observation intervals of a unit clipped to the window."""
+        intervals = np.asarray(self.table.get_unit_obs_intervals(index), dtype=np.float64).reshape(-1, 2)
+        keep = (intervals[:, 1] >= self.start) & (intervals[:, 0] <= self.stop)
+        keep &= intervals[:, 1] >= intervals[:, 0]
+        return np.clip(intervals[keep], self.start, self.stop)
+
+    def to_table(self, name=None):
+        """Get a copy of the view as a new ICEphysUnits table, like ICEphysUnits.time_slice."""
+        return self.table.time_slice(self.start, self.stop, name=name)
@@ -0,0 +1,125 @@
+"""Optional instrumentation of the operations of ICEphysUnits tables.
+
+When enabled, each instrumented operation records its number of calls, its cumulative wall time, and the number of
+bytes and of backend read calls of the column reads it made. Times and reads of nested operations are also counted
+for the operations calling them. When disabled, which is the default, an instrumented operation costs one extra
+function call and flag check.
+"""
+import functools
+import threading
+import time
+
+import numpy as np
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_stats = dict()
+_callbacks = list()
+
+
+def enable_instrumentation():
+    """Start recording statistics of instrumented operations."""
+    global _enabled
+    _enabled = True
+
+
+def disable_instrumentation():
+    """Stop recording statistics of instrumented operations. Statistics recorded so far are kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_instrumentation_enabled():
+    return _enabled
+
+
+def reset_stats():
+    """Discard the statistics recorded so far."""
+    with _lock:
+        _stats.clear()
+
+
+def get_stats():
+    """Get a snapshot of the statistics recorded so far.
+
+    Returns a dict mapping the name of each operation that was called to a dict with its number of calls, its
+    cumulative wall time in seconds, and its number of bytes read and of read calls.
+    """
+    with _lock:
+        return {name: dict(op_stats) for name, op_stats in _stats.items()}
+
+
+def add_callback(callback):
+    """Call callback(name, stats) after each call of an instrumented operation while instrumentation is enabled, with
+    the name of the operation and a dict with the wall time, bytes read and read calls of the call."""
+    with _lock:
+        _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    with _lock:
+        _callbacks.remove(callback)
+
+
+def _frames():
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = list()
+    return frames
+
+
+def record_read(nbytes, calls=1):
+    """Count a read of nbytes bytes with the given number of backend read calls for the running operations."""
+    for frame in _frames():
+        frame['bytes_read'] += nbytes
+        frame['read_calls'] += calls
+
+
+def instrumented(func):
+    """Decorate a method as an instrumented operation, named after the class of the instance and the method."""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return func(self, *args, **kwargs)
+        name = '%s.%s' % (type(self).__name__, func.__name__)
+        frame = {'wall_time': 0., 'bytes_read': 0, 'read_calls': 0}
+        frames = _frames()
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            frame['wall_time'] = time.perf_counter() - start
+            frames.pop()
+            with _lock:
+                op_stats = _stats.setdefault(name, {'calls': 0, 'wall_time': 0., 'bytes_read': 0, 'read_calls': 0})
+                op_stats['calls'] += 1
+                for key, val in frame.items():
+                    op_stats[key] += val
+                callbacks = list(_callbacks)
+            for callback in callbacks:
+                callback(name, frame)
+
+    return wrapper
+
+
+class _CountedData:
+    """Wraps array-like data to count each item access as a read."""
+
+    def __init__(self, data):
+        self.__data = data
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __getitem__(self, key):
+        value = self.__data[key]
+        record_read(np.asarray(value).nbytes)
+        return value
+
+
+def counted(data):
+    """Get data wrapped to count its reads if instrumentation is enabled, or data itself otherwise."""
+    return _CountedData(data) if _enabled else data
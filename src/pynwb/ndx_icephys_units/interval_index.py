@@ -0,0 +1,154 @@
+import numpy as np
+
+from ._ragged import gather_segments
+
+
+class IntervalIndex:
+    """An index over labeled closed intervals [start, stop] answering batched point and window overlap queries.
+
+    Intervals are stored in a segment tree over the distinct interval endpoints, so that a point query visits
+    O(log n) tree nodes and costs O(log n + k) for k matching intervals. Windows are answered as the intervals
+    containing the window start plus the intervals starting within the window, the latter found by binary search in
+    the sorted interval starts. Intervals added after the tree was built are kept in a pending buffer. Queries scan
+    at most max_pending pending intervals directly and rebuild the tree first if more are pending, so queries never
+    cost more than O(max_pending) per query on top of the tree lookup.
+    """
+
+    def __init__(self, intervals=None, labels=None, max_pending=256):
+        self.max_pending = max_pending
+        self.__intervals = np.zeros((0, 2))
+        self.__labels = np.zeros(0, dtype=np.int64)
+        self.__num_indexed = 0
+        if intervals is not None:
+            self.__intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+            self.__labels = np.asarray(labels, dtype=np.int64).ravel()
+            if len(self.__intervals) != len(self.__labels):
+                raise ValueError("intervals and labels must have the same length")
+        self.__build()
+
+    def __len__(self):
+        return len(self.__labels)
+
+    def extend(self, intervals, labels):
+        """Add intervals with the given integer labels to the index."""
+        intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+        labels = np.asarray(labels, dtype=np.int64).ravel()
+        if len(intervals) != len(labels):
+            raise ValueError("intervals and labels must have the same length")
+        self.__intervals = np.concatenate([self.__intervals, intervals])
+        self.__labels = np.concatenate([self.__labels, labels])
+
+    def __update(self):
+        """Merge the pending intervals into the tree if there are more than max_pending."""
+        if len(self) - self.__num_indexed > self.max_pending:
+            self.__build()
+
+    def __build(self):
+        intervals, labels = self.__intervals, self.__labels
+        self.__num_indexed = len(labels)
+        self.__points = np.unique(intervals)
+        # atom 2 * k is the endpoint points[k] and atom 2 * k + 1 is the gap between points[k] and points[k + 1]
+        num_atoms = max(2 * self.__points.size, 1)
+        self.__size = 1 << int(np.ceil(np.log2(num_atoms)))
+        left = 2 * np.searchsorted(self.__points, intervals[:, 0]) + self.__size
+        right = 2 * np.searchsorted(self.__points, intervals[:, 1]) + 1 + self.__size
+        ids = np.flatnonzero(intervals[:, 0] <= intervals[:, 1])
+        left, right = left[ids], right[ids]
+        nodes = list()
+        node_ids = list()
+        # canonical decomposition of all intervals at once, one tree level per iteration
+        while ids.size:
+            take = (left & 1).astype(bool)
+            nodes.append(left[take])
+            node_ids.append(ids[take])
+            left = left + take
+            take = (right & 1).astype(bool)
+            right = right - take
+            nodes.append(right[take])
+            node_ids.append(ids[take])
+            left >>= 1
+            right >>= 1
+            keep = left < right
+            ids, left, right = ids[keep], left[keep], right[keep]
+        nodes = np.concatenate(nodes) if nodes else np.zeros(0, dtype=np.int64)
+        node_ids = np.concatenate(node_ids) if node_ids else np.zeros(0, dtype=np.int64)
+        order = np.argsort(nodes, kind='stable')
+        self.__node_labels = labels[node_ids[order]]
+        self.__node_offsets = np.zeros(2 * self.__size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(nodes, minlength=2 * self.__size), out=self.__node_offsets[1:])
+        valid = np.flatnonzero(intervals[:, 0] <= intervals[:, 1])
+        order = valid[np.argsort(intervals[valid, 0], kind='stable')]
+        self.__starts = intervals[order, 0]
+        self.__start_labels = labels[order]
+
+    def __stab(self, times):
+        """Get the labels of indexed intervals containing each time as (query, label) pairs."""
+        k = np.searchsorted(self.__points, times, side='right') - 1
+        valid = k >= 0
+        k = np.maximum(k, 0)
+        atoms = 2 * k + (self.__points[k] != times) if self.__points.size else np.zeros(times.size, dtype=np.int64)
+        depth = int(np.log2(self.__size))
+        nodes = (atoms + self.__size)[:, np.newaxis] >> np.arange(depth + 1)[np.newaxis, :]
+        starts = np.where(valid[:, np.newaxis], self.__node_offsets[nodes], 0)
+        stops = np.where(valid[:, np.newaxis], self.__node_offsets[nodes + 1], 0)
+        found, offsets = gather_segments(self.__node_labels, starts, stops)
+        queries = np.repeat(np.arange(times.size), np.diff(offsets).reshape(times.size, -1).sum(axis=1))
+        return queries, found
+
+    def __group(self, num_queries, queries, labels):
+        """Turn (query, label) pairs into sorted, unique labels per query as a tuple (labels, offsets)."""
+        num_labels = int(self.__labels.max()) + 1 if self.__labels.size else 1
+        keys = np.unique(queries * num_labels + labels)
+        offsets = np.zeros(num_queries + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // num_labels, minlength=num_queries), out=offsets[1:])
+        return keys % num_labels, offsets
+
+    def __pending(self, starts, stops):
+        """Get the labels of pending intervals overlapping [starts, stops] as (query, label) pairs."""
+        pending = self.__intervals[self.__num_indexed:]
+        if not len(pending):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        queries, rows = list(), list()
+        # compare blocks of queries with all pending intervals, to bound the size of the comparison matrix
+        block = max(2 ** 20 // len(pending), 1)
+        for first in range(0, starts.size, block):
+            hits = ((pending[np.newaxis, :, 0] <= stops[first:first + block, np.newaxis]) &
+                    (pending[np.newaxis, :, 1] >= starts[first:first + block, np.newaxis]))
+            block_queries, block_rows = np.nonzero(hits)
+            queries.append(block_queries + first)
+            rows.append(block_rows)
+        if not queries:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(queries), self.__labels[self.__num_indexed + np.concatenate(rows)]
+
+    def query_points(self, times):
+        """Get the labels of the intervals containing each time.
+
+        Returns a tuple (labels, offsets), where the sorted, unique labels for times[k] are
+        labels[offsets[k]:offsets[k + 1]].
+        """
+        times = np.asarray(times, dtype=np.float64).ravel()
+        self.__update()
+        queries, labels = self.__stab(times)
+        pending_queries, pending_labels = self.__pending(times, times)
+        return self.__group(times.size, np.concatenate([queries, pending_queries]),
+                            np.concatenate([labels, pending_labels]))
+
+    def query_windows(self, windows):
+        """Get the labels of the intervals overlapping each (start, stop) window.
+
+        Returns a tuple (labels, offsets), where the sorted, unique labels for windows[k] are
+        labels[offsets[k]:offsets[k + 1]].
+        """
+        windows = np.asarray(windows, dtype=np.float64).reshape(-1, 2)
+        if np.any(windows[:, 0] > windows[:, 1]):
+            raise ValueError("windows must have start <= stop")
+        self.__update()
+        queries, labels = self.__stab(windows[:, 0])
+        lo = np.searchsorted(self.__starts, windows[:, 0], side='right')
+        hi = np.searchsorted(self.__starts, windows[:, 1], side='right')
+        started, offsets = gather_segments(self.__start_labels, lo, hi)
+        started_queries = np.repeat(np.arange(len(windows)), np.diff(offsets))
+        pending_queries, pending_labels = self.__pending(windows[:, 0], windows[:, 1])
+        return self.__group(len(windows), np.concatenate([queries, started_queries, pending_queries]),
+                            np.concatenate([labels, started, pending_labels]))
@@ -0,0 +1,50 @@
+import warnings
+
+import numpy as np
+
+from hdmf.build import MissingRequiredBuildWarning
+from hdmf.common.io.table import DynamicTableMap
+from hdmf.utils import docval, getargs, get_docval
+
+from pynwb import register_map
+
+from .icephys_units import ICEphysUnits
+
+
+@register_map(ICEphysUnits)
+class ICEphysUnitsMap(DynamicTableMap):
+
+    @docval(*get_docval(DynamicTableMap.build), returns='the Builder representing the given ICEphysUnits')
+    def build(self, **kwargs):
+        """Build the table and set the attributes of its columns that are stored on the table.
+
+        ICEphysUnits.resolution is stored as spike_times.resolution and ICEphysUnits.waveform_rate as
+        waveform_mean.sampling_rate and waveform_sd.sampling_rate.
+        """
+        container = getargs('container', kwargs)
+        with warnings.catch_warnings():
+            if container.waveform_rate is not None:
+                # the sampling rates are missing when the columns are built and are set below
+                warnings.filterwarnings('ignore', r"VectorData 'waveform_(mean|sd)' is missing required value",
+                                        MissingRequiredBuildWarning)
+            builder = super().build(**kwargs)
+        if container.resolution is not None and 'spike_times' in builder:
+            builder['spike_times'].set_attribute('resolution', float(container.resolution))
+        if container.waveform_rate is not None:
+            for name in ('waveform_mean', 'waveform_sd'):
+                if name in builder:
+                    builder[name].set_attribute('sampling_rate', np.float32(container.waveform_rate))
+        return builder
+
+    @DynamicTableMap.constructor_arg('resolution')
+    def resolution_carg(self, builder, manager):
+        if 'spike_times' in builder:
+            return builder['spike_times'].attributes.get('resolution')
+        return None
+
+    @DynamicTableMap.constructor_arg('waveform_rate')
+    def waveform_rate_carg(self, builder, manager):
+        for name in ('waveform_mean', 'waveform_sd'):
+            if name in builder and builder[name].attributes.get('sampling_rate') is not None:
+                return float(builder[name].attributes['sampling_rate'])
+        return None
@@ -0,0 +1,28 @@
+import os
+
+import h5py
+import numpy as np
+
+
+def memmap_dataset(dataset):
+    """Map an HDF5 dataset into memory as a read-only np.memmap at its offset in the file.
+
+    This only works for datasets with a contiguous, uncompressed layout and a plain numeric dtype, stored in a local
+    file opened read-only with the default driver. Slicing the returned array does not copy data, and all processes
+    that map the same file share the pages of the OS page cache.
+
+    :returns: the np.memmap, or None if the dataset cannot be memory-mapped
+    """
+    if not isinstance(dataset, h5py.Dataset):
+        return None
+    # files opened from file objects or with the ros3, fsspec or family drivers have no single local file to map
+    if dataset.file.driver not in ('sec2', 'stdio') or not os.path.isfile(dataset.file.filename):
+        return None
+    if dataset.file.mode != 'r' or dataset.chunks is not None or dataset.compression is not None:
+        return None
+    if dataset.dtype.kind not in 'biuf' or dataset.external or dataset.size == 0:
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+    return np.memmap(dataset.file.filename, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)
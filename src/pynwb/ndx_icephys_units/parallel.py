@@ -0,0 +1,27 @@
+"""Parallel reads of chunked column data, such as Zarr arrays or chunked HDF5 datasets."""
+import numpy as np
+
+
+def read_chunked(data, start, stop, executor, max_pieces):
+    """Read data[start:stop] as a NumPy array, reading runs of whole chunks concurrently with executor.
+
+    The rows are split at chunk boundaries of the first dimension into at most max_pieces runs of about the same
+    number of chunks, so no chunk is read by two threads. Data that is not chunked, or a range of at most one chunk, is
+    read with a single read.
+
+    :returns: a tuple (values, number of reads)
+    """
+    chunks = getattr(data, 'chunks', None)
+    if not chunks or max_pieces < 2 or stop - start <= chunks[0]:
+        return np.asarray(data[start:stop]), 1
+    first, last = start // chunks[0], -(-stop // chunks[0])
+    bounds = np.unique(np.linspace(first, last, min(max_pieces, last - first) + 1).round().astype(np.int64))
+    bounds = np.clip(bounds * chunks[0], start, stop)
+    values = np.empty((stop - start,) + tuple(data.shape[1:]), dtype=data.dtype)
+
+    def read(lo, hi):
+        values[lo - start:hi - start] = data[lo:hi]
+
+    # consume the results to raise any error of the reads
+    list(executor.map(read, bounds[:-1], bounds[1:]))
+    return values, len(bounds) - 1
@@ -0,0 +1,177 @@
+"""Asynchronous reading of units across many NWB files, with prefetching of the units to be read next."""
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from hdmf.utils import docval, getargs
+
+from pynwb import NWBHDF5IO
+
+from .aggregate import _find_units
+
+
+class _FilePool:
+    """A pool of at most max_open NWB files opened for reading, closing the least recently used idle file first.
+
+    Files are used with acquire and release. A file in use is never closed, so the pool may hold more than max_open
+    files while they are all in use. Reads of the same file are serialized by a lock of the file.
+    """
+
+    def __init__(self, name, max_open):
+        self.name = name
+        self.max_open = max_open
+        self.__lock = threading.Lock()
+        self.__files = OrderedDict()
+
+    def acquire(self, path):
+        """Get the entry [io, units, lock, users] of the file at path, opening it if needed."""
+        with self.__lock:
+            entry = self.__files.get(path)
+            if entry is None:
+                entry = self.__files[path] = [None, None, threading.Lock(), 0]
+            entry[3] += 1
+            self.__files.move_to_end(path)
+        with entry[2]:
+            if entry[0] is None:
+                try:
+                    io = NWBHDF5IO(path, 'r')
+                    entry[1] = _find_units(io.read(), self.name)
+                    entry[0] = io
+                except Exception:
+                    self.release(path)
+                    raise
+        return entry
+
+    def release(self, path):
+        with self.__lock:
+            self.__files[path][3] -= 1
+            idle = [p for p, entry in self.__files.items() if entry[3] == 0]
+            to_close = list()
+            for p in idle[:max(len(self.__files) - self.max_open, 0)]:
+                to_close.append(self.__files.pop(p)[0])
+        for io in to_close:
+            if io is not None:
+                io.close()
+
+    def close(self):
+        with self.__lock:
+            files = list(self.__files.values())
+            self.__files.clear()
+        for entry in files:
+            if entry[0] is not None:
+                entry[0].close()
+
+    def __len__(self):
+        return len(self.__files)
+
+
+def _read_unit(pool, path, index):
+    """Read the spike times, observation intervals and waveforms of a unit of the NWB file at path."""
+    entry = pool.acquire(path)
+    try:
+        with entry[2]:
+            units = entry[1]
+            data = dict()
+            for colname in ('spike_times', 'obs_intervals'):
+                if colname in units.colnames:
+                    data[colname] = units._read_unit(colname, index)
+            for colname in ('waveform_mean', 'waveform_sd'):
+                if colname in units.colnames:
+                    column = units[colname]
+                    data[colname] = units._read_column_data(column.name, column.data, index, index + 1)[0]
+            return data
+    finally:
+        pool.release(path)
+
+
+class AsyncUnitReader:
+    """Read units of ICEphysUnits tables in many NWB files from asyncio code, prefetching the next units.
+
+    Units are given in the order in which they will be read, as (path, unit index) pairs. Reading the unit at a
+    position in this order schedules reads of the next prefetch units on a pool of worker threads, so that stepping
+    through the units in order finds their data already read. Units outside of the prefetch window are dropped.
+    Files are opened by the workers and kept open in a pool of at most max_open_files idle files.
+    """
+
+    @docval({'name': 'units', 'type': (list, tuple), 'doc': 'the (path, unit index) of each unit, in reading order'},
+            {'name': 'name', 'type': str, 'default': None,
+             'doc': 'the name of the ICEphysUnits table to read from each file. By default, the only one is read'},
+            {'name': 'prefetch', 'type': int, 'default': 8, 'doc': 'the number of units to read ahead'},
+            {'name': 'max_open_files', 'type': int, 'default': 4, 'doc': 'the number of idle files to keep open'},
+            {'name': 'max_workers', 'type': int, 'default': 4, 'doc': 'the number of threads to read with'})
+    def __init__(self, **kwargs):
+        units, name, prefetch, max_open_files, max_workers = getargs('units', 'name', 'prefetch', 'max_open_files',
+                                                                     'max_workers', kwargs)
+        if prefetch < 0:
+            raise ValueError("prefetch must be non-negative, got %d" % prefetch)
+        if not max_workers > 0:
+            raise ValueError("max_workers must be positive, got %d" % max_workers)
+        self.units = [(str(path), int(index)) for path, index in units]
+        self.prefetch = prefetch
+        self.__pool = _FilePool(name, max_open_files)
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.__futures = dict()
+
+    def __len__(self):
+        return len(self.units)
+
+    @property
+    def num_open_files(self):
+        """The number of files currently open."""
+        return len(self.__pool)
+
+    @property
+    def scheduled(self):
+        """The positions of the units that are read or being read, in increasing order."""
+        return sorted(self.__futures)
+
+    def __schedule(self, position):
+        future = self.__futures.get(position)
+        # a failed read is read again, e.g. after the file became available
+        if future is not None and future.done() and not future.cancelled() and future.exception() is not None:
+            future = None
+        if future is None:
+            path, index = self.units[position]
+            future = asyncio.get_running_loop().run_in_executor(self.__executor, _read_unit, self.__pool, path,
+                                                                index)
+            self.__futures[position] = future
+        return future
+
+    async def get_unit(self, position):
+        """Get a dict of the spike_times, obs_intervals, waveform_mean and waveform_sd of the unit at position, of
+        the columns its table has, and prefetch the units after it."""
+        if not -len(self.units) <= position < len(self.units):
+            raise IndexError("position %d out of range for AsyncUnitReader with %d units"
+                             % (position, len(self.units)))
+        position %= len(self.units)
+        window = range(position, min(position + self.prefetch + 1, len(self.units)))
+        for p in list(self.__futures):
+            if p not in window:
+                self.__futures.pop(p).cancel()
+        future = self.__schedule(position)
+        for p in window[1:]:
+            self.__schedule(p)
+        return await asyncio.shield(future)
+
+    async def get_unit_spike_times(self, position):
+        """Get the spike times of the unit at position and prefetch the units after it."""
+        return (await self.get_unit(position))['spike_times']
+
+    async def get_unit_obs_intervals(self, position):
+        """Get the observation intervals of the unit at position and prefetch the units after it."""
+        return (await self.get_unit(position))['obs_intervals']
+
+    async def close(self):
+        """Cancel pending reads, wait for running reads and close all files."""
+        for future in self.__futures.values():
+            future.cancel()
+        self.__futures.clear()
+        await asyncio.get_running_loop().run_in_executor(None, self.__executor.shutdown)
+        self.__pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,103 @@
+"""Peri-stimulus time histograms and rasters of the spike times in an ICEphysUnits table."""
+import numpy as np
+
+from hdmf.utils import docval, getargs
+
+from ._ragged import segment_searchsorted, gather_segments, bin_edges
+from .icephys_units import ICEphysUnits
+
+
+def _iter_unit_blocks(units, index, chunk_size):
+    """Yield (block, starts, stops, values) for blocks of chunk_size units, where values holds the spike times of
+    the units in block and the spike times of unit block[k] are values[starts[k]:stops[k]]."""
+    index = units._normalize_unit_index(np.arange(len(units)) if index is None else index)
+    offsets = units._read_ragged_offsets('spike_times')
+    if chunk_size is not None and not chunk_size > 0:
+        raise ValueError("chunk_size must be positive, got %d" % chunk_size)
+    chunk_size = max(index.size, 1) if chunk_size is None else chunk_size
+    for start in range(0, index.size, chunk_size):
+        block = index[start:start + chunk_size]
+        starts = offsets[block]
+        stops = offsets[block + 1]
+        lo, hi = int(starts.min()), int(stops.max())
+        values = units._read_ragged_target('spike_times', lo, hi)
+        yield block, starts - lo, stops - lo, values
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table holding the spike times'},
+        {'name': 'event_times', 'type': 'array_data', 'doc': 'the times of the events to align spike times to'},
+        {'name': 'window', 'type': (tuple, list), 'shape': (2,),
+         'doc': 'the (start, stop) of the window around each event, relative to the event time'},
+        {'name': 'bin_width', 'type': (int, float), 'doc': 'the width of each bin'},
+        {'name': 'index', 'type': 'array_data', 'default': None,
+         'doc': 'the indices of the units to compute histograms for. By default, all units are used'},
+        {'name': 'per_event', 'type': bool, 'default': False,
+         'doc': 'return counts for each event instead of summing them over events'},
+        {'name': 'chunk_size', 'type': int, 'default': None,
+         'doc': 'the number of units to process at once. By default, all units are processed at once'},
+        is_method=False)
+def compute_psth(**kwargs):
+    """Count spikes in bins around each event for many units at once.
+
+    Bins are half-open, [edge, edge + bin_width), and the last bin is shortened if the window is not a multiple of
+    bin_width. Each block of units is read with one read of spike_times and all bin edges of all units and events
+    are located with one vectorized search. Use chunk_size to bound memory use for large tables.
+
+    Returns a tuple (counts, bin_edges), where counts has shape (units, bins), or (units, events, bins) if per_event
+    is True.
+    """
+    units, event_times, window, bin_width, index, per_event, chunk_size = getargs(
+        'units', 'event_times', 'window', 'bin_width', 'index', 'per_event', 'chunk_size', kwargs)
+    edges = bin_edges(window, bin_width)
+    event_times = np.asarray(event_times, dtype=np.float64).ravel()
+    keys = event_times[:, np.newaxis] + edges[np.newaxis, :]
+    num_units = len(units) if index is None else len(index)
+    # only the counts of one block are held per event, so chunk_size bounds memory use unless per_event is True
+    shape = (num_units, event_times.size, edges.size - 1) if per_event else (num_units, edges.size - 1)
+    counts = np.zeros(shape, dtype=np.int64)
+    row = 0
+    for block, starts, stops, values in _iter_unit_blocks(units, index, chunk_size):
+        bounds = starts[:, np.newaxis, np.newaxis], stops[:, np.newaxis, np.newaxis]
+        positions = segment_searchsorted(values, *bounds, keys[np.newaxis], side='left')
+        block_counts = np.diff(positions, axis=-1)
+        counts[row:row + block.size] = block_counts if per_event else block_counts.sum(axis=1)
+        row += block.size
+    return counts, edges
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table holding the spike times'},
+        {'name': 'event_times', 'type': 'array_data', 'doc': 'the times of the events to align spike times to'},
+        {'name': 'window', 'type': (tuple, list), 'shape': (2,),
+         'doc': 'the (start, stop) of the window around each event, relative to the event time'},
+        {'name': 'index', 'type': 'array_data', 'default': None,
+         'doc': 'the indices of the units to compute rasters for. By default, all units are used'},
+        {'name': 'chunk_size', 'type': int, 'default': None,
+         'doc': 'the number of units to process at once. By default, all units are processed at once'},
+        is_method=False)
+def compute_raster(**kwargs):
+    """Get the spike times of many units around each event, relative to the event time.
+
+    Spike times t are included if start <= t - event_time < stop.
+
+    Returns a tuple (values, offsets), where the relative spike times of unit k around event j are
+    values[offsets[i]:offsets[i + 1]] with i = k * len(event_times) + j.
+    """
+    units, event_times, window, index, chunk_size = getargs('units', 'event_times', 'window', 'index',
+                                                            'chunk_size', kwargs)
+    start, stop = window
+    event_times = np.asarray(event_times, dtype=np.float64).ravel()
+    all_values = list()
+    all_counts = list()
+    for block, starts, stops, values in _iter_unit_blocks(units, index, chunk_size):
+        lo = segment_searchsorted(values, starts[:, np.newaxis], stops[:, np.newaxis],
+                                  event_times[np.newaxis, :] + start, side='left')
+        hi = segment_searchsorted(values, lo, stops[:, np.newaxis], event_times[np.newaxis, :] + stop, side='left')
+        block_values, block_offsets = gather_segments(values, lo, hi)
+        counts = np.diff(block_offsets)
+        all_values.append(block_values - np.repeat(np.tile(event_times, block.size), counts))
+        all_counts.append(counts)
+    offsets = np.zeros(sum(c.size for c in all_counts) + 1, dtype=np.int64)
+    if all_counts:
+        np.cumsum(np.concatenate(all_counts), out=offsets[1:])
+    values = np.concatenate(all_values) if all_values else np.zeros(0, dtype=np.float64)
+    return values, offsets
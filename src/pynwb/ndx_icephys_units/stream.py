@@ -0,0 +1,237 @@
+import uuid
+
+import h5py
+import numpy as np
+
+from hdmf.common import VectorData, VectorIndex, ElementIdentifiers
+from hdmf.utils import docval, getargs, popargs
+
+from pynwb import NWBFile, NWBHDF5IO, H5DataIO
+from pynwb.icephys import IntracellularElectrode
+
+from .icephys_units import ICEphysUnits
+
+
+class ICEphysUnitsStreamWriter:
+    """Write an ICEphysUnits table to an NWB HDF5 file incrementally.
+
+    The NWB file is written up front with empty, resizable and chunked datasets for the columns of the table, which
+    is added to the acquisition of the file. Units are buffered in memory and appended to the datasets on flush,
+    which happens automatically once more than buffer_size bytes are buffered, so memory use stays flat no matter
+    how many units are written. The file is a valid NWB file, readable with NWBHDF5IO, after every flush.
+    """
+
+    @docval({'name': 'path', 'type': str, 'doc': 'the path of the NWB file to create'},
+            {'name': 'nwbfile', 'type': NWBFile,
+             'doc': 'the NWB file to write. It must contain all electrodes that units will refer to'},
+            {'name': 'name', 'type': str, 'doc': 'Name of the ICEphysUnits table', 'default': 'ICEphysUnits'},
+            {'name': 'description', 'type': str, 'doc': 'Description of what is in the table', 'default': None},
+            {'name': 'obs_intervals', 'type': bool, 'doc': 'whether to store observation intervals', 'default': True},
+            {'name': 'electrode', 'type': bool, 'doc': 'whether to store the electrode of each unit',
+             'default': False},
+            {'name': 'waveform_samples', 'type': int, 'default': None,
+             'doc': 'the number of samples of waveform_mean and waveform_sd. By default, waveforms are not stored'},
+            {'name': 'waveform_rate', 'type': float, 'doc': 'the sampling rate of the waveforms, in hertz',
+             'default': None},
+            {'name': 'chunk_size', 'type': int, 'doc': 'the number of elements in each chunk of the datasets',
+             'default': 2 ** 16},
+            {'name': 'buffer_size', 'type': int, 'doc': 'flush once more than this many bytes are buffered',
+             'default': 2 ** 24})
+    def __init__(self, **kwargs):
+        path, nwbfile, name, description = popargs('path', 'nwbfile', 'name', 'description', kwargs)
+        self.__chunk_size, self.__buffer_size = popargs('chunk_size', 'buffer_size', kwargs)
+        waveform_samples, waveform_rate = popargs('waveform_samples', 'waveform_rate', kwargs)
+        if waveform_samples is not None and waveform_rate is None:
+            raise ValueError("waveform_rate is required to store waveforms")
+
+        self.__shapes = {'id': (), 'spike_times': ()}
+        if kwargs['obs_intervals']:
+            self.__shapes['obs_intervals'] = (2,)
+        if waveform_samples is not None:
+            self.__shapes['waveform_mean'] = (waveform_samples,)
+            self.__shapes['waveform_sd'] = (waveform_samples,)
+        self.__has_electrode = kwargs['electrode']
+
+        columns = list()
+        for col_name in ('spike_times', 'obs_intervals', 'waveform_mean', 'waveform_sd'):
+            if col_name not in self.__shapes:
+                continue
+            spec = next(col for col in ICEphysUnits.__columns__ if col['name'] == col_name)
+            dtype = np.float32 if col_name.startswith('waveform') else np.float64
+            col = VectorData(name=col_name, description=spec['description'],
+                             data=self.__empty_dataset(self.__shapes[col_name], dtype))
+            columns.append(col)
+            if spec.get('index', False):
+                columns.append(VectorIndex(name=col_name + '_index', data=self.__empty_dataset((), np.uint64),
+                                           target=col))
+        ids = ElementIdentifiers(name='id', data=self.__empty_dataset((), np.int64))
+        table = ICEphysUnits(name=name, description=description, id=ids, columns=columns, waveform_rate=waveform_rate)
+        nwbfile.add_acquisition(table)
+        with NWBHDF5IO(path, 'w') as io:
+            io.write(nwbfile)
+
+        self.__file = h5py.File(path, 'r+')
+        self.__group = self.__file['acquisition'][name]
+        if self.__has_electrode:
+            electrode = self.__group.create_dataset('electrode', shape=(0,), maxshape=(None,), dtype=h5py.ref_dtype,
+                                                    chunks=(self.__chunk_size,))
+            electrode.attrs['description'] = 'Electrode that each spike unit came from.'
+            electrode.attrs['namespace'] = 'hdmf-common'
+            electrode.attrs['neurodata_type'] = 'VectorData'
+            electrode.attrs['object_id'] = str(uuid.uuid4())
+        colnames = [col.name for col in columns if not isinstance(col, VectorIndex)]
+        if self.__has_electrode:
+            colnames.append('electrode')
+        self.__group.attrs['colnames'] = np.array(colnames, dtype=object)
+
+        self.__electrode_refs = None
+        self.__num_units = 0
+        self.__num_written = 0
+        self.__clear_buffers()
+
+    def __empty_dataset(self, row_shape, dtype):
+        rows_per_chunk = max(1, self.__chunk_size // int(np.prod(row_shape, dtype=np.int64)))
+        return H5DataIO(np.zeros((0,) + row_shape, dtype=dtype), maxshape=(None,) + row_shape,
+                        chunks=(rows_per_chunk,) + row_shape)
+
+    def __clear_buffers(self):
+        self.__buffers = {key: list() for key in self.__shapes}
+        self.__counts = {key: list() for key in ('spike_times', 'obs_intervals') if key in self.__shapes}
+        self.__electrodes = list()
+        self.__extra_spikes = list()
+        self.__buffered_bytes = 0
+
+    @property
+    def num_units(self):
+        """The number of units added so far, including units that have not been flushed yet."""
+        return self.__num_units
+
+    @docval({'name': 'spike_times', 'type': 'array_data', 'doc': 'Spike times for each unit',
+             'default': None, 'shape': (None,)},
+            {'name': 'obs_intervals', 'type': 'array_data',
+             'doc': ('Observation intervals (valid times) for each unit. All spike_times for a given unit '
+                     'should fall within these intervals. [[start1, end1], [start2, end2], ...]'),
+             'default': None, 'shape': (None, 2)},
+            {'name': 'electrode', 'type': IntracellularElectrode,
+             'doc': 'Electrode that each unit came from', 'default': None},
+            {'name': 'waveform_mean', 'type': 'array_data',
+             'doc': 'Spike waveform mean for each unit. Shape is (time,)', 'default': None, 'shape': (None,)},
+            {'name': 'waveform_sd', 'type': 'array_data',
+             'doc': 'Spike waveform standard deviation for each unit. Shape is (time,)', 'default': None,
+             'shape': (None,)},
+            {'name': 'id', 'type': int, 'default': None, 'doc': 'ID for each unit'})
+    def add_unit(self, **kwargs):
+        """Add a unit to the table. Its data is written to the file on the next flush."""
+        electrode = popargs('electrode', kwargs)
+        if self.__has_electrode != (electrode is not None):
+            raise ValueError("electrode must be given %s" % ("for every unit" if self.__has_electrode else
+                                                             "only if the writer was created with electrode=True"))
+        if kwargs['id'] is None:
+            kwargs['id'] = self.__num_units
+        if kwargs['spike_times'] is None:
+            kwargs['spike_times'] = np.zeros(0)
+        if kwargs['obs_intervals'] is None and 'obs_intervals' in self.__shapes:
+            kwargs['obs_intervals'] = np.zeros((0, 2))
+        rows = dict()
+        for key, value in kwargs.items():
+            if key not in self.__shapes:
+                if value is not None:
+                    raise ValueError("%s was not enabled when the writer was created" % key)
+                continue
+            if value is None:
+                raise ValueError("%s must be given for every unit" % key)
+            dtype = np.float32 if key.startswith('waveform') else np.int64 if key == 'id' else np.float64
+            value = np.asarray(value, dtype=dtype)
+            if key in self.__counts:
+                if value.shape[1:] != self.__shapes[key]:
+                    raise ValueError("%s must have rows of shape %s" % (key, str(self.__shapes[key])))
+            elif value.shape != self.__shapes[key]:
+                raise ValueError("%s must have shape %s" % (key, str(self.__shapes[key])))
+            rows[key] = value
+        for key, value in rows.items():
+            if key in self.__counts:
+                self.__counts[key].append(len(value))
+            self.__buffers[key].append(value)
+            self.__buffered_bytes += value.nbytes
+        if electrode is not None:
+            self.__electrodes.append(electrode)
+        self.__num_units += 1
+        self.__maybe_flush()
+
+    @docval({'name': 'spike_times', 'type': 'array_data', 'doc': 'Spike times to add to the last unit',
+             'shape': (None,)})
+    def extend_unit(self, **kwargs):
+        """Add spike times to the most recently added unit.
+
+        This allows writing the spike times of a long-running unit in blocks as they are detected. The spike times
+        must come after all spike times already added to the unit.
+        """
+        spike_times = np.asarray(getargs('spike_times', kwargs), dtype=np.float64)
+        if self.__num_units == 0:
+            raise ValueError("no unit to extend")
+        if self.__counts['spike_times']:
+            self.__counts['spike_times'][-1] += len(spike_times)
+            self.__buffers['spike_times'].append(spike_times)
+        else:
+            # the last unit was already flushed, so only its end offset needs to be moved
+            self.__extra_spikes.append(spike_times)
+        self.__buffered_bytes += spike_times.nbytes
+        self.__maybe_flush()
+
+    def __maybe_flush(self):
+        if self.__buffered_bytes > self.__buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered units to the file."""
+        group = self.__group
+        if self.__extra_spikes:
+            extra = np.concatenate(self.__extra_spikes)
+            self.__append(group['spike_times'], extra)
+            group['spike_times_index'][-1] += len(extra)
+        for key, values in self.__buffers.items():
+            if not values:
+                continue
+            data = np.concatenate(values) if key in self.__counts else np.stack(values)
+            if key in self.__counts:
+                offset = group[key + '_index'][-1] if len(group[key + '_index']) else 0
+                self.__append(group[key + '_index'], np.cumsum(self.__counts[key], dtype=np.uint64) + offset)
+            self.__append(group[key], data)
+        if self.__electrodes:
+            self.__append(group['electrode'], [self.__get_electrode_ref(e) for e in self.__electrodes])
+        self.__num_written = self.__num_units
+        self.__clear_buffers()
+        self.__file.flush()
+
+    @staticmethod
+    def __append(dataset, data):
+        start = dataset.shape[0]
+        dataset.resize(start + len(data), axis=0)
+        dataset[start:] = data
+
+    def __get_electrode_ref(self, electrode):
+        if self.__electrode_refs is None:
+            refs = dict()
+
+            def visit(name, obj):
+                if 'object_id' in obj.attrs:
+                    refs[obj.attrs['object_id']] = obj.ref
+
+            self.__file['general'].visititems(visit)
+            self.__electrode_refs = refs
+        try:
+            return self.__electrode_refs[electrode.object_id]
+        except KeyError:
+            raise ValueError("electrode '%s' was not written to the file" % electrode.name)
+
+    def close(self):
+        """Write all buffered units and close the file."""
+        if self.__file:
+            self.flush()
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
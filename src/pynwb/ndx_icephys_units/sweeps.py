@@ -0,0 +1,47 @@
+"""Time spans of intracellular recordings, used to map spikes to the sweeps they were recorded in."""
+import numpy as np
+
+from pynwb.icephys import IntracellularRecordingsTable
+
+
+def _span(series, idx_start, count):
+    """Get the (start, stop) time span of the count samples of series from idx_start on."""
+    if series.timestamps is not None:
+        timestamps = np.asarray(series.timestamps[idx_start:idx_start + count], dtype=np.float64)
+        # like with a rate, the span ends at the end of the last sample, which lasts the median sampling interval,
+        # or just after the last timestamp if there is a single sample
+        if count > 1:
+            return timestamps[0], timestamps[-1] + np.median(np.diff(timestamps))
+        return timestamps[0], np.nextafter(timestamps[-1], np.inf)
+    start = (series.starting_time or 0.) + idx_start / series.rate
+    return start, start + count / series.rate
+
+
+def _is_valid(ref):
+    return ref is not None and ref.timeseries is not None and ref.idx_start is not None and ref.idx_start >= 0
+
+
+def recording_spans(recordings):
+    """Get the electrode and the (start, stop) time span of each of the given recordings.
+
+    Recordings are given as an IntracellularRecordingsTable, with one recording per row spanning its response, or
+    its stimulus if it has no response, or as a list of PatchClampSeries, with one recording per series.
+
+    :returns: a tuple (electrodes, starts, stops) with one entry per recording
+    """
+    if isinstance(recordings, IntracellularRecordingsTable):
+        electrodes = list(recordings.get_category('electrodes')['electrode'][:])
+        refs = recordings.get_category('responses')['response'][:]
+        if 'stimuli' in recordings.category_tables:
+            refs = [ref if _is_valid(ref) else stim
+                    for ref, stim in zip(refs, recordings.get_category('stimuli')['stimulus'][:])]
+        spans = list()
+        for row, ref in enumerate(refs):
+            if not _is_valid(ref):
+                raise ValueError("intracellular recording %d has neither a response nor a stimulus" % row)
+            spans.append(_span(ref.timeseries, int(ref.idx_start), int(ref.count)))
+    else:
+        electrodes = [series.electrode for series in recordings]
+        spans = [_span(series, 0, len(series.data)) for series in recordings]
+    spans = np.array(spans, dtype=np.float64).reshape(-1, 2)
+    return electrodes, spans[:, 0], spans[:, 1]
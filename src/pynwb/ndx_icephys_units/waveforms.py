@@ -0,0 +1,153 @@
+"""Spike waveform means and standard deviations extracted from the intracellular recordings of an ICEphysUnits
+table."""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from hdmf.utils import docval, getargs
+
+from pynwb.icephys import PatchClampSeries
+
+from .icephys_units import ICEphysUnits
+
+
+class _WaveformStats:
+    """Running count, mean and sum of squared deviations of the waveforms of each unit, merged batch by batch with
+    the parallel form of Welford's algorithm (Chan et al.)."""
+
+    def __init__(self, num_units, num_samples):
+        self.count = np.zeros(num_units, dtype=np.int64)
+        self.mean = np.zeros((num_units, num_samples))
+        self.m2 = np.zeros((num_units, num_samples))
+
+    def update(self, labels, snippets):
+        """Add the snippets, one per row, of the units given by labels."""
+        if not labels.size:
+            return
+        units, labels = np.unique(labels, return_inverse=True)
+        count = np.bincount(labels)
+        mean = np.zeros((units.size, snippets.shape[1]))
+        np.add.at(mean, labels, snippets)
+        mean /= count[:, np.newaxis]
+        m2 = np.zeros(mean.shape)
+        np.add.at(m2, labels, (snippets - mean[labels]) ** 2)
+        previous = self.count[units]
+        merged = previous + count
+        delta = mean - self.mean[units]
+        weight = (count / merged)[:, np.newaxis]
+        self.mean[units] += delta * weight
+        self.m2[units] += m2 + delta ** 2 * previous[:, np.newaxis] * weight
+        self.count[units] = merged
+
+    def result(self):
+        """Get the mean and standard deviation of each unit, which are NaN for units without waveforms."""
+        mean = np.full(self.mean.shape, np.nan)
+        sd = np.full(self.m2.shape, np.nan)
+        present = self.count > 0
+        mean[present] = self.mean[present]
+        sd[present] = np.sqrt(self.m2[present] / self.count[present, np.newaxis])
+        return mean, sd
+
+
+def _series_rate(series):
+    if series.rate is None:
+        raise ValueError("%s '%s' has timestamps instead of a sampling rate"
+                         % (series.__class__.__name__, series.name))
+    if len(series.data.shape) != 1:
+        raise ValueError("%s '%s' does not have one-dimensional data" % (series.__class__.__name__, series.name))
+    return float(series.rate)
+
+
+def _accumulate(stats, units, unit_ids, series, window, chunk_size):
+    """Add the waveforms of the given units within the recording of series to stats."""
+    rate = _series_rate(series)
+    pre, post = int(round(-window[0] * rate)), int(round(window[1] * rate))
+    num_samples = pre + post
+    length = series.data.shape[0]
+    start_time = series.starting_time or 0.
+    values, offsets = units.query_spike_times(unit_ids, (start_time, start_time + length / rate))
+    labels = np.repeat(unit_ids, np.diff(offsets))
+    # the first sample of the snippet of each spike, keeping only snippets fully within the recording
+    first = np.rint((values - start_time) * rate).astype(np.int64) - pre
+    keep = (first >= 0) & (first + num_samples <= length)
+    first, labels = first[keep], labels[keep]
+    order = np.argsort(first, kind='stable')
+    first, labels = first[order], labels[order]
+
+    conversion = series.conversion if series.conversion is not None else 1.
+    offset = getattr(series, 'offset', None) or 0.
+    # each block of the recording holds the snippets starting within [block_start, block_start + chunk_size)
+    bounds = np.searchsorted(first, np.arange(0, length + chunk_size, chunk_size), side='left')
+    for k in range(bounds.size - 1):
+        lo, hi = bounds[k], bounds[k + 1]
+        if lo == hi:
+            continue
+        block_start = k * chunk_size
+        block_stop = min(block_start + chunk_size + num_samples - 1, length)
+        data = np.asarray(series.data[block_start:block_stop], dtype=np.float64) * conversion + offset
+        snippets = sliding_window_view(data, num_samples)[first[lo:hi] - block_start]
+        stats.update(labels[lo:hi], snippets)
+
+
+@docval({'name': 'units', 'type': ICEphysUnits, 'doc': 'the table holding the spike times'},
+        {'name': 'series', 'type': (list, tuple),
+         'doc': ('the PatchClampSeries holding the recordings. The waveforms of each unit are taken from the series '
+                 'recorded with the electrode of the unit')},
+        {'name': 'window', 'type': (tuple, list), 'shape': (2,), 'default': (-1e-3, 2e-3),
+         'doc': 'the (start, stop) of the waveform around each spike, relative to the spike time, in seconds'},
+        {'name': 'chunk_size', 'type': int, 'default': 2 ** 20,
+         'doc': 'the number of samples of a recording to read at once'},
+        {'name': 'write', 'type': bool, 'default': True,
+         'doc': 'add the waveform_mean and waveform_sd columns to units and set its waveform_rate'},
+        is_method=False)
+def compute_waveforms(**kwargs):
+    """Compute the mean and standard deviation of the spike waveforms of each unit from its recordings.
+
+    Each spike is matched to the series recorded with the electrode of its unit that spans the spike time, and the
+    waveform is taken from the nearest sample. Recordings are read in blocks of chunk_size samples. The waveforms
+    starting within a block are taken from the block as views with a sliding window and merged into running means
+    and sums of squared deviations, so a recording is never loaded whole. Spikes whose waveform is not fully
+    within a recording are skipped. All series must have the same sampling rate. Data is converted to volts with
+    the conversion and offset of each series.
+
+    Returns a tuple (waveform_mean, waveform_sd) of arrays of shape (units, samples). The standard deviation is
+    that of the population of waveforms. Both are NaN for units without waveforms.
+    """
+    units, series, window, chunk_size, write = getargs('units', 'series', 'window', 'chunk_size', 'write', kwargs)
+    if not window[1] > window[0]:
+        raise ValueError("window must have stop > start, got %s" % str(tuple(window)))
+    if not chunk_size > 0:
+        raise ValueError("chunk_size must be positive, got %d" % chunk_size)
+    if not series:
+        raise ValueError("series must not be empty")
+    for s in series:
+        if not isinstance(s, PatchClampSeries):
+            raise ValueError("series must be PatchClampSeries, got %s" % type(s).__name__)
+    rates = {_series_rate(s) for s in series}
+    if len(rates) > 1:
+        raise ValueError("all series must have the same sampling rate, got %s" % sorted(rates))
+    if write and ('waveform_mean' in units.colnames or 'waveform_sd' in units.colnames):
+        raise ValueError("%s '%s' already has waveform columns" % (units.__class__.__name__, units.name))
+    if 'electrode' not in units.colnames:
+        raise ValueError("%s '%s' has no electrode column" % (units.__class__.__name__, units.name))
+    rate = rates.pop()
+    if write and units.waveform_rate is not None and units.waveform_rate != rate:
+        raise ValueError("%s '%s' has waveform_rate %s but the series have rate %s"
+                         % (units.__class__.__name__, units.name, units.waveform_rate, rate))
+
+    num_samples = int(round(-window[0] * rate)) + int(round(window[1] * rate))
+    if num_samples < 1:
+        raise ValueError("window must span at least one sample at rate %s" % rate)
+    stats = _WaveformStats(len(units), num_samples)
+    for s in series:
+        unit_ids = units.get_units_by_electrode(s.electrode)
+        if unit_ids.size:
+            _accumulate(stats, units, unit_ids, s, window, chunk_size)
+    waveform_mean, waveform_sd = stats.result()
+    if write:
+        units.add_column(name='waveform_mean', description='Spike waveform mean for each unit',
+                         data=waveform_mean.astype(np.float32))
+        units.add_column(name='waveform_sd', description='Spike waveform standard deviation for each unit',
+                         data=waveform_sd.astype(np.float32))
+        if units.waveform_rate is None:
+            units.waveform_rate = rate
+    return waveform_mean, waveform_sd
@@ -0,0 +1,64 @@
+import numpy as np
+from datetime import datetime
+
+from pynwb import NWBFile, NWBHDF5IO
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.aggregate import aggregate_units
+
+from .utils import UnitFilesMixin
+
+
+class TestAggregateUnits(UnitFilesMixin, TestCase):
+    prefix = 'test_aggregate'
+
+    def make_units(self, nwbfile, session, spike_times):
+        device = nwbfile.create_device(name='device_name')
+        electrode = nwbfile.create_icephys_electrode(name='elec%d' % session, device=device,
+                                                     description='description')
+        units = ICEphysUnits(resolution=1e-4)
+        units.add_column(name='quality', description='a float column')
+        for k, st in enumerate(spike_times):
+            units.add_unit(spike_times=st, obs_intervals=[[0., 10. * (session + 1)]], electrode=electrode,
+                           quality=float(k), id=10 * session + k)
+        return units
+
+    def test_aggregate(self):
+        units = aggregate_units(self.paths)
+        self.assertEqual(len(units), 6)
+        self.assertEqual(units.resolution, 1e-4)
+        self.assertEqual(units['file'].data, [self.paths[0]] * 2 + [self.paths[1]] + [self.paths[2]] * 3)
+        self.assertEqual(units['session_id'].data, ['session0'] * 2 + ['session1'] + ['session2'] * 3)
+        self.assertEqual(units['source_id'].data, [0, 1, 10, 20, 21, 22])
+        self.assertEqual(units['electrode_name'].data, ['elec0'] * 2 + ['elec1'] + ['elec2'] * 3)
+        self.assertEqual(units['quality'].data, [0., 1., 0., 0., 1., 2.])
+        np.testing.assert_array_equal(units['spike_times'].data, [2, 3, 6, 6, 7, 9])
+        np.testing.assert_array_equal(units.get_unit_spike_times(5), [7., 8.])
+        np.testing.assert_array_equal(units.get_unit_obs_intervals(2), [[0., 20.]])
+
+    def test_aggregate_parallel_columnar(self):
+        merged = aggregate_units(self.paths, n_jobs=2, as_table=False)
+        np.testing.assert_array_equal(merged['spike_times'], np.arange(9.))
+        np.testing.assert_array_equal(merged['spike_times_counts'], [2, 1, 3, 0, 1, 2])
+        np.testing.assert_array_equal(merged['obs_intervals'][:, 1], [10., 10., 20., 30., 30., 30.])
+        np.testing.assert_array_equal(merged['session_id'], aggregate_units(self.paths)['session_id'].data)
+
+    def test_aggregate_roundtrip(self):
+        units = aggregate_units(self.paths[:2])
+        nwbfile = NWBFile(session_description='session_description', identifier='merged',
+                          session_start_time=datetime.now().astimezone())
+        nwbfile.add_acquisition(units)
+        path = 'test_aggregate_merged.nwb'
+        self.paths.append(path)
+        with NWBHDF5IO(path, 'w') as io:
+            io.write(nwbfile)
+        with NWBHDF5IO(path, 'r') as io:
+            read_units = io.read().acquisition['ICEphysUnits']
+            np.testing.assert_array_equal(read_units.get_unit_spike_times(2), [3., 4., 5.])
+            self.assertEqual(read_units['session_id'][2], 'session1')
+
+    def test_aggregate_missing_table(self):
+        with self.assertRaisesWith(ValueError, "expected one ICEphysUnits table named 'other' in NWB file "
+                                               "'session0', found 0"):
+            aggregate_units(self.paths, name='other')
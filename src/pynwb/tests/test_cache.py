@@ -0,0 +1,99 @@
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.cache import ColumnBlockCache
+
+
+class TestColumnBlockCache(TestCase):
+    def test_read(self):
+        cache = ColumnBlockCache(block_size=4)
+        data = list(range(10))
+        np.testing.assert_array_equal(cache.read('a', data, 2, 9), data[2:9])
+        self.assertEqual(len(cache), 3)
+        np.testing.assert_array_equal(cache.read('a', data, 8, 20), [8, 9])
+        np.testing.assert_array_equal(cache.read('a', data, 5, 5), [])
+
+    def test_read_2d(self):
+        cache = ColumnBlockCache(block_size=2)
+        data = np.arange(10.).reshape(5, 2)
+        np.testing.assert_array_equal(cache.read('a', data, 1, 4), data[1:4])
+
+    def test_eviction(self):
+        cache = ColumnBlockCache(max_bytes=2 * 4 * 8, block_size=4)
+        data = np.arange(16.)
+        cache.read('a', data, 0, 4)
+        cache.read('a', data, 4, 8)
+        cache.read('a', data, 0, 4)
+        cache.read('a', data, 8, 12)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.nbytes, 64)
+        # the block holding rows 4-8 was the least recently used one
+        data[4] = -1.
+        data[0] = -1.
+        np.testing.assert_array_equal(cache.read('a', data, 0, 5), [0., 1., 2., 3., -1.])
+
+    def test_invalidate_partial(self):
+        cache = ColumnBlockCache(block_size=4)
+        data = list(range(6))
+        cache.read('a', data, 0, 6)
+        data.append(6)
+        np.testing.assert_array_equal(cache.read('a', data, 0, 7), [0, 1, 2, 3, 4, 5])
+        cache.invalidate(partial_only=True)
+        self.assertEqual(len(cache), 1)
+        np.testing.assert_array_equal(cache.read('a', data, 0, 7), range(7))
+
+    def test_bad_args(self):
+        with self.assertRaises(ValueError):
+            ColumnBlockCache(max_bytes=-1)
+        with self.assertRaises(ValueError):
+            ColumnBlockCache(block_size=0)
+
+
+class TestICEphysUnitsCache(TestCase):
+    def _init_units(self):
+        ut = ICEphysUnits()
+        ut.enable_cache(block_size=2)
+        ut.add_unit(spike_times=[0., 1., 2.], obs_intervals=[[0., 2.]])
+        ut.add_unit(spike_times=[3., 4., 5.], obs_intervals=[[2., 3.], [4., 5.]])
+        return ut
+
+    def test_get_spike_times(self):
+        ut = self._init_units()
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1, (3.5, 5.)), [4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(-1), [3., 4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_obs_intervals(1), [[2., 3.], [4., 5.]])
+
+    def test_add_unit_invalidates(self):
+        ut = self._init_units()
+        ut.query_spike_times([0, 1])
+        ut.get_unit_obs_intervals(1)
+        ut.add_unit(spike_times=[6., 7.], obs_intervals=[[6., 8.]])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(2), [6., 7.])
+        np.testing.assert_array_equal(ut.get_unit_obs_intervals(2), [[6., 8.]])
+        values, offsets = ut.query_spike_times([0, 1, 2])
+        np.testing.assert_array_equal(values, [0., 1., 2., 3., 4., 5., 6., 7.])
+        np.testing.assert_array_equal(offsets, [0, 3, 6, 8])
+
+    def test_add_column_invalidates(self):
+        ut = ICEphysUnits()
+        ut.enable_cache()
+        ut.add_unit()
+        ut.add_column(name='spike_times', description='spike times', data=[[0., 1.]], index=True)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1.])
+
+    def test_memory_budget(self):
+        ut = self._init_units()
+        ut.enable_cache(max_bytes=16, block_size=2)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [3., 4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2.])
+        self.assertLessEqual(ut._cache.nbytes, 16)
+
+    def test_disable_cache(self):
+        ut = self._init_units()
+        ut.get_unit_spike_times(0)
+        ut.disable_cache()
+        self.assertIsNone(ut._cache)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2.])
@@ -0,0 +1,64 @@
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.correlograms import compute_correlogram, compute_correlograms
+
+
+def _brute_force(a, b, edges, same=False):
+    lags = (b[np.newaxis, :] - a[:, np.newaxis])
+    if same:
+        lags = lags[~np.eye(len(a), dtype=bool)]
+    lags = lags.ravel()
+    return np.array([np.sum((lags >= lo) & (lags < hi)) for lo, hi in zip(edges[:-1], edges[1:])])
+
+
+class TestCorrelograms(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.spike_times = [np.sort(rng.uniform(0, 10, n)) for n in (300, 0, 500)]
+        self.units = ICEphysUnits()
+        for st in self.spike_times:
+            self.units.add_unit(spike_times=st)
+
+    def test_correlogram(self):
+        a, b = self.spike_times[0], self.spike_times[2]
+        counts, edges = compute_correlogram(a, b, bin_width=.005, window=.05)
+        self.assertEqual(len(edges), 21)
+        np.testing.assert_array_equal(counts, _brute_force(a, b, edges))
+
+    def test_autocorrelogram(self):
+        a = np.array([0., .001, .002, .01])
+        counts, edges = compute_correlogram(a, bin_width=.001, window=.003)
+        np.testing.assert_array_equal(counts, [0, 1, 2, 0, 2, 1])
+
+    def test_all_pairs(self):
+        counts, edges = compute_correlograms(self.units, bin_width=.01, window=.1)
+        self.assertEqual(counts.shape, (3, 3, 20))
+        for i in range(3):
+            for j in range(3):
+                expected = _brute_force(self.spike_times[i], self.spike_times[j], edges, same=(i == j))
+                np.testing.assert_array_equal(counts[i, j], expected)
+
+    def test_pairs(self):
+        counts, edges = compute_correlograms(self.units, bin_width=.01, window=.1, pairs=[[2, 0], [0, 0]])
+        all_counts, _ = compute_correlograms(self.units, bin_width=.01, window=.1)
+        np.testing.assert_array_equal(counts, all_counts[[2, 0], [0, 0]])
+
+    def test_process_pool(self):
+        counts, _ = compute_correlograms(self.units, bin_width=.01, window=.1, n_jobs=2)
+        expected, _ = compute_correlograms(self.units, bin_width=.01, window=.1)
+        np.testing.assert_array_equal(counts, expected)
+
+    def test_all_pairs_on_edges(self):
+        # lags on the edges of bins that are not symmetric about zero, which mirroring the counts would misplace
+        units = ICEphysUnits()
+        spike_times = [np.array([0., .25, .5]), np.array([.125, .25, .75])]
+        for st in spike_times:
+            units.add_unit(spike_times=st)
+        counts, edges = compute_correlograms(units, bin_width=.25, window=.625, index=[1, 0])
+        for i, a in enumerate([1, 0]):
+            for j, b in enumerate([1, 0]):
+                expected = _brute_force(spike_times[a], spike_times[b], edges, same=(a == b))
+                np.testing.assert_array_equal(counts[i, j], expected)
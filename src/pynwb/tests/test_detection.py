@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+from datetime import datetime
+
+from pynwb import NWBFile, NWBHDF5IO
+from pynwb.icephys import CurrentClampSeries
+from pynwb.testing import TestCase, remove_test_file
+
+from ndx_icephys_units.detection import detect_spikes, detect_units
+
+
+def _trace(rate, duration, spike_times, width=1e-3):
+    """Make a trace at -0.07 V with square pulses to 0.03 V of the given width starting at each spike time."""
+    data = np.full(int(round(duration * rate)), -0.07)
+    for st in spike_times:
+        data[int(round(st * rate)):int(round((st + width) * rate))] = 0.03
+    return data
+
+
+class TestDetection(TestCase):
+    def setUp(self):
+        self.nwbfile = NWBFile(session_description='session_description', identifier='identifier',
+                               session_start_time=datetime.now().astimezone())
+        device = self.nwbfile.create_device(name='device_name')
+        self.electrodes = [self.nwbfile.create_icephys_electrode(name='elec%d' % i, device=device,
+                                                                 description='description') for i in range(2)]
+        self.rate = 10000.
+        self.spike_times = [[.1005, .2, .5002], [.05, .3], [.7]]
+        self.series = list()
+        for i, (st, electrode) in enumerate(zip(self.spike_times, [0, 1, 0])):
+            start_time = 1. * i
+            series = CurrentClampSeries(name='ccs%d' % i, data=_trace(self.rate, 1., st), gain=1., rate=self.rate,
+                                        starting_time=start_time, electrode=self.electrodes[electrode])
+            self.nwbfile.add_acquisition(series)
+            self.series.append(series)
+
+    def test_detect_spikes(self):
+        times = detect_spikes(self.series[0], threshold=-0.02)
+        # the crossing is interpolated halfway between the last sample below and the first sample above threshold
+        np.testing.assert_allclose(times, np.array(self.spike_times[0]) - .5 / self.rate)
+
+    def test_chunk_boundaries(self):
+        expected = detect_spikes(self.series[0], threshold=-0.02)
+        for chunk_size in (1, 2, 7, 1000, 1002):
+            np.testing.assert_array_equal(detect_spikes(self.series[0], threshold=-0.02, chunk_size=chunk_size),
+                                          expected)
+
+    def test_refractory(self):
+        data = _trace(self.rate, 1., [.1, .1015, .103, .104, .2], width=2e-4)
+        series = CurrentClampSeries(name='ccs', data=data, gain=1., rate=self.rate, electrode=self.electrodes[0])
+        times = detect_spikes(series, threshold=-0.02, refractory=2.5e-3, chunk_size=3)
+        np.testing.assert_allclose(times, [.09995, .10295, .19995])
+
+    def test_detect_units(self):
+        units = detect_units(self.series, threshold=-0.02)
+        self.assertEqual(len(units), 2)
+        self.assertIs(units['electrode'][0], self.electrodes[0])
+        self.assertIs(units['electrode'][1], self.electrodes[1])
+        np.testing.assert_allclose(units.get_unit_spike_times(0), [.10045, .19995, .50015, 2.69995], atol=1e-9)
+        np.testing.assert_allclose(units.get_unit_spike_times(1), [1.04995, 1.29995], atol=1e-9)
+        np.testing.assert_array_equal(units.get_unit_obs_intervals(0), [[0., 1.], [2., 3.]])
+        np.testing.assert_array_equal(units.get_unit_obs_intervals(1), [[1., 2.]])
+        self.assertEqual(units.check_integrity(), [])
+
+    def test_detect_units_from_file(self):
+        filename = 'test_detection.nwb'
+        try:
+            with NWBHDF5IO(filename, 'w') as io:
+                io.write(self.nwbfile)
+            expected = detect_units(self.series, threshold=-0.02)
+            with NWBHDF5IO(filename, 'r') as io:
+                read_nwbfile = io.read()
+                series = [read_nwbfile.acquisition['ccs%d' % i] for i in range(3)]
+                units = detect_units(series, threshold=-0.02, chunk_size=1000, n_jobs=2)
+                self.assertIs(units['electrode'][0], read_nwbfile.icephys_electrodes['elec0'])
+                np.testing.assert_array_equal(units['spike_times'].target.data, expected['spike_times'].target.data)
+                np.testing.assert_array_equal(units['spike_times'].data, expected['spike_times'].data)
+        finally:
+            if os.path.exists(filename):
+                remove_test_file(filename)
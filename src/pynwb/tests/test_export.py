@@ -0,0 +1,65 @@
+import os
+from unittest import skipIf
+
+import numpy as np
+
+from pynwb.testing import TestCase, remove_test_file
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.export import to_long_dataframe, write_parquet, _iter_long
+
+try:
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.units = ICEphysUnits()
+        self.units.add_unit(spike_times=[], obs_intervals=[[0., 1.]], id=5)
+        self.units.add_unit(spike_times=[0., 1., 2.], obs_intervals=[[0., 1.], [2., 3.]], id=6)
+        self.units.add_unit(spike_times=[], obs_intervals=np.zeros((0, 2)), id=7)
+        self.units.add_unit(spike_times=[3., 4.], obs_intervals=[[3., 5.]], id=8)
+
+    def test_spike_times(self):
+        df = to_long_dataframe(self.units)
+        self.assertEqual(list(df.columns), ['unit_id', 'spike_time'])
+        np.testing.assert_array_equal(df['unit_id'], [6, 6, 6, 8, 8])
+        np.testing.assert_array_equal(df['spike_time'], [0., 1., 2., 3., 4.])
+
+    def test_obs_intervals(self):
+        df = to_long_dataframe(self.units, column='obs_intervals')
+        self.assertEqual(list(df.columns), ['unit_id', 'start', 'stop'])
+        np.testing.assert_array_equal(df['unit_id'], [5, 6, 6, 8])
+        np.testing.assert_array_equal(df['stop'], [1., 1., 3., 5.])
+
+    def test_empty(self):
+        units = ICEphysUnits()
+        units.add_unit(spike_times=[])
+        df = to_long_dataframe(units)
+        self.assertEqual(list(df.columns), ['unit_id', 'spike_time'])
+        self.assertEqual(len(df), 0)
+
+    def test_chunks(self):
+        for chunk_size in (1, 2, 4):
+            blocks = list(_iter_long(self.units, 'spike_times', chunk_size))
+            np.testing.assert_array_equal(np.concatenate([b['unit_id'] for b in blocks]), [6, 6, 6, 8, 8])
+            np.testing.assert_array_equal(np.concatenate([b['spike_time'] for b in blocks]), [0., 1., 2., 3., 4.])
+
+    def test_bad_column(self):
+        with self.assertRaisesWith(ValueError, "column must be one of obs_intervals, spike_times, got 'foo'"):
+            to_long_dataframe(self.units, column='foo')
+
+    @skipIf(not HAVE_PYARROW, 'pyarrow is not installed')
+    def test_write_parquet(self):
+        path = 'test_export.parquet'
+        try:
+            self.assertEqual(write_parquet(self.units, path, row_group_size=2), 5)
+            table = pq.read_table(path)
+            self.assertGreater(pq.ParquetFile(path).num_row_groups, 1)
+            np.testing.assert_array_equal(table.column('spike_time').to_numpy(), [0., 1., 2., 3., 4.])
+        finally:
+            if os.path.exists(path):
+                remove_test_file(path)
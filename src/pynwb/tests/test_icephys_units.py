@@ -1,10 +1,32 @@
+import os
+import shutil
+import unittest
+import warnings
+from unittest import mock
+
 import numpy as np
 
+from hdmf.build import MissingRequiredBuildWarning
+from hdmf.common import VectorData
+
+from pynwb import NWBFile, get_type_map
 from pynwb.device import Device
 from pynwb.icephys import IntracellularElectrode
+from pynwb.io.core import VectorDataMap
 from pynwb.testing import TestCase, AcquisitionH5IOMixin
 
-from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units import ICEphysUnits, instrumentation
+from ndx_icephys_units._ragged import bin_edges
+
+try:
+    import scipy
+except ImportError:
+    scipy = None
+
+try:
+    from hdmf_zarr.nwb import NWBZarrIO
+except ImportError:
+    NWBZarrIO = None
 
 
 class TestICEphysUnits(TestCase):
@@ -45,6 +67,62 @@ class TestICEphysUnits(TestCase):
         ut = self._init_units()
         np.testing.assert_array_equal(ut.get_unit_spike_times((0, 1), (1.5, 3.5)), [[2], [3]])
 
+    def test_get_spike_times_ndarray(self):
+        ut = self._init_units()
+        np.testing.assert_array_equal(ut.get_unit_spike_times(np.array([1, 0])), [[3, 4, 5], [0, 1, 2]])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(np.array([0, 1]), (1.5, 3.5)), [[2], [3]])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(np.int64(1)), [3, 4, 5])
+        self.assertEqual(ut.get_unit_spike_times(np.array([], dtype=int)), [])
+
+    def test_query_spike_times(self):
+        ut = self._init_units()
+        values, offsets = ut.query_spike_times([1, 0, 1])
+        np.testing.assert_array_equal(values, [3, 4, 5, 0, 1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(offsets, [0, 3, 6, 9])
+
+    def test_query_spike_times_intervals(self):
+        ut = self._init_units()
+        values, offsets = ut.query_spike_times([0, 1, 0, 1], [[.5, 3], [1.5, 3.5], [2, 2], [5.5, 6]])
+        np.testing.assert_array_equal(values, [1, 2, 3, 2])
+        np.testing.assert_array_equal(offsets, [0, 2, 3, 4, 4])
+
+    def test_query_spike_times_single_interval(self):
+        ut = self._init_units()
+        values, offsets = ut.query_spike_times(np.array([0, -1]), (1, 4))
+        np.testing.assert_array_equal(values, [1, 2, 3, 4])
+        np.testing.assert_array_equal(offsets, [0, 2, 4])
+
+    def test_query_spike_times_empty(self):
+        ut = self._init_units()
+        values, offsets = ut.query_spike_times([])
+        self.assertEqual(len(values), 0)
+        np.testing.assert_array_equal(offsets, [0])
+
+    def test_query_spike_times_far_apart(self):
+        ut = ICEphysUnits()
+        ut.add_units(spike_times=np.arange(100000.), spike_times_counts=np.full(10000, 10))
+        instrumentation.enable_instrumentation()
+        try:
+            values, offsets = ut.query_spike_times([9999, 0, 1, 9999], [[99995., 1e6], [0., 9.], [0., 1e6], [0., 0.]])
+            received = ut.get_unit_spike_times([0, 9999])
+            stats = instrumentation.get_stats()
+        finally:
+            instrumentation.disable_instrumentation()
+            instrumentation.reset_stats()
+        np.testing.assert_array_equal(values, np.r_[99995.:100000., 0.:10., 10.:20.])
+        np.testing.assert_array_equal(offsets, [0, 5, 15, 25, 25])
+        np.testing.assert_array_equal(received, [np.arange(10.), np.arange(99990., 100000.)])
+        # only the requested units and the index entries around them are read, not the span between them
+        self.assertLess(stats['ICEphysUnits.query_spike_times']['bytes_read'], 100 * 8)
+        self.assertLess(stats['ICEphysUnits.get_unit_spike_times']['bytes_read'], 100 * 8)
+
+    def test_query_spike_times_bad_args(self):
+        ut = self._init_units()
+        with self.assertRaises(IndexError):
+            ut.query_spike_times([2])
+        with self.assertRaises(ValueError):
+            ut.query_spike_times([0, 1], [[0, 1], [0, 1], [0, 1]])
+
     def test_times(self):
         ut = self._init_units()
         self.assertTrue(all(ut['spike_times'][0] == np.array([0., 1., 2.])))
@@ -73,6 +151,56 @@ class TestICEphysUnits(TestCase):
         self.assertTrue(np.all(ut['obs_intervals'][0] == np.array([[0., 2.]])))
         self.assertTrue(np.all(ut['obs_intervals'][1] == np.array([[2., 3.], [4., 5.]])))
 
+    def test_add_units(self):
+        ut = ICEphysUnits()
+        ut.add_units(spike_times=np.array([0., 1., 2., 3., 4., 5.]), spike_times_counts=[3, 0, 3],
+                     obs_intervals=[[0., 2.], [2., 3.], [3., 4.], [4., 5.]], obs_intervals_counts=[1, 1, 2],
+                     waveform_mean=np.ones((3, 4), dtype=np.float32))
+        np.testing.assert_array_equal(ut.id.data, [0, 1, 2])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(2), [3., 4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_obs_intervals(2), [[3., 4.], [4., 5.]])
+        np.testing.assert_array_equal(ut['waveform_mean'][1], np.ones(4))
+
+    def test_add_units_after_add_unit(self):
+        ut = self._init_units()
+        ut.add_column(name='foo', description='an int column', data=[1, 2])
+        ut.add_units(spike_times=[6., 7., 8.], spike_times_counts=[1, 2], foo=np.array([3, 4]), id=[10, 11])
+        ut.add_unit(spike_times=[9.], foo=5)
+        np.testing.assert_array_equal(ut.id.data, [0, 1, 10, 11, 4])
+        np.testing.assert_array_equal(ut['spike_times'].data, [3, 6, 7, 9, 10])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(3), [7., 8.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(4), [9.])
+        np.testing.assert_array_equal(ut['foo'].data, [1, 2, 3, 4, 5])
+
+    def test_add_units_bad_args(self):
+        ut = self._init_units()
+        with self.assertRaisesWith(ValueError, "'spike_times' and 'spike_times_counts' must be given together"):
+            ut.add_units(spike_times=[0.])
+        with self.assertRaises(ValueError):
+            ut.add_units(spike_times=[0., 1.], spike_times_counts=[1])
+        with self.assertRaises(ValueError):
+            ut.add_units(spike_times=[0., 1.], spike_times_counts=[1, 1], id=[2])
+        with self.assertRaises(ValueError):
+            ut.add_units(spike_times=[0.], spike_times_counts=[1], obs_intervals=[[0., 1.]], obs_intervals_counts=[1])
+        with self.assertRaisesWith(ValueError, "missing columns for add_units: spike_times"):
+            ut.add_units(id=[2])
+        with self.assertRaisesWith(TypeError, "electrode must be IntracellularElectrode, got str"):
+            ut.add_units(spike_times=[0.], spike_times_counts=[1], electrode=['not an electrode'])
+        self.assertEqual(len(ut), 2)
+
+    def test_add_units_waveform_width(self):
+        ut = ICEphysUnits()
+        ut.add_units(waveform_mean=[[1., 2.]])
+        msg = "all rows of 'waveform_mean' must have the same number of samples, got [2, 3]"
+        with self.assertRaisesWith(ValueError, msg):
+            ut.add_units(waveform_mean=[[1., 2.], [1., 2., 3.]])
+        with self.assertRaisesWith(ValueError, msg):
+            ut.add_units(waveform_mean=[[1., 2., 3.]])
+        ut.add_units(waveform_mean=np.ones((2, 2)))
+        self.assertEqual(len(ut), 3)
+
     def test_electrode(self):
         ut = ICEphysUnits()
         device = Device(name='device_name')
@@ -88,6 +216,272 @@ class TestICEphysUnits(TestCase):
         ut.add_unit(electrode=elec)
         self.assertIs(ut['electrode'][0], elec)
 
+    def test_get_units_by_electrode(self):
+        ut = ICEphysUnits()
+        device = Device(name='device_name')
+        elecs = [IntracellularElectrode(name='elec%d' % i, device=device, description='description')
+                 for i in range(3)]
+        for i in (1, 0, 1, 1):
+            ut.add_unit(spike_times=[float(i)], electrode=elecs[i])
+        np.testing.assert_array_equal(ut.get_units_by_electrode(elecs[1]), [0, 2, 3])
+        np.testing.assert_array_equal(ut.get_units_by_electrode('elec0'), [1])
+        np.testing.assert_array_equal(ut.get_units_by_electrode(elecs[2]), [])
+        ut.add_unit(spike_times=[2.], electrode=elecs[2])
+        np.testing.assert_array_equal(ut.get_units_by_electrode(elecs[2]), [4])
+        self.assertEqual(ut.get_unit_electrodes(), [elecs[i] for i in (1, 0, 1, 1, 2)])
+        with self.assertRaisesWith(ValueError, "ICEphysUnits 'ICEphysUnits' has no electrode column"):
+            self._init_units().get_units_by_electrode(elecs[0])
+
+    def test_encode_spike_times(self):
+        ut = ICEphysUnits(resolution=0.5)
+        ut.add_unit(spike_times=[0., 1.1, 2.3])
+        ut.encode_spike_times()
+        self.assertEqual(ut['spike_times'].target.data.io_settings['scaleoffset'], 1)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2.5])
+        ut.add_unit(spike_times=[3., 4.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [3., 4.])
+
+    def test_encode_spike_times_bad_resolution(self):
+        ut = self._init_units()
+        with self.assertRaisesWith(ValueError, "ICEphysUnits 'ICEphysUnits' has no resolution. "
+                                               "Set the resolution to encode spike times at."):
+            ut.encode_spike_times()
+        ut.encode_spike_times(resolution=1e-3)
+        self.assertEqual(ut.resolution, 1e-3)
+        with self.assertRaisesWith(ValueError, "ICEphysUnits 'ICEphysUnits' already has resolution 0.001"):
+            ut.encode_spike_times(resolution=1e-4)
+
+
+class TestICEphysUnitsRates(TestCase):
+    def setUp(self):
+        self.ut = ICEphysUnits()
+        self.ut.add_unit(spike_times=[0.5, 1., 1.5, 3.5, 6.], obs_intervals=[[0., 1.], [3., 5.]])
+        self.ut.add_unit(spike_times=[2., 2.5], obs_intervals=[[2., 4.]])
+        self.ut.add_unit(spike_times=[], obs_intervals=np.zeros((0, 2)))
+
+    def test_obs_durations(self):
+        np.testing.assert_array_equal(self.ut.get_obs_durations(), [3., 2., 0.])
+        np.testing.assert_array_equal(self.ut.get_obs_durations(index=[1]), [2.])
+
+    def test_spike_counts(self):
+        np.testing.assert_array_equal(self.ut.get_spike_counts(), [3, 2, 0])
+        np.testing.assert_array_equal(self.ut.get_spike_counts(in_obs_intervals=False), [5, 2, 0])
+        np.testing.assert_array_equal(self.ut.get_spike_counts(index=[1, 0]), [2, 3])
+
+    def test_firing_rates(self):
+        np.testing.assert_array_equal(self.ut.get_firing_rates(), [1., 1., np.nan])
+
+    def test_binned(self):
+        edges = [0., 2., 4., 6.]
+        np.testing.assert_array_equal(self.ut.get_obs_durations(bin_edges=edges), [[1., 1., 1.], [0., 2., 0.],
+                                                                                   [0., 0., 0.]])
+        # bins and observation intervals are half-open when binned, so the spike at 1. is not counted
+        np.testing.assert_array_equal(self.ut.get_spike_counts(bin_edges=edges), [[1, 1, 0], [0, 2, 0], [0, 0, 0]])
+        np.testing.assert_array_equal(self.ut.get_spike_counts(bin_edges=edges, in_obs_intervals=False),
+                                      [[3, 1, 0], [0, 2, 0], [0, 0, 0]])
+        np.testing.assert_array_equal(self.ut.get_firing_rates(index=[0], bin_edges=edges), [[1., 1., 0.]])
+
+    @unittest.skipIf(scipy is None, 'scipy is not installed')
+    def test_sparse_spike_counts(self):
+        edges = [0., 2., 4., 6.]
+        counts = self.ut.get_sparse_spike_counts(window=[0., 6.], bin_width=2.)
+        self.assertEqual(counts.format, 'csr')
+        np.testing.assert_array_equal(counts.toarray(), self.ut.get_spike_counts(bin_edges=edges))
+        counts = self.ut.get_sparse_spike_counts(window=[0., 6.], bin_width=2., in_obs_intervals=False,
+                                                 index=[2, 0], format='coo')
+        self.assertEqual(counts.format, 'coo')
+        np.testing.assert_array_equal(counts.toarray(), [[0, 0, 0], [3, 1, 0]])
+
+    @unittest.skipIf(scipy is None, 'scipy is not installed')
+    def test_sparse_spike_counts_blocks(self):
+        edges = np.append(np.arange(0.25, 6.2, 0.3), 6.2)
+        np.testing.assert_allclose(bin_edges((0.25, 6.2), 0.3), edges)
+        expected = self.ut.get_spike_counts(bin_edges=edges)
+        for block_size in (1, 2, 7, 100):
+            counts = self.ut.get_sparse_spike_counts(window=[0.25, 6.2], bin_width=0.3, block_size=block_size)
+            np.testing.assert_array_equal(counts.toarray(), expected)
+
+    @unittest.skipIf(scipy is None, 'scipy is not installed')
+    def test_sparse_spike_counts_bad_args(self):
+        with self.assertRaisesWith(ValueError, "window must have stop > start, got (1.0, 1.0)"):
+            self.ut.get_sparse_spike_counts(window=[1., 1.], bin_width=1.)
+        with self.assertRaisesWith(ValueError, "format must be 'csr' or 'coo', got 'csc'"):
+            self.ut.get_sparse_spike_counts(window=[0., 1.], bin_width=1., format='csc')
+
+    def test_time_slice(self):
+        self.ut.waveform_rate = 1000.
+        sliced = self.ut.time_slice(1., 3.5, name='epoch')
+        self.assertEqual(sliced.name, 'epoch')
+        self.assertEqual(sliced.waveform_rate, 1000.)
+        self.assertEqual(len(sliced), 3)
+        values, offsets = sliced.query_spike_times([0, 1, 2])
+        np.testing.assert_array_equal(values, [1., 1.5, 3.5, 2., 2.5])
+        np.testing.assert_array_equal(offsets, [0, 3, 5, 5])
+        # the first interval of unit 0 touches the window at 1 and is kept with zero width
+        np.testing.assert_array_equal(sliced.get_unit_obs_intervals(0), [[1., 1.], [3., 3.5]])
+        np.testing.assert_array_equal(sliced.get_unit_obs_intervals(1), [[2., 3.5]])
+        self.assertEqual(len(sliced.get_unit_obs_intervals(2)), 0)
+
+    def test_time_slice_edge(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[10., 30.], obs_intervals=[[0., 30.]])
+        self.assertEqual(ut.check_integrity(), [])
+        sliced = ut.time_slice(30, 60)
+        np.testing.assert_array_equal(sliced.get_unit_spike_times(0), [30.])
+        np.testing.assert_array_equal(sliced.get_unit_obs_intervals(0), [[30., 30.]])
+        self.assertEqual(sliced.check_integrity(), [])
+        np.testing.assert_array_equal(ut.time_slice(30, 60, lazy=True).get_unit_obs_intervals(0), [[30., 30.]])
+        self.assertEqual(len(ut.time_slice(31, 60).get_unit_obs_intervals(0)), 0)
+
+    def test_time_slice_columns(self):
+        ut = ICEphysUnits()
+        ut.add_column(name='quality', description='a custom column')
+        ut.add_units(spike_times=[0., 1., 2., 3.], spike_times_counts=[3, 1], waveform_mean=[[1., 2.], [3., 4.]],
+                     id=[5, 7], quality=['good', 'bad'])
+        sliced = ut.time_slice(0.5, 5)
+        self.assertEqual(sliced.colnames, ('quality', 'spike_times', 'waveform_mean'))
+        self.assertEqual(sliced['spike_times'].target.description, 'Spike times for each unit')
+        self.assertEqual(sliced['quality'].description, 'a custom column')
+        np.testing.assert_array_equal(sliced.id.data, [5, 7])
+        np.testing.assert_array_equal(sliced['quality'].data, ['good', 'bad'])
+        np.testing.assert_array_equal(sliced['waveform_mean'].data, [[1., 2.], [3., 4.]])
+        np.testing.assert_array_equal(sliced.get_unit_spike_times(0), [1., 2.])
+        np.testing.assert_array_equal(sliced.get_unit_spike_times(1), [3.])
+
+    def test_time_slice_lazy(self):
+        view = self.ut.time_slice(1., 3.5, lazy=True)
+        self.assertEqual(len(view), 3)
+        np.testing.assert_array_equal(view.get_unit_spike_times(0), [1., 1.5, 3.5])
+        values, offsets = view.query_spike_times([1, 0])
+        np.testing.assert_array_equal(values, [2., 2.5, 1., 1.5, 3.5])
+        np.testing.assert_array_equal(view.get_unit_obs_intervals(0), [[1., 1.], [3., 3.5]])
+        np.testing.assert_array_equal(view.to_table().get_unit_spike_times(1), [2., 2.5])
+
+    def test_iter_unit_blocks(self):
+        # 16 bytes fit the spike times of the second unit but not of the first
+        blocks = list(self.ut.iter_unit_blocks(max_bytes=16))
+        self.assertEqual(len(blocks), 2)
+        ids, values, offsets = blocks[0]
+        np.testing.assert_array_equal(ids, [0])
+        np.testing.assert_array_equal(values, [0.5, 1., 1.5, 3.5, 6.])
+        np.testing.assert_array_equal(offsets, [0, 5])
+        ids, values, offsets = blocks[1]
+        np.testing.assert_array_equal(ids, [1, 2])
+        np.testing.assert_array_equal(values, [2., 2.5])
+        np.testing.assert_array_equal(offsets, [0, 2, 2])
+
+    def test_iter_unit_blocks_index_reads(self):
+        ut = ICEphysUnits()
+        ut.add_units(spike_times=np.arange(40.), spike_times_counts=np.full(20, 2))
+        with mock.patch.object(ut, '_read_column_data', wraps=ut._read_column_data) as read:
+            blocks = list(ut.iter_unit_blocks(max_bytes=48))
+        self.assertEqual([len(ids) for ids, _, _ in blocks], [3] * 6 + [2])
+        # the index entries read past the end of a block are carried over to the next block, not read again
+        index_reads = [c.args[2:] for c in read.call_args_list if c.args[0] == 'spike_times_index']
+        self.assertEqual(index_reads, [(0, 6), (6, 9), (9, 12), (12, 15), (15, 18), (18, 20)])
+
+    def test_iter_unit_blocks_columns(self):
+        for read_ahead in (False, True):
+            with self.subTest(read_ahead=read_ahead):
+                blocks = list(self.ut.iter_unit_blocks(columns=['spike_times', 'obs_intervals'], max_bytes=48,
+                                                       read_ahead=read_ahead))
+                self.assertEqual([list(ids) for ids, _, _ in blocks], [[0], [1, 2]])
+                ids, values, offsets = blocks[1]
+                np.testing.assert_array_equal(values['spike_times'], [2., 2.5])
+                np.testing.assert_array_equal(values['obs_intervals'], [[2., 4.]])
+                np.testing.assert_array_equal(offsets['obs_intervals'], [0, 1, 1])
+        blocks = list(self.ut.iter_unit_blocks(columns='obs_intervals', read_ahead=True))
+        self.assertEqual(len(blocks), 1)
+        np.testing.assert_array_equal(blocks[0][2], [0, 2, 3, 3])
+
+    def test_iter_unit_blocks_bad_args(self):
+        with self.assertRaisesWith(ValueError, "columns must be of 'spike_times' and 'obs_intervals', got 'id'"):
+            list(self.ut.iter_unit_blocks(columns='id'))
+        with self.assertRaisesWith(ValueError, "max_bytes must be positive, got 0"):
+            list(self.ut.iter_unit_blocks(max_bytes=0))
+
+    @unittest.skipIf(NWBZarrIO is not None, 'hdmf-zarr is installed')
+    def test_set_zarr_io_without_hdmf_zarr(self):
+        with self.assertRaisesWith(ImportError, "set_zarr_io requires hdmf-zarr, which can be installed with "
+                                                "'pip install hdmf-zarr'"):
+            self.ut.set_zarr_io()
+
+    def test_enable_parallel_reads(self):
+        self.ut.enable_parallel_reads(max_workers=2)
+        try:
+            np.testing.assert_array_equal(self.ut.get_unit_spike_times(1), [2., 2.5])
+        finally:
+            self.ut.disable_parallel_reads()
+        with self.assertRaisesWith(ValueError, "max_workers must be positive, got 0"):
+            self.ut.enable_parallel_reads(max_workers=0)
+
+    def test_time_slice_bad_window(self):
+        with self.assertRaisesWith(ValueError, "time_slice requires stop >= start, got (2.0, 1.0)"):
+            self.ut.time_slice(2., 1.)
+
+    def test_no_obs_intervals(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 1.])
+        np.testing.assert_array_equal(ut.get_spike_counts(), [2])
+        with self.assertRaisesWith(ValueError, "ICEphysUnits 'ICEphysUnits' has no obs_intervals column"):
+            ut.get_obs_durations()
+
+
+class TestICEphysUnitsIntegrity(TestCase):
+    def test_consistent(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 1., 3.], obs_intervals=[[2.5, 4.], [0., 1.]], waveform_mean=[0., 1.],
+                    waveform_sd=[1., 1.])
+        ut.add_unit(spike_times=[], obs_intervals=np.zeros((0, 2)), waveform_mean=[0., 1.], waveform_sd=[1., 1.])
+        ut.add_unit(spike_times=[2.], obs_intervals=[[2., 2.]], waveform_mean=[0., 1.], waveform_sd=[1., 1.])
+        self.assertIsNone(ut.spike_times_sorted)
+        for chunk_size in (None, 1, 2):
+            self.assertEqual(ut.check_integrity(chunk_size=chunk_size), [])
+        self.assertTrue(ut.spike_times_sorted)
+        ut.add_unit(spike_times=[5.], obs_intervals=[[5., 6.]], waveform_mean=[0., 1.], waveform_sd=[1., 1.])
+        self.assertIsNone(ut.spike_times_sorted)
+
+    def test_unsorted(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 2., 1.])
+        ut.add_unit(spike_times=[0., 1.])
+        ut.add_unit(spike_times=[3., 3.])
+        msg = "ICEphysUnits 'ICEphysUnits' is inconsistent: spike times are not sorted for units [0]"
+        with self.assertRaisesWith(ValueError, msg):
+            ut.check_integrity()
+        self.assertFalse(ut.spike_times_sorted)
+        # queries fall back to filtering the spike times of each unit
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0, (1.5, 3.)), [2.])
+        values, offsets = ut.query_spike_times([0, 1], (.5, 2.))
+        np.testing.assert_array_equal(values, [2., 1., 1.])
+        np.testing.assert_array_equal(offsets, [0, 2, 3])
+
+    def test_outside_obs_intervals(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 1.5], obs_intervals=[[0., 1.], [2., 3.]])
+        ut.add_unit(spike_times=[1.], obs_intervals=np.zeros((0, 2)))
+        ut.add_unit(spike_times=[2.], obs_intervals=[[1., 3.]])
+        self.assertEqual(ut.check_integrity(chunk_size=2, raise_error=False),
+                         ["spike times fall outside of the observation intervals for units [0, 1]"])
+        self.assertTrue(ut.spike_times_sorted)
+
+    def test_bad_chunk_size(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[1., 0.])
+        with self.assertRaisesWith(ValueError, "chunk_size must be positive, got -5"):
+            ut.check_integrity(chunk_size=-5)
+        self.assertIsNone(ut.spike_times_sorted)
+
+    def test_bad_index_and_waveforms(self):
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 1.], waveform_mean=[0., 1.], waveform_sd=[0., 1., 2.])
+        ut.add_unit(spike_times=[2.], waveform_mean=[0.], waveform_sd=[0., 1., 2.])
+        ut['spike_times'].data[0] = 5
+        problems = ut.check_integrity(raise_error=False)
+        self.assertEqual(problems, ["index of column 'spike_times' is not monotonically increasing at units [1]",
+                                    "column 'waveform_mean' does not have one row of the same length per unit"])
+        self.assertIsNone(ut.spike_times_sorted)
+
 
 class TestICEphysUnitsIO(AcquisitionH5IOMixin, TestCase):
     """ Test adding Units into acquisition and accessing Units after read """
@@ -127,6 +521,76 @@ class TestICEphysUnitsIO(AcquisitionH5IOMixin, TestCase):
         np.testing.assert_array_equal(received, [3., 4., 5.])
         np.testing.assert_array_equal(ut['spike_times'][:], [[0, 1, 2], [3, 4, 5]])
 
+    def test_query_spike_times(self):
+        """ Test whether batched spike time queries on data read from file match what was written """
+        ut = self.roundtripContainer()
+        values, offsets = ut.query_spike_times([1, 0], [[3.5, 10.], [0., 1.]])
+        np.testing.assert_array_equal(values, [4., 5., 0., 1.])
+        np.testing.assert_array_equal(offsets, [0, 2, 4])
+
+    def test_cached_reads(self):
+        """ Test whether cached reads of data read from file match what was written """
+        ut = self.roundtripContainer()
+        ut.enable_cache(block_size=2)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [3., 4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0, (.5, 2.)), [1., 2.])
+        np.testing.assert_array_equal(ut.get_unit_obs_intervals(1), [[2., 5.], [6., 7.]])
+
+    def test_memmap_reads(self):
+        """ Test whether memory-mapped reads of data read from file match what was written """
+        ut = self.roundtripContainer()
+        self.assertEqual(ut.enable_memmap(), ['obs_intervals', 'obs_intervals_index', 'spike_times',
+                                              'spike_times_index'])
+        received = ut.get_unit_spike_times(1)
+        self.assertIsInstance(received, np.memmap)
+        np.testing.assert_array_equal(received, [3., 4., 5.])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0, (.5, 2.)), [1., 2.])
+        np.testing.assert_array_equal(ut.get_unit_obs_intervals(1), [[2., 5.], [6., 7.]])
+        values, offsets = ut.query_spike_times([1, 0], (1., 4.))
+        np.testing.assert_array_equal(values, [3., 4., 1., 2.])
+        ut.disable_memmap()
+        self.assertNotIsInstance(ut.get_unit_spike_times(1), np.memmap)
+
+    def test_get_units_by_electrode(self):
+        """ Test whether units are found by the electrode read from file """
+        ut = self.roundtripContainer()
+        electrode = self.read_nwbfile.icephys_electrodes['test_iS']
+        np.testing.assert_array_equal(ut.get_units_by_electrode(electrode), [0, 1])
+        self.assertIs(ut.get_unit_electrodes()[1], electrode)
+
+    def test_time_slice(self):
+        """ Test whether a time slice of the Units read from file keeps the electrode and custom columns """
+        ut = self.roundtripContainer()
+        sliced = ut.time_slice(1.5, 4.)
+        np.testing.assert_array_equal(sliced.get_unit_spike_times(0), [2.])
+        np.testing.assert_array_equal(sliced.get_unit_spike_times(1), [3., 4.])
+        np.testing.assert_array_equal(sliced['obs_intervals'][:], [[[2., 3.]], [[2., 4.]]])
+        self.assertIs(sliced.get_unit_electrodes()[1], self.read_nwbfile.icephys_electrodes['test_iS'])
+        np.testing.assert_array_equal(sliced['foo'].data, [1, 30])
+        np.testing.assert_array_equal(sliced['my_bool'].data, [False, True])
+
+    def test_iter_unit_blocks(self):
+        """ Test whether blocks of units read from file match what was written """
+        ut = self.roundtripContainer()
+        blocks = list(ut.iter_unit_blocks(columns=('spike_times', 'obs_intervals'), max_bytes=56, read_ahead=True))
+        self.assertEqual(len(blocks), 2)
+        ids, values, offsets = blocks[1]
+        np.testing.assert_array_equal(ids, [1])
+        np.testing.assert_array_equal(values['spike_times'], [3., 4., 5.])
+        np.testing.assert_array_equal(values['obs_intervals'], [[2., 5.], [6., 7.]])
+        np.testing.assert_array_equal(offsets['spike_times'], [0, 3])
+
+    def test_parallel_reads(self):
+        """ Test whether reads with a thread pool of data read from file match what was written """
+        ut = self.roundtripContainer()
+        ut.enable_parallel_reads(max_workers=2)
+        try:
+            values, offsets = ut.query_spike_times([1, 0], (1., 4.))
+            np.testing.assert_array_equal(values, [3., 4., 1., 2.])
+            np.testing.assert_array_equal(ut.get_unit_obs_intervals(1), [[2., 5.], [6., 7.]])
+        finally:
+            ut.disable_parallel_reads()
+
     def test_get_obs_intervals(self):
         """ Test whether the Units observation intervals read from file are what was written """
         ut = self.roundtripContainer()
@@ -137,6 +601,127 @@ class TestICEphysUnitsIO(AcquisitionH5IOMixin, TestCase):
         np.testing.assert_array_equal(ut['obs_intervals'][:], [[[0., 1.], [2., 3.]], [[2., 5.], [6., 7.]]])
 
 
+@unittest.skipIf(NWBZarrIO is None, 'hdmf-zarr is not installed')
+class TestICEphysUnitsZarrIO(TestICEphysUnitsIO):
+    """ Test adding Units into acquisition and accessing Units after read, with the Zarr backend """
+
+    def setUp(self):
+        super().setUp()
+        self.filename = 'test_%s.zarr' % self.container_type
+        self.export_filename = 'test_export_%s.zarr' % self.container_type
+
+    def tearDown(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        if self.export_reader is not None:
+            self.export_reader.close()
+            self.export_reader = None
+        for path in (self.filename, self.export_filename):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        super().tearDown()
+
+    def setUpContainer(self):
+        ut = super().setUpContainer()
+        ut.set_zarr_io()
+        return ut
+
+    def roundtripContainer(self, cache_spec=False):
+        nwbfile = NWBFile('a file to test writing and reading a %s' % self.container_type,
+                          'TEST_%s' % self.container_type, self.start_time, file_create_date=self.create_date)
+        self.addContainer(nwbfile)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', MissingRequiredBuildWarning)
+            with NWBZarrIO(self.filename, mode='w') as write_io:
+                write_io.write(nwbfile, cache_spec=cache_spec)
+            self.reader = NWBZarrIO(self.filename, mode='r')
+            self.read_nwbfile = self.reader.read()
+        return self.getContainer(self.read_nwbfile)
+
+    def roundtripExportContainer(self, cache_spec=False):
+        self.roundtripContainer(cache_spec=cache_spec)
+        with NWBZarrIO(self.export_filename, mode='w') as export_io:
+            export_io.export(src_io=self.reader, write_args=dict(link_data=False))
+        self.export_reader = NWBZarrIO(self.export_filename, mode='r')
+        self.read_exported_nwbfile = self.export_reader.read()
+        return self.getContainer(self.read_exported_nwbfile)
+
+    def validate(self):
+        pass
+
+    def test_set_zarr_io_encoded(self):
+        """ Test that set_zarr_io does not silently drop the HDF5 encoding of the spike times """
+        ut = ICEphysUnits()
+        ut.add_unit(spike_times=[0., 1.])
+        ut.encode_spike_times(resolution=1e-3)
+        msg = ("column 'spike_times' of ICEphysUnits 'ICEphysUnits' is wrapped in ScaleOffsetDataIO, which "
+               "set_zarr_io cannot replace")
+        with self.assertRaisesWith(ValueError, msg):
+            ut.set_zarr_io()
+        self.container.set_zarr_io()
+
+    def test_chunks(self):
+        """ Test whether the columns are chunked along units """
+        self.roundtripContainer()
+        ut = self.read_nwbfile.acquisition['ICEphysUnits']
+        self.assertEqual(ut['spike_times'].target.data.chunks, (6,))
+        self.assertEqual(ut['obs_intervals'].target.data.chunks, (4, 2))
+
+    def test_memmap_reads(self):
+        """ Test whether Zarr columns are left unmapped """
+        ut = self.roundtripContainer()
+        self.assertEqual(ut.enable_memmap(), [])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [3., 4., 5.])
+
+
+class TestICEphysUnitsEncodedIO(AcquisitionH5IOMixin, TestCase):
+    """ Test writing ICEphysUnits with spike times encoded at their resolution """
+
+    def setUpContainer(self):
+        """ Return the test ICEphysUnits to read/write """
+        ut = ICEphysUnits(resolution=1e-3)
+        ut.add_unit(spike_times=[0.25, 1.5, 2.125], obs_intervals=[[0., 3.]])
+        ut.add_unit(spike_times=[3.5, 4., 5.75], obs_intervals=[[3., 6.]])
+        ut.encode_spike_times()
+        return ut
+
+    def test_get_spike_times(self):
+        """ Test whether spike times are decoded to the float64 seconds that were written """
+        ut = self.roundtripContainer()
+        self.assertEqual(ut.resolution, 1e-3)
+        dataset = ut['spike_times'].target.data
+        self.assertEqual(dataset.dtype, np.float64)
+        self.assertEqual(dataset.scaleoffset, 3)
+        self.assertEqual(dataset.compression, 'gzip')
+        self.assertEqual(dataset.attrs['resolution'], 1e-3)
+        np.testing.assert_array_equal(ut.get_unit_spike_times(1), [3.5, 4., 5.75])
+        np.testing.assert_array_equal(ut.get_unit_spike_times(0, (1., 3.)), [1.5, 2.125])
+
+
+class TestICEphysUnitsWaveformIO(AcquisitionH5IOMixin, TestCase):
+    """ Test writing ICEphysUnits with waveforms and their sampling rate """
+
+    def setUpContainer(self):
+        """ Return the test ICEphysUnits to read/write """
+        ut = ICEphysUnits(waveform_rate=20000.)
+        ut.add_unit(spike_times=[0., 1.], waveform_mean=np.array([0., 1., 2.], dtype=np.float32),
+                    waveform_sd=np.array([1., 1., 1.], dtype=np.float32))
+        return ut
+
+    def test_sampling_rate(self):
+        """ Test whether the waveform rate is stored as the sampling rate of the waveform columns """
+        ut = self.roundtripContainer()
+        self.assertEqual(ut.waveform_rate, 20000.)
+        self.assertEqual(ut['waveform_mean'].data.attrs['sampling_rate'], 20000.)
+        self.assertEqual(ut['waveform_sd'].data.attrs['unit'], 'volts')
+
+    def test_vector_data_map(self):
+        """ Test that the attributes of the columns are mapped without replacing the map of all VectorData """
+        self.assertIs(type(get_type_map().get_map(VectorData(name='data', description='description', data=[]))),
+                      VectorDataMap)
+
+
 class TestICEphysUnitsExample(TestCase):
     # from README.md
     from pynwb import NWBFile, NWBHDF5IO
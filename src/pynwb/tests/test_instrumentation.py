@@ -0,0 +1,71 @@
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units import instrumentation
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        instrumentation.reset_stats()
+        self.units = ICEphysUnits()
+        self.units.add_unit(spike_times=[0., 1., 2.], obs_intervals=[[0., 3.]])
+        self.units.add_unit(spike_times=[3., 4.], obs_intervals=[[3., 5.]])
+
+    def tearDown(self):
+        instrumentation.disable_instrumentation()
+        instrumentation.reset_stats()
+
+    def test_disabled(self):
+        self.units.get_unit_spike_times(0)
+        self.assertEqual(instrumentation.get_stats(), {})
+
+    def test_stats(self):
+        instrumentation.enable_instrumentation()
+        self.units.add_unit(spike_times=[5.], obs_intervals=[[5., 6.]])
+        np.testing.assert_array_equal(self.units.get_unit_spike_times(1), [3., 4.])
+        self.units.get_unit_spike_times(0)
+        self.units.query_spike_times([0, 1], (1., 3.))
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats['ICEphysUnits.add_unit']['calls'], 1)
+        self.assertEqual(stats['ICEphysUnits.add_unit']['read_calls'], 0)
+        spike_times = stats['ICEphysUnits.get_unit_spike_times']
+        self.assertEqual(spike_times['calls'], 2)
+        # one read of the index and one of the spike times per unit
+        self.assertEqual(spike_times['read_calls'], 4)
+        # the spike times of both units, as float64, and their offsets in the index
+        self.assertGreater(spike_times['bytes_read'], 5 * 8)
+        self.assertGreater(spike_times['wall_time'], 0.)
+        self.assertEqual(stats['ICEphysUnits.query_spike_times']['read_calls'], 2)
+
+    def test_nested(self):
+        instrumentation.enable_instrumentation()
+        self.units.get_unit_spike_times([0, 1], (1., 3.))
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats['ICEphysUnits.get_unit_spike_times']['read_calls'],
+                         stats['ICEphysUnits.query_spike_times']['read_calls'])
+
+    def test_callback(self):
+        calls = list()
+
+        def callback(name, stats):
+            calls.append((name, stats['read_calls']))
+
+        instrumentation.add_callback(callback)
+        try:
+            self.units.get_unit_obs_intervals(0)
+            instrumentation.enable_instrumentation()
+            self.units.get_unit_obs_intervals(1)
+        finally:
+            instrumentation.remove_callback(callback)
+        self.units.get_unit_obs_intervals(1)
+        self.assertEqual(calls, [('ICEphysUnits.get_unit_obs_intervals', 2)])
+
+    def test_snapshot(self):
+        instrumentation.enable_instrumentation()
+        self.units.get_unit_spike_times(0)
+        snapshot = instrumentation.get_stats()
+        self.units.get_unit_spike_times(0)
+        self.assertEqual(snapshot['ICEphysUnits.get_unit_spike_times']['calls'], 1)
+        self.assertEqual(instrumentation.get_stats()['ICEphysUnits.get_unit_spike_times']['calls'], 2)
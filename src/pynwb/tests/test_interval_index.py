@@ -0,0 +1,75 @@
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.interval_index import IntervalIndex
+
+
+def _split(labels, offsets):
+    return [labels[offsets[k]:offsets[k + 1]].tolist() for k in range(len(offsets) - 1)]
+
+
+class TestIntervalIndex(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        starts = rng.uniform(0, 100, 300)
+        self.intervals = np.stack([starts, starts + rng.exponential(5, 300)], axis=1)
+        self.intervals[::50] = self.intervals[::50, ::-1]  # a few empty intervals
+        self.labels = rng.integers(0, 40, 300)
+
+    def _expected(self, starts, stops):
+        valid = self.intervals[:, 0] <= self.intervals[:, 1]
+        return [sorted(set(self.labels[valid & (self.intervals[:, 0] <= b) & (self.intervals[:, 1] >= a)].tolist()))
+                for a, b in zip(starts, stops)]
+
+    def test_query_points(self):
+        index = IntervalIndex(self.intervals, self.labels)
+        times = np.concatenate([np.linspace(-5, 120, 200), self.intervals[:20].ravel()])
+        self.assertEqual(_split(*index.query_points(times)), self._expected(times, times))
+
+    def test_query_windows(self):
+        index = IntervalIndex(self.intervals, self.labels)
+        starts = np.linspace(-5, 120, 100)
+        stops = starts + np.linspace(0, 10, 100)
+        self.assertEqual(_split(*index.query_windows(np.stack([starts, stops], axis=1))),
+                         self._expected(starts, stops))
+        with self.assertRaises(ValueError):
+            index.query_windows([[1., 0.]])
+
+    def test_extend(self):
+        index = IntervalIndex(self.intervals[:100], self.labels[:100], max_pending=50)
+        index.extend(self.intervals[100:130], self.labels[100:130])
+        index.extend(self.intervals[130:], self.labels[130:])
+        self.assertEqual(len(index), 300)
+        times = np.linspace(-5, 120, 200)
+        self.assertEqual(_split(*index.query_points(times)), self._expected(times, times))
+
+    def test_extend_pending(self):
+        # 30 pending intervals are scanned, and 200 more are merged into the tree before the next query
+        index = IntervalIndex(self.intervals[:70], self.labels[:70], max_pending=50)
+        index.extend(self.intervals[70:100], self.labels[70:100])
+        times = np.linspace(-5, 120, 200)
+        self.intervals, self.labels = self.intervals[:100], self.labels[:100]
+        self.assertEqual(_split(*index.query_points(times)), self._expected(times, times))
+        self.setUp()
+        index.extend(self.intervals[100:], self.labels[100:])
+        windows = np.stack([times, times + 3.], axis=1)
+        self.assertEqual(_split(*index.query_windows(windows)), self._expected(times, times + 3.))
+
+    def test_empty(self):
+        labels, offsets = IntervalIndex().query_points([0., 1.])
+        self.assertEqual(len(labels), 0)
+        np.testing.assert_array_equal(offsets, [0, 0, 0])
+
+
+class TestICEphysUnitsObservedUnits(TestCase):
+    def test_units_observed(self):
+        ut = ICEphysUnits()
+        ut.add_unit(obs_intervals=[[0., 1.], [3., 5.]])
+        ut.add_unit(obs_intervals=[[2., 4.]])
+        self.assertEqual(_split(*ut.get_units_observed_at([0., 2.5, 3.5, 6.])), [[0], [1], [0, 1], []])
+        ut.add_unit(obs_intervals=[[5., 7.]])
+        self.assertEqual(_split(*ut.get_units_observed_at([6.])), [[2]])
+        self.assertEqual(_split(*ut.get_units_observed_during([[1.5, 2.], [4.5, 5.5], [8., 9.]])),
+                         [[1], [0, 2], []])
@@ -0,0 +1,44 @@
+from io import BytesIO
+
+import h5py
+import numpy as np
+
+from pynwb.testing import TestCase, remove_test_file
+
+from ndx_icephys_units.memmap import memmap_dataset
+
+
+class TestMemmapDataset(TestCase):
+    def setUp(self):
+        self.path = 'test_memmap.h5'
+        with h5py.File(self.path, 'w') as f:
+            f.create_dataset('contiguous', data=np.arange(10.))
+            f.create_dataset('chunked', data=np.arange(10.), chunks=(5,))
+            f.create_dataset('compressed', data=np.arange(10.), compression='gzip')
+            f.create_dataset('empty', shape=(0,), dtype=np.float64)
+            f.create_dataset('strings', data=np.array(['a', 'b'], dtype=object), dtype=h5py.string_dtype())
+
+    def tearDown(self):
+        remove_test_file(self.path)
+
+    def test_memmap_dataset(self):
+        with h5py.File(self.path, 'r') as f:
+            mapped = memmap_dataset(f['contiguous'])
+            self.assertIsInstance(mapped, np.memmap)
+            np.testing.assert_array_equal(mapped, np.arange(10.))
+            for name in ('chunked', 'compressed', 'empty', 'strings'):
+                self.assertIsNone(memmap_dataset(f[name]))
+        del mapped
+
+    def test_not_read_only(self):
+        with h5py.File(self.path, 'r+') as f:
+            self.assertIsNone(memmap_dataset(f['contiguous']))
+
+    def test_file_object(self):
+        with open(self.path, 'rb') as f:
+            data = BytesIO(f.read())
+        with h5py.File(data, 'r') as f:
+            self.assertIsNone(memmap_dataset(f['contiguous']))
+
+    def test_not_dataset(self):
+        self.assertIsNone(memmap_dataset(np.arange(10.)))
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units.parallel import read_chunked
+
+
+class TestReadChunked(TestCase):
+    def setUp(self):
+        self.file = h5py.File('test_parallel.h5', 'w', driver='core', backing_store=False)
+        self.values = np.arange(100, dtype=np.float64).reshape(50, 2)
+        self.data = self.file.create_dataset('data', data=self.values, chunks=(4, 2))
+        self.executor = ThreadPoolExecutor(max_workers=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.file.close()
+
+    def test_read(self):
+        for start, stop in ((0, 50), (3, 41), (5, 9), (8, 12), (49, 50), (10, 10)):
+            with self.subTest(start=start, stop=stop):
+                values, _ = read_chunked(self.data, start, stop, self.executor, 3)
+                np.testing.assert_array_equal(values, self.values[start:stop])
+
+    def test_pieces(self):
+        self.assertEqual(read_chunked(self.data, 0, 50, self.executor, 3)[1], 3)
+        self.assertEqual(read_chunked(self.data, 2, 7, self.executor, 3)[1], 2)
+        self.assertEqual(read_chunked(self.data, 4, 8, self.executor, 3)[1], 1)
+        self.assertEqual(read_chunked(self.data, 0, 50, self.executor, 1)[1], 1)
+
+    def test_not_chunked(self):
+        values, calls = read_chunked(self.values, 3, 41, self.executor, 3)
+        np.testing.assert_array_equal(values, self.values[3:41])
+        self.assertEqual(calls, 1)
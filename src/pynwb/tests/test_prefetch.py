@@ -0,0 +1,81 @@
+import asyncio
+import shutil
+
+import numpy as np
+
+from hdmf.backends.errors import UnsupportedOperation
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.prefetch import AsyncUnitReader
+
+from .utils import UnitFilesMixin
+
+
+class TestAsyncUnitReader(UnitFilesMixin, TestCase):
+    prefix = 'test_prefetch'
+
+    def make_units(self, nwbfile, session, spike_times):
+        units = ICEphysUnits(waveform_rate=1000.)
+        for k, st in enumerate(spike_times):
+            units.add_unit(spike_times=st, obs_intervals=[[0., 10. * (session + 1)]], waveform_mean=[session, k, 0.],
+                           waveform_sd=[1., 1., 1.])
+        return units
+
+    def setUp(self):
+        super().setUp()
+        self.units = [(self.paths[0], 1), (self.paths[2], 2), (self.paths[1], 0), (self.paths[0], 0),
+                      (self.paths[2], 0)]
+
+    def test_read(self):
+        async def read():
+            async with AsyncUnitReader(self.units, prefetch=2, max_open_files=1) as reader:
+                spike_times = [await reader.get_unit_spike_times(p) for p in range(len(reader))]
+                obs_intervals = await reader.get_unit_obs_intervals(1)
+                unit = await reader.get_unit(-2)
+                return spike_times, obs_intervals, unit
+
+        spike_times, obs_intervals, unit = asyncio.run(read())
+        for received, expected in zip(spike_times, [[2.], [7., 8.], [3., 4., 5.], [0., 1.], []]):
+            np.testing.assert_array_equal(received, expected)
+        np.testing.assert_array_equal(obs_intervals, [[0., 30.]])
+        np.testing.assert_array_equal(unit['waveform_mean'], [0., 0., 0.])
+        np.testing.assert_array_equal(unit['waveform_sd'], [1., 1., 1.])
+
+    def test_prefetch(self):
+        async def read():
+            reader = AsyncUnitReader(self.units, prefetch=2, max_open_files=2)
+            try:
+                await reader.get_unit(0)
+                scheduled = [reader.scheduled]
+                await reader.get_unit(3)
+                scheduled.append(reader.scheduled)
+                return scheduled, reader.num_open_files
+            finally:
+                await reader.close()
+                self.assertEqual(reader.num_open_files, 0)
+
+        scheduled, num_open_files = asyncio.run(read())
+        self.assertEqual(scheduled, [[0, 1, 2], [3, 4]])
+        self.assertLessEqual(num_open_files, 3)
+
+    def test_retry(self):
+        path = 'test_prefetch_retry.nwb'
+        self.paths.append(path)
+
+        async def read():
+            async with AsyncUnitReader([(path, 0)]) as reader:
+                with self.assertRaises(UnsupportedOperation):
+                    await reader.get_unit_spike_times(0)
+                shutil.copy(self.paths[0], path)
+                return await reader.get_unit_spike_times(0)
+
+        np.testing.assert_array_equal(asyncio.run(read()), [0., 1.])
+
+    def test_bad_position(self):
+        async def read():
+            async with AsyncUnitReader(self.units) as reader:
+                await reader.get_unit(5)
+
+        with self.assertRaisesWith(IndexError, "position 5 out of range for AsyncUnitReader with 5 units"):
+            asyncio.run(read())
@@ -0,0 +1,53 @@
+import numpy as np
+
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.psth import compute_psth, compute_raster
+
+
+class TestPSTH(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.spike_times = [np.sort(rng.uniform(0, 100, n)) for n in (50, 0, 200, 10)]
+        self.units = ICEphysUnits()
+        for st in self.spike_times:
+            self.units.add_unit(spike_times=st)
+        self.events = np.array([10., 55.5, 30., 99.])
+
+    def _expected_counts(self, edges, index):
+        return np.array([[[np.sum((self.spike_times[k] - e >= lo) & (self.spike_times[k] - e < hi))
+                           for lo, hi in zip(edges[:-1], edges[1:])] for e in self.events] for k in index])
+
+    def test_psth(self):
+        counts, edges = compute_psth(self.units, self.events, (-1., 2.), .25)
+        np.testing.assert_allclose(edges, np.arange(-1., 2.01, .25))
+        self.assertEqual(counts.shape, (4, 12))
+        np.testing.assert_array_equal(counts, self._expected_counts(edges, range(4)).sum(axis=1))
+
+    def test_psth_per_event_chunked(self):
+        counts, edges = compute_psth(self.units, self.events, (0., 1.), .1, index=[3, 2, 0], per_event=True)
+        chunked, _ = compute_psth(self.units, self.events, (0., 1.), .1, index=[3, 2, 0], per_event=True,
+                                  chunk_size=2)
+        self.assertEqual(counts.shape, (3, 4, 10))
+        np.testing.assert_array_equal(counts, self._expected_counts(edges, [3, 2, 0]))
+        np.testing.assert_array_equal(chunked, counts)
+
+    def test_psth_uneven_window(self):
+        _, edges = compute_psth(self.units, self.events, (0., 1.), .3)
+        np.testing.assert_allclose(edges, [0., .3, .6, .9, 1.])
+
+    def test_psth_bad_args(self):
+        with self.assertRaises(ValueError):
+            compute_psth(self.units, self.events, (1., 0.), .1)
+        with self.assertRaises(ValueError):
+            compute_psth(self.units, self.events, (0., 1.), 0.)
+
+    def test_raster(self):
+        values, offsets = compute_raster(self.units, self.events, (-.5, 1.), chunk_size=3)
+        self.assertEqual(len(offsets), 4 * 4 + 1)
+        for k, st in enumerate(self.spike_times):
+            for j, e in enumerate(self.events):
+                i = k * len(self.events) + j
+                rel = st - e
+                np.testing.assert_allclose(values[offsets[i]:offsets[i + 1]], rel[(rel >= -.5) & (rel < 1.)])
@@ -0,0 +1,77 @@
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+from hdmf.build.warnings import MissingRequiredBuildWarning
+
+from pynwb import NWBFile, NWBHDF5IO
+from pynwb.testing import TestCase, remove_test_file
+
+from ndx_icephys_units.stream import ICEphysUnitsStreamWriter
+
+
+class TestICEphysUnitsStreamWriter(TestCase):
+    def setUp(self):
+        self.path = 'test_stream.nwb'
+        self.nwbfile = NWBFile(session_description='session_description',
+                               identifier='identifier',
+                               session_start_time=datetime.now().astimezone())
+        device = self.nwbfile.create_device(name='device_name')
+        self.elec = self.nwbfile.create_icephys_electrode(name='test_iS', device=device, description='description')
+
+    def tearDown(self):
+        remove_test_file(self.path)
+
+    def test_write(self):
+        with warnings.catch_warnings():
+            # the waveform sampling rate is written by the object mapper, without missing attribute warnings
+            warnings.simplefilter('error', MissingRequiredBuildWarning)
+            writer = ICEphysUnitsStreamWriter(self.path, self.nwbfile, electrode=True, waveform_samples=3,
+                                              waveform_rate=10000., chunk_size=4, buffer_size=32)
+        with writer:
+            for i in range(5):
+                writer.add_unit(spike_times=np.arange(i) + 10. * i, obs_intervals=[[10. * i, 10. * i + 5.]],
+                                electrode=self.elec, waveform_mean=np.full(3, i), waveform_sd=np.ones(3))
+            self.assertEqual(writer.num_units, 5)
+
+        with NWBHDF5IO(self.path, 'r') as io:
+            ut = io.read().acquisition['ICEphysUnits']
+            self.assertEqual(len(ut), 5)
+            np.testing.assert_array_equal(ut.id[:], range(5))
+            for i in range(5):
+                np.testing.assert_array_equal(ut.get_unit_spike_times(i), np.arange(i) + 10. * i)
+                np.testing.assert_array_equal(ut.get_unit_obs_intervals(i), [[10. * i, 10. * i + 5.]])
+                np.testing.assert_array_equal(ut['waveform_mean'][i], np.full(3, i))
+                self.assertEqual(ut['electrode'][i].name, 'test_iS')
+            self.assertEqual(ut['waveform_mean'].data.attrs['sampling_rate'], 10000.)
+            self.assertEqual(ut['spike_times'].target.data.maxshape, (None,))
+
+    def test_extend_unit(self):
+        writer = ICEphysUnitsStreamWriter(self.path, self.nwbfile, obs_intervals=False)
+        writer.add_unit(spike_times=[0., 1.])
+        writer.flush()
+        writer.extend_unit([2., 3.])
+        writer.add_unit(spike_times=[4.])
+        writer.extend_unit([5.])
+        writer.flush()
+        writer.extend_unit([6.])
+        writer.close()
+
+        with NWBHDF5IO(self.path, 'r') as io:
+            ut = io.read().acquisition['ICEphysUnits']
+            self.assertEqual(ut.colnames, ('spike_times',))
+            np.testing.assert_array_equal(ut.get_unit_spike_times(0), [0., 1., 2., 3.])
+            np.testing.assert_array_equal(ut.get_unit_spike_times(1), [4., 5., 6.])
+
+    def test_bad_args(self):
+        with ICEphysUnitsStreamWriter(self.path, self.nwbfile) as writer:
+            with self.assertRaises(ValueError):
+                writer.extend_unit([0.])
+            with self.assertRaises(ValueError):
+                writer.add_unit(spike_times=[0.], electrode=self.elec)
+            with self.assertRaises(ValueError):
+                writer.add_unit(spike_times=[0.], waveform_mean=[0., 1.])
+            writer.add_unit(spike_times=[0.])
+        with self.assertRaisesWith(ValueError, "waveform_rate is required to store waveforms"):
+            ICEphysUnitsStreamWriter(self.path, self.nwbfile, waveform_samples=3)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+from datetime import datetime
+
+from pynwb import NWBFile, NWBHDF5IO
+from pynwb.icephys import CurrentClampSeries, CurrentClampStimulusSeries
+from pynwb.testing import TestCase, remove_test_file
+
+from ndx_icephys_units import ICEphysUnits
+
+
+class TestSpikeSweeps(TestCase):
+    def setUp(self):
+        self.nwbfile = NWBFile(session_description='session_description', identifier='identifier',
+                               session_start_time=datetime(2020, 1, 1).astimezone())
+        device = self.nwbfile.create_device(name='device_name')
+        electrodes = [self.nwbfile.create_icephys_electrode(name='elec%d' % i, device=device,
+                                                            description='description') for i in range(2)]
+        # the sweeps of electrode 0 span [10, 11) and [0, 1) and the sweep of electrode 1 spans [0, 3)
+        for k, (electrode, start, num_samples) in enumerate([(0, 10., 100), (0, 0., 100), (1, 0., 300)]):
+            response = CurrentClampSeries(name='response%d' % k, data=np.zeros(num_samples), rate=100., gain=1.,
+                                          starting_time=start, electrode=electrodes[electrode])
+            stimulus = CurrentClampStimulusSeries(name='stimulus%d' % k, data=np.zeros(num_samples), rate=100.,
+                                                  gain=1., starting_time=start, electrode=electrodes[electrode])
+            self.nwbfile.add_acquisition(response)
+            self.nwbfile.add_stimulus(stimulus)
+            self.nwbfile.add_intracellular_recording(electrode=electrodes[electrode], response=response,
+                                                     stimulus=stimulus)
+        self.units = ICEphysUnits()
+        self.units.add_unit(spike_times=[0.5, 1., 10.2, 20.], electrode=electrodes[0])
+        self.units.add_unit(spike_times=[2.9, 0.1, 3.], electrode=electrodes[1])
+        self.units.add_unit(spike_times=[0.99], electrode=electrodes[0])
+        self.nwbfile.add_acquisition(self.units)
+        self.path = 'test_sweeps.nwb'
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            remove_test_file(self.path)
+
+    def test_series(self):
+        series = [self.nwbfile.acquisition['response%d' % k] for k in range(3)]
+        sweeps, sweep_times = self.units.get_spike_sweeps(series)
+        np.testing.assert_array_equal(sweeps, [1, -1, 0, -1, 2, 2, -1, 1])
+        np.testing.assert_allclose(sweep_times, [0.5, np.nan, 0.2, np.nan, 2.9, 0.1, np.nan, 0.99])
+
+    def test_recordings_table(self):
+        sweeps, sweep_times = self.units.get_spike_sweeps(self.nwbfile.intracellular_recordings)
+        np.testing.assert_array_equal(sweeps, [1, -1, 0, -1, 2, 2, -1, 1])
+
+    def test_recordings_table_io(self):
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(self.nwbfile)
+        with NWBHDF5IO(self.path, 'r') as io:
+            nwbfile = io.read()
+            sweeps, sweep_times = nwbfile.acquisition['ICEphysUnits'].get_spike_sweeps(
+                nwbfile.intracellular_recordings)
+        np.testing.assert_array_equal(sweeps, [1, -1, 0, -1, 2, 2, -1, 1])
+        np.testing.assert_allclose(sweep_times, [0.5, np.nan, 0.2, np.nan, 2.9, 0.1, np.nan, 0.99])
+
+    def test_timestamps(self):
+        series = CurrentClampSeries(name='timestamped', data=np.zeros(3), timestamps=[2., 2.5, 2.9], gain=1.,
+                                    electrode=self.nwbfile.icephys_electrodes['elec1'])
+        sweeps, sweep_times = self.units.get_spike_sweeps([series])
+        # the sweep ends at the end of the last sample, 2.9 plus the median sampling interval of 0.45
+        np.testing.assert_array_equal(sweeps, [-1, -1, -1, -1, 0, -1, 0, -1])
+        np.testing.assert_allclose(sweep_times[[4, 6]], [0.9, 1.])
+
+    def test_no_sweeps(self):
+        sweeps, sweep_times = self.units.get_spike_sweeps([])
+        np.testing.assert_array_equal(sweeps, [-1] * 8)
+        self.assertTrue(np.all(np.isnan(sweep_times)))
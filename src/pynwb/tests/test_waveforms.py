@@ -0,0 +1,67 @@
+import numpy as np
+
+from pynwb.device import Device
+from pynwb.icephys import IntracellularElectrode, CurrentClampSeries
+from pynwb.testing import TestCase
+
+from ndx_icephys_units import ICEphysUnits
+from ndx_icephys_units.waveforms import compute_waveforms
+
+
+def _electrode(name, device):
+    return IntracellularElectrode(name=name, device=device, description='description')
+
+
+class TestComputeWaveforms(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        device = Device(name='device_name')
+        self.electrodes = [_electrode('elec0', device), _electrode('elec1', device)]
+        self.rate = 1000.
+        self.data = [rng.normal(size=5000), rng.normal(size=3000)]
+        self.series = [CurrentClampSeries(name='ccs%d' % i, data=d, electrode=e, gain=1., rate=self.rate,
+                                          starting_time=10. * i, conversion=2.)
+                       for i, (d, e) in enumerate(zip(self.data, self.electrodes))]
+        self.spike_times = [np.array([.0005, .1, 1.2, 2.5, 4.999]), np.array([10.5, 11.25, 12.]),
+                            np.array([3.])]
+        self.units = ICEphysUnits()
+        for st, e in zip(self.spike_times, [self.electrodes[0], self.electrodes[1], self.electrodes[1]]):
+            self.units.add_unit(spike_times=st, electrode=e)
+
+    def _expected(self, spike_times, data, start_time, pre, post):
+        first = np.rint((spike_times - start_time) * self.rate).astype(int) - pre
+        first = first[(first >= 0) & (first + pre + post <= data.size)]
+        snippets = np.array([2. * data[f:f + pre + post] for f in first])
+        return snippets.mean(axis=0), snippets.std(axis=0)
+
+    def test_waveforms(self):
+        mean, sd = compute_waveforms(self.units, self.series, window=(-3e-3, 5e-3), chunk_size=700)
+        self.assertEqual(mean.shape, (3, 8))
+        for k, (series_index, data) in enumerate([(0, self.data[0]), (1, self.data[1])]):
+            expected_mean, expected_sd = self._expected(self.spike_times[k], data, 10. * series_index, 3, 5)
+            np.testing.assert_allclose(mean[k], expected_mean)
+            np.testing.assert_allclose(sd[k], expected_sd)
+        self.assertTrue(np.all(np.isnan(mean[2])))
+        self.assertEqual(self.units.waveform_rate, self.rate)
+        np.testing.assert_allclose(self.units['waveform_mean'].data, mean.astype(np.float32))
+        self.assertEqual(self.units['waveform_sd'].data.dtype, np.float32)
+
+    def test_chunk_size_independent(self):
+        mean, sd = compute_waveforms(self.units, self.series, chunk_size=10 ** 6, write=False)
+        chunked_mean, chunked_sd = compute_waveforms(self.units, self.series, chunk_size=3, write=False)
+        np.testing.assert_allclose(chunked_mean, mean)
+        np.testing.assert_allclose(chunked_sd, sd)
+        self.assertNotIn('waveform_mean', self.units.colnames)
+
+    def test_bad_args(self):
+        with self.assertRaisesWith(ValueError, "series must not be empty"):
+            compute_waveforms(self.units, [])
+        with self.assertRaisesWith(ValueError, "window must have stop > start, got (0.001, 0.0)"):
+            compute_waveforms(self.units, self.series, window=(1e-3, 0.))
+        other = CurrentClampSeries(name='other', data=self.data[0], electrode=self.electrodes[0], gain=1.,
+                                   rate=2000.)
+        with self.assertRaisesWith(ValueError, "all series must have the same sampling rate, got [1000.0, 2000.0]"):
+            compute_waveforms(self.units, self.series + [other])
+        compute_waveforms(self.units, self.series)
+        with self.assertRaisesWith(ValueError, "ICEphysUnits 'ICEphysUnits' already has waveform columns"):
+            compute_waveforms(self.units, self.series)
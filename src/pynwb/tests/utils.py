@@ -0,0 +1,39 @@
+"""Helpers shared by the tests."""
+import os
+from datetime import datetime
+
+from pynwb import NWBFile, NWBHDF5IO
+from pynwb.testing import remove_test_file
+
+# the spike times of the units of each session written by UnitFilesMixin
+SESSION_SPIKE_TIMES = [[[0., 1.], [2.]], [[3., 4., 5.]], [[], [6.], [7., 8.]]]
+
+
+class UnitFilesMixin:
+    """Write one NWB file with an ICEphysUnits table per session of SESSION_SPIKE_TIMES before each test and remove
+    the files after it.
+
+    Subclasses set the file name prefix and make the table of each session with make_units.
+    """
+
+    prefix = None
+
+    def make_units(self, nwbfile, session, spike_times):
+        """Make the ICEphysUnits table of a session, with the given spike times of each unit."""
+        raise NotImplementedError
+
+    def setUp(self):
+        self.paths = list()
+        for i, spike_times in enumerate(SESSION_SPIKE_TIMES):
+            nwbfile = NWBFile(session_description='session_description', identifier='session%d' % i,
+                              session_start_time=datetime.now().astimezone())
+            nwbfile.add_acquisition(self.make_units(nwbfile, i, spike_times))
+            path = '%s_%d.nwb' % (self.prefix, i)
+            with NWBHDF5IO(path, 'w') as io:
+                io.write(nwbfile)
+            self.paths.append(path)
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                remove_test_file(path)